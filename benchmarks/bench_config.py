@@ -0,0 +1,28 @@
+"""Benchmarks for configuration rendering."""
+
+from nats_tools.benchmark import BenchmarkSuite
+from nats_tools.templates import ConfigGenerator
+
+
+def run(suite: BenchmarkSuite, iterations: int) -> None:
+    generator = ConfigGenerator()
+    suite.run("config.load_template", ConfigGenerator, iterations=iterations)
+    suite.run(
+        "config.render",
+        generator.render,
+        iterations=iterations,
+        params={"options": "default"},
+    )
+    suite.run(
+        "config.render",
+        lambda: generator.render(
+            with_jetstream=True,
+            cluster_listen="nats://127.0.0.1:6222",
+            routes=["nats://127.0.0.1:6223", "nats://127.0.0.1:6224"],
+            allow_leafnodes=True,
+            websocket_listen_port=8080,
+            users=[{"user": f"user-{idx}", "password": "pass"} for idx in range(10)],
+        ),
+        iterations=iterations,
+        params={"options": "full"},
+    )
@@ -0,0 +1,46 @@
+"""Benchmarks for NATSMonitor and AsyncNATSMonitor against a local simulator."""
+
+import typing as t
+
+from nats_tools.benchmark import BenchmarkSuite
+from nats_tools.monitor import AsyncNATSMonitor, NATSMonitor
+from nats_tools.simulator import MonitorSimulator
+
+PAYLOAD_SIZES = (10, 1_000, 10_000)
+PAGE_SIZES = (64, 1024, 4096)
+
+
+def run(suite: BenchmarkSuite, iterations: int) -> None:
+    for connections in PAYLOAD_SIZES:
+        with MonitorSimulator(connections=connections) as simulator:
+            monitor = NATSMonitor(simulator.url)
+            suite.run(
+                "monitor.varz",
+                monitor.varz,
+                iterations=iterations,
+                params={"connections": connections},
+            )
+            for limit in PAGE_SIZES:
+                if limit > connections * 4:
+                    continue
+                params = {"connections": connections, "limit": limit}
+                suite.run(
+                    "monitor.connz",
+                    lambda: monitor.connz(limit=limit),
+                    iterations=iterations,
+                    params=params,
+                )
+                for concurrency in (1, 8):
+                    async_monitor = AsyncNATSMonitor(simulator.url)
+
+                    async def connz() -> t.Any:
+                        return await async_monitor.connz(limit=limit)
+
+                    suite.run_async(
+                        "async_monitor.connz",
+                        connz,
+                        iterations=iterations,
+                        params=params,
+                        concurrency=concurrency,
+                        teardown=async_monitor.close,
+                    )
@@ -0,0 +1,27 @@
+"""Benchmarks for NATSD lifecycle. Requires nats-server binary."""
+
+import time
+
+from nats_tools.benchmark import BenchmarkResult, BenchmarkSuite
+from nats_tools.natsd import NATSD
+
+
+def run(suite: BenchmarkSuite, iterations: int) -> None:
+    clock = time.perf_counter
+    for with_jetstream in (False, True):
+        params = {"with_jetstream": with_jetstream}
+        start = BenchmarkResult("natsd.start", params)
+        stop = BenchmarkResult("natsd.stop", params)
+        for _ in range(iterations):
+            server = NATSD(with_jetstream=with_jetstream, start_timeout=10)
+            before = clock()
+            server.start(wait=True)
+            started = clock()
+            server.stop()
+            stopped = clock()
+            start.samples.append(started - before)
+            stop.samples.append(stopped - started)
+        for result in (start, stop):
+            result.elapsed = sum(result.samples)
+            result.operations = iterations
+            suite.add(result)
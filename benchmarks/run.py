@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+"""Run benchmarks, write results to JSON and optionally compare them against a baseline.
+
+Exit code is 1 when a regression is detected.
+"""
+
+import argparse
+import sys
+import typing as t
+
+import bench_config
+import bench_monitor
+import bench_natsd
+
+from nats_tools.benchmark import BenchmarkSuite
+from nats_tools.natsd import find_nats_server
+
+BENCHMARKS: t.Dict[str, t.Callable[[BenchmarkSuite, int], None]] = {
+    "config": bench_config.run,
+    "monitor": bench_monitor.run,
+    "natsd": bench_natsd.run,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-o", "--output", default="benchmarks.json")
+    parser.add_argument("-b", "--baseline", default=None)
+    parser.add_argument("-t", "--threshold", type=float, default=0.2)
+    parser.add_argument("-n", "--iterations", type=int, default=100)
+    parser.add_argument(
+        "-s",
+        "--select",
+        default=",".join(BENCHMARKS),
+        help="comma-separated list of benchmarks to run",
+    )
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite()
+    for name in args.select.split(","):
+        if name == "natsd" and find_nats_server() is None:
+            print("Skipping natsd benchmarks: nats-server executable not found")
+            continue
+        # Server lifecycle is slow, so less iterations are used
+        iterations = (
+            max(args.iterations // 10, 1) if name == "natsd" else args.iterations
+        )
+        BENCHMARKS[name](suite, iterations)
+    print(suite.report())
+    suite.save(args.output)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = suite.compare(
+            BenchmarkSuite.load(args.baseline), threshold=args.threshold
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Create isolated accounts on a running server.
+
+Creating an account only requires a configuration reload, which is much faster than starting a
+new server. This allows tests to share a single server while being isolated from each other:
+subjects, users and JetStream resources never leak between accounts.
+
+Operator mode is not supported, since account JWTs must then be signed using nkeys.
+
+Example:
+
+```python
+from nats_tools.accounts import AccountManager
+from nats_tools.natsd import NATSD
+
+with NATSD(with_jetstream=True) as server:
+    manager = AccountManager(server)
+    account = manager.create()
+    # Connect using account.url
+    manager.remove(account)
+```
+"""
+
+import secrets
+import threading
+import typing as t
+from dataclasses import dataclass, field
+
+from nats_tools.natsd import NATSD
+
+
+@dataclass
+class IsolatedAccount:
+    """An account created on a shared server.
+
+    Attributes:
+        name: account name.
+        user: name of the account user.
+        password: password of the account user.
+        address: server address.
+        port: server client port.
+        jetstream: JetStream limits of the account. None when JetStream is disabled.
+    """
+
+    name: str
+    user: str
+    password: str
+    address: str
+    port: int
+    jetstream: t.Optional[t.Dict[str, t.Any]] = field(default=None)
+
+    @property
+    def url(self) -> str:
+        """Connection URL including credentials."""
+        return f"nats://{self.user}:{self.password}@{self.address}:{self.port}"
+
+
+class AccountManager:
+    def __init__(
+        self,
+        server: NATSD,
+        max_memory: int = 64 * 1024 * 1024,
+        max_file: int = 256 * 1024 * 1024,
+        max_streams: int = -1,
+        max_consumers: int = -1,
+        reload_timeout: float = 5,
+    ) -> None:
+        """Manage accounts of a server through configuration reloads.
+
+        Removals are deferred until next account creation (or `flush()`), so that a single
+        reload is needed per created account.
+
+        Arguments:
+            server: a server whose configuration was generated by NATSD.
+            max_memory: default JetStream memory storage limit of accounts in bytes.
+            max_file: default JetStream file storage limit of accounts in bytes.
+            max_streams: default maximum number of streams per account. Unlimited by default.
+            max_consumers: default maximum number of consumers per account. Unlimited by default.
+            reload_timeout: maximum seconds to wait for each configuration reload.
+        """
+        if server.config_options is None:
+            raise TypeError(
+                "Accounts can only be managed when configuration is generated"
+            )
+        if server.config_options.get("operator"):
+            raise TypeError("Accounts cannot be managed in operator mode")
+        self.server = server
+        self.jetstream_limits = {
+            "max_mem": max_memory,
+            "max_file": max_file,
+            "max_streams": max_streams,
+            "max_consumers": max_consumers,
+        }
+        self.reload_timeout = reload_timeout
+        self.accounts: t.Dict[str, t.Dict[str, t.Any]] = dict(
+            server.config_options.get("accounts") or {}
+        )
+        self._pending_removals: t.Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _apply(self) -> None:
+        for name in self._pending_removals:
+            self.accounts.pop(name, None)
+        self._pending_removals.clear()
+        self.server.update_config(
+            accounts=dict(self.accounts), timeout=self.reload_timeout
+        )
+
+    def create(
+        self,
+        name: t.Optional[str] = None,
+        user: t.Optional[str] = None,
+        password: t.Optional[str] = None,
+        **jetstream_limits: int,
+    ) -> IsolatedAccount:
+        """Create a new account with a single user and reload server configuration.
+
+        Arguments:
+            name: account name. Default to a random name.
+            user: user name. Default to a random name.
+            password: user password. Default to a random password.
+            jetstream_limits: JetStream limits overriding defaults (`max_mem`, `max_file`, `max_streams`, `max_consumers`).
+        """
+        token = secrets.token_hex(6)
+        name = name or f"TEST_{token.upper()}"
+        user = user or f"user-{token}"
+        password = password or secrets.token_urlsafe(12)
+        definition: t.Dict[str, t.Any] = {
+            "users": [{"user": user, "password": password}]
+        }
+        jetstream: t.Optional[t.Dict[str, t.Any]] = None
+        if self.server.jetstream_enabled:
+            jetstream = {**self.jetstream_limits, **jetstream_limits}
+            definition["jetstream"] = jetstream
+        with self._lock:
+            if name in self.accounts and name not in self._pending_removals:
+                raise ValueError(f"Account {name} already exists")
+            self._pending_removals.discard(name)
+            self.accounts[name] = definition
+            self._apply()
+        return IsolatedAccount(
+            name=name,
+            user=user,
+            password=password,
+            address=self.server.address,
+            port=self.server.port,
+            jetstream=jetstream,
+        )
+
+    def remove(
+        self, account: t.Union[str, IsolatedAccount], immediate: bool = False
+    ) -> None:
+        """Remove an account.
+
+        Arguments:
+            account: the account or its name.
+            immediate: reload configuration immediately instead of deferring removal. Default is False.
+        """
+        name = account if isinstance(account, str) else account.name
+        with self._lock:
+            if name not in self.accounts:
+                raise KeyError(name)
+            self._pending_removals.add(name)
+            if immediate:
+                self._apply()
+
+    def flush(self) -> None:
+        """Apply pending removals."""
+        with self._lock:
+            if self._pending_removals and self.server.is_alive():
+                self._apply()
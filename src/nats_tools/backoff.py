@@ -0,0 +1,79 @@
+"""Adaptive backoff used when polling monitoring endpoints."""
+
+import random
+import time
+import typing as t
+
+
+class Backoff:
+    def __init__(
+        self,
+        initial: float = 0.005,
+        maximum: float = 0.25,
+        factor: float = 2,
+        jitter: float = 0.1,
+    ) -> None:
+        """Create a new exponential backoff.
+
+        Polling starts fast, so that conditions which are already met (or met shortly) are detected
+        almost immediately, and slows down progressively to avoid hammering the server.
+
+        Arguments:
+            initial: first delay in seconds. Default is 5ms.
+            maximum: maximum delay in seconds. Default is 250ms.
+            factor: multiplier applied to delay after each attempt. Default is 2.
+            jitter: maximum relative random variation applied to each delay. Default is 0.1 (10%).
+        """
+        if initial <= 0 or maximum < initial:
+            raise ValueError("initial delay must be positive and lower than maximum")
+        if factor < 1:
+            raise ValueError("factor must be greater or equal to 1")
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self._delay = initial
+
+    def reset(self) -> None:
+        self._delay = self.initial
+
+    def next_delay(self) -> float:
+        """Return the next delay and increase delay for the following attempt."""
+        delay = self._delay
+        self._delay = min(self._delay * self.factor, self.maximum)
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return delay
+
+    def sleep(self, deadline: t.Optional[float] = None) -> None:
+        """Sleep for the next delay, without sleeping past deadline (a `time.monotonic()` value)."""
+        delay = self.next_delay()
+        if deadline is not None:
+            delay = min(delay, max(deadline - time.monotonic(), 0))
+        time.sleep(delay)
+
+    def wait(
+        self,
+        condition: t.Callable[[], bool],
+        timeout: t.Optional[float] = None,
+        message: t.Union[str, t.Callable[[], str]] = "condition",
+    ) -> None:
+        """Poll condition until it returns True.
+
+        Arguments:
+            condition: a callable returning True when condition is met.
+            timeout: maximum seconds to wait. Wait forever by default.
+            message: description of condition (or a callable returning one) used in timeout errors.
+
+        Raises:
+            TimeoutError: when condition is not met before timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.reset()
+        while not condition():
+            if deadline is not None and time.monotonic() >= deadline:
+                description = message() if callable(message) else message
+                raise TimeoutError(
+                    f"Timeout ({timeout:.3f}s) while waiting for {description}"
+                )
+            self.sleep(deadline)
@@ -0,0 +1,289 @@
+"""Minimal benchmark harness producing machine-readable results.
+
+Results are stored as JSON and can be compared against a baseline in order to detect
+regressions.
+
+Example:
+
+```python
+from nats_tools.benchmark import BenchmarkSuite
+from nats_tools.templates import ConfigGenerator
+
+suite = BenchmarkSuite()
+generator = ConfigGenerator()
+suite.run("config.render", generator.render, iterations=1000)
+suite.save("results.json")
+
+regressions = suite.compare(BenchmarkSuite.load("baseline.json"), threshold=0.2)
+```
+"""
+
+import asyncio
+import json
+import platform
+import sys
+import time
+import typing as t
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from nats_tools.stats import summarize
+
+
+@dataclass
+class BenchmarkResult:
+    """Result of a single benchmark.
+
+    Attributes:
+        name: name of the benchmark.
+        params: parameters of the benchmark (payload size, page size, ...).
+        samples: duration of each iteration in seconds.
+        elapsed: wall clock duration of all iterations in seconds.
+        operations: number of operations performed during all iterations.
+    """
+
+    name: str
+    params: t.Dict[str, t.Any] = field(default_factory=dict)
+    samples: t.List[float] = field(default_factory=list)
+    elapsed: float = 0
+    operations: int = 0
+
+    @property
+    def key(self) -> str:
+        """Unique key identifying benchmark and its parameters."""
+        if not self.params:
+            return self.name
+        params = ",".join(
+            f"{key}={value}" for key, value in sorted(self.params.items())
+        )
+        return f"{self.name}[{params}]"
+
+    @property
+    def throughput(self) -> float:
+        """Operations per second."""
+        return self.operations / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> t.Dict[str, float]:
+        return {**summarize(self.samples), "throughput": self.throughput}
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "name": self.name,
+            "params": self.params,
+            "elapsed": self.elapsed,
+            "operations": self.operations,
+            "summary": self.summary(),
+        }
+
+
+@dataclass
+class Regression:
+    """A metric which is worse than baseline by more than the allowed threshold."""
+
+    key: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else float("inf")
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.metric} {self.baseline:.6g} -> {self.current:.6g} ({self.ratio:.2f}x)"
+
+
+# Metrics where an increase is a regression. Throughput is handled separately since a decrease is a regression.
+LATENCY_METRICS = ("mean", "p50", "p90", "p95", "p99", "max")
+
+
+class BenchmarkSuite:
+    def __init__(self, name: str = "nats-tools") -> None:
+        """Create a new benchmark suite.
+
+        Arguments:
+            name: name of the suite, stored in results.
+        """
+        self.name = name
+        self.results: t.Dict[str, BenchmarkResult] = {}
+        self.summaries: t.Dict[str, t.Dict[str, float]] = {}
+
+    def add(self, result: BenchmarkResult) -> BenchmarkResult:
+        self.results[result.key] = result
+        self.summaries[result.key] = result.summary()
+        return result
+
+    def run(
+        self,
+        name: str,
+        func: t.Callable[[], t.Any],
+        iterations: int = 100,
+        warmup: int = 5,
+        params: t.Optional[t.Dict[str, t.Any]] = None,
+        operations_per_call: int = 1,
+        on_measure: t.Optional[t.Callable[[], t.Any]] = None,
+    ) -> BenchmarkResult:
+        """Measure a synchronous function.
+
+        Arguments:
+            name: name of the benchmark.
+            func: function called on each iteration.
+            iterations: number of measured iterations. Default is 100.
+            warmup: number of iterations executed before measuring. Default is 5.
+            params: benchmark parameters.
+            operations_per_call: number of operations performed by each call. Used to compute throughput.
+            on_measure: optional function called once warmup is done, for example to start profiling.
+        """
+        for _ in range(warmup):
+            func()
+        if on_measure:
+            on_measure()
+        samples: t.List[float] = []
+        clock = time.perf_counter
+        started = clock()
+        for _ in range(iterations):
+            before = clock()
+            func()
+            samples.append(clock() - before)
+        elapsed = clock() - started
+        return self.add(
+            BenchmarkResult(
+                name,
+                dict(params or {}),
+                samples,
+                elapsed,
+                iterations * operations_per_call,
+            )
+        )
+
+    def run_async(
+        self,
+        name: str,
+        func: t.Callable[[], t.Awaitable[t.Any]],
+        iterations: int = 100,
+        warmup: int = 5,
+        params: t.Optional[t.Dict[str, t.Any]] = None,
+        concurrency: int = 1,
+        setup: t.Optional[t.Callable[[], t.Awaitable[t.Any]]] = None,
+        teardown: t.Optional[t.Callable[[], t.Awaitable[t.Any]]] = None,
+        on_measure: t.Optional[t.Callable[[], t.Any]] = None,
+    ) -> BenchmarkResult:
+        """Measure a coroutine function within a new event loop.
+
+        Arguments:
+            name: name of the benchmark.
+            func: coroutine function awaited on each iteration.
+            iterations: number of measured iterations, spread across concurrent tasks. Default is 100.
+            warmup: number of iterations executed before measuring. Default is 5.
+            params: benchmark parameters.
+            concurrency: number of concurrent tasks. Default is 1.
+            setup: optional coroutine function awaited before warmup.
+            teardown: optional coroutine function awaited once measure is done.
+            on_measure: optional function called once warmup is done, for example to start profiling.
+        """
+        samples: t.List[float] = []
+        clock = time.perf_counter
+
+        async def worker(count: int) -> None:
+            for _ in range(count):
+                before = clock()
+                await func()
+                samples.append(clock() - before)
+
+        async def main() -> float:
+            if setup:
+                await setup()
+            try:
+                for _ in range(warmup):
+                    await func()
+                if on_measure:
+                    on_measure()
+                counts = [iterations // concurrency] * concurrency
+                for index in range(iterations % concurrency):
+                    counts[index] += 1
+                started = clock()
+                await asyncio.gather(*(worker(count) for count in counts))
+                return clock() - started
+            finally:
+                if teardown:
+                    await teardown()
+
+        elapsed = asyncio.run(main())
+        return self.add(
+            BenchmarkResult(
+                name,
+                {**(params or {}), "concurrency": concurrency},
+                samples,
+                elapsed,
+                iterations,
+            )
+        )
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "suite": self.name,
+            "created": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "results": {key: result.to_dict() for key, result in self.results.items()},
+        }
+
+    def save(self, path: t.Union[str, Path]) -> None:
+        """Write results to a JSON file."""
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+    @classmethod
+    def load(cls, path: t.Union[str, Path]) -> "BenchmarkSuite":
+        """Load results from a JSON file. Raw samples are not stored, only summaries are available."""
+        data = json.loads(Path(path).read_text())
+        suite = cls(data.get("suite", "nats-tools"))
+        for key, result in data["results"].items():
+            suite.summaries[key] = result["summary"]
+        return suite
+
+    def compare(
+        self,
+        baseline: "BenchmarkSuite",
+        threshold: float = 0.1,
+        metrics: t.Sequence[str] = ("p50", "throughput"),
+    ) -> t.List[Regression]:
+        """Compare results against a baseline.
+
+        Arguments:
+            baseline: the baseline suite.
+            threshold: allowed relative degradation. Default is 0.1 (10%).
+            metrics: metrics to compare. Latency metrics regress when they increase, throughput
+                regresses when it decreases. Default is `("p50", "throughput")`.
+
+        Returns:
+            the list of regressions. Benchmarks missing from baseline are ignored.
+        """
+        regressions: t.List[Regression] = []
+        for key, summary in self.summaries.items():
+            reference = baseline.summaries.get(key)
+            if reference is None:
+                continue
+            for metric in metrics:
+                if metric not in summary or metric not in reference:
+                    continue
+                current, expected = summary[metric], reference[metric]
+                if metric == "throughput":
+                    regressed = current < expected * (1 - threshold)
+                elif metric in LATENCY_METRICS:
+                    regressed = current > expected * (1 + threshold)
+                else:
+                    raise ValueError(f"Unsupported metric: {metric}")
+                if regressed:
+                    regressions.append(Regression(key, metric, expected, current))
+        return regressions
+
+    def report(self) -> str:
+        """Format results as a table."""
+        lines = [f"{'benchmark':<60} {'p50 (ms)':>10} {'p99 (ms)':>10} {'ops/s':>12}"]
+        for key, summary in self.summaries.items():
+            lines.append(
+                f"{key:<60} {summary.get('p50', 0) * 1000:>10.3f}"
+                f" {summary.get('p99', 0) * 1000:>10.3f}"
+                f" {summary.get('throughput', 0):>12.1f}"
+            )
+        return "\n".join(lines)
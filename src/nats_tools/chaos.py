@@ -0,0 +1,442 @@
+"""Inject faults into a group of servers and measure how long the group takes to recover.
+
+A `ChaosRunner` applies a schedule of `Signal` actions to members of a group of `NATSD` instances,
+either scripted as a list of `Fault`, or drawn at random. As soon as a fault is applied, one waiter
+per recovery milestone starts probing monitoring endpoints, and the time elapsed since the fault is
+recorded when each milestone is reached:
+
+- `exit`: the process exited (`KILL`, `QUIT`, `STOP` and `LDM` only).
+- `restart`: the process was started again after the configured downtime.
+- `healthz`: `/healthz` reports OK on all members.
+- `routes`: all members are routed to each other again (groups of several servers only).
+- `meta_leader`: a JetStream meta leader is elected and known by all surviving members (with
+  `jetstream=True`).
+- `stream_leader:<name>`: each monitored stream has a leader among the surviving members.
+- `stream:<name>`: each monitored stream has a leader and all its replicas are current.
+
+Surviving members are all members but the faulty one when the fault stops a process, so leader
+elections are measured while the faulty server is down. Waiters involving all members start once
+the faulty process exited. When a process does not exit in time, it is killed and started again so
+that following faults are applied to a complete group. When the group does not recover after a
+failure, the run is aborted.
+
+`nats-server` waits 2 minutes by default before exiting in lame duck mode, so `LDM` is not part of
+default actions. Configure a short `lame_duck_duration` on servers before using it.
+
+Recovery times are then summarized per action:
+
+```python
+from nats_tools.chaos import ChaosRunner
+from nats_tools.natsd import Signal
+from nats_tools.topology import NATSCluster
+
+with NATSCluster(size=3, with_jetstream=True, lame_duck_duration="2s") as cluster:
+    runner = ChaosRunner(
+        cluster.nodes, actions=[Signal.KILL, Signal.LDM], faults=20, jetstream=True, seed=1
+    )
+    report = runner.run()
+    print("\\n".join(report.format()))
+```
+"""
+
+import functools
+import json
+import random
+import subprocess
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from nats_tools.backoff import Backoff
+from nats_tools.natsd import NATSD, Signal
+from nats_tools.readiness import (
+    wait_for_cluster,
+    wait_for_full_mesh,
+    wait_for_healthz,
+    wait_for_meta_leader,
+    wait_for_stream_replicas,
+)
+from nats_tools.stats import summarize
+
+# Actions used by default in random schedules
+DEFAULT_ACTIONS = (Signal.KILL, Signal.STOP, Signal.RELOAD)
+# Actions after which the process exits and is started again
+EXITING_ACTIONS = (Signal.KILL, Signal.QUIT, Signal.STOP, Signal.LDM)
+
+
+@dataclass(frozen=True)
+class Fault:
+    """An action applied to a member of the group, designated by its index."""
+
+    action: Signal
+    target: int
+    # Seconds to wait before starting the process again, for actions which stop it
+    downtime: float = 0
+
+    def __post_init__(self) -> None:
+        if self.action == Signal.REOPEN:
+            raise ValueError("REOPEN signal does not cause any fault")
+        if self.downtime < 0:
+            raise ValueError("downtime must not be negative")
+
+
+@dataclass
+class Recovery:
+    """Milestones reached after a fault, in seconds since the fault was applied."""
+
+    fault: Fault
+    # Seconds since the beginning of the run when the fault was applied
+    offset: float
+    milestones: t.Dict[str, float] = field(default_factory=dict)
+    error: t.Optional[str] = None
+
+    @property
+    def recovered(self) -> bool:
+        return self.error is None
+
+    @property
+    def duration(self) -> t.Optional[float]:
+        """Seconds until the last milestone was reached, or None when group did not recover."""
+        if self.error is not None or not self.milestones:
+            return None
+        return max(self.milestones.values())
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "action": self.fault.action.name,
+            "target": self.fault.target,
+            "downtime": self.fault.downtime,
+            "offset": self.offset,
+            "milestones": self.milestones,
+            "error": self.error,
+        }
+
+
+@dataclass
+class _Waiter:
+    """Wait for a recovery milestone."""
+
+    name: str
+    # Called with the maximum number of seconds to wait as timeout argument
+    wait: t.Callable[..., t.Any]
+    # Whether probes start only once the faulty process exited
+    after_exit: bool
+
+
+class ChaosReport:
+    def __init__(
+        self,
+        recoveries: t.Optional[t.List[Recovery]] = None,
+        aborted: t.Optional[str] = None,
+    ) -> None:
+        """Create a new report from the recoveries of faults applied during a run.
+
+        Arguments:
+            recoveries: recoveries of applied faults, in order.
+            aborted: reason why the run was aborted before all faults were applied, if any.
+        """
+        self.recoveries: t.List[Recovery] = list(recoveries or [])
+        self.aborted = aborted
+
+    def __len__(self) -> int:
+        return len(self.recoveries)
+
+    @property
+    def failures(self) -> t.List[Recovery]:
+        """Recoveries which did not complete before timeout."""
+        return [recovery for recovery in self.recoveries if not recovery.recovered]
+
+    def summary(self) -> t.Dict[str, t.Dict[str, t.Dict[str, float]]]:
+        """Summarize recovery times, indexed by action name, then by milestone.
+
+        The `total` milestone is the time until the last milestone was reached. Faults which did
+        not recover are excluded.
+        """
+        samples: t.Dict[str, t.Dict[str, t.List[float]]] = {}
+        for recovery in self.recoveries:
+            if not recovery.recovered:
+                continue
+            milestones = samples.setdefault(recovery.fault.action.name, {})
+            for name, value in recovery.milestones.items():
+                milestones.setdefault(name, []).append(value)
+            if recovery.duration is not None:
+                milestones.setdefault("total", []).append(recovery.duration)
+        return {
+            action: {name: summarize(values) for name, values in milestones.items()}
+            for action, milestones in samples.items()
+        }
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "faults": len(self.recoveries),
+            "failures": len(self.failures),
+            "aborted": self.aborted,
+            "summary": self.summary(),
+            "recoveries": [recovery.to_dict() for recovery in self.recoveries],
+        }
+
+    def save(self, path: t.Union[str, Path]) -> None:
+        """Write report to a JSON file."""
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def format(self) -> t.List[str]:
+        """Format report as lines of text."""
+        lines = [
+            f"{len(self.recoveries)} faults applied, {len(self.failures)} did not recover",
+        ]
+        if self.aborted:
+            lines.append(f"run aborted: {self.aborted}")
+        lines += [
+            f"{'action':<8} {'milestone':<16} {'count':>6} {'p50 (ms)':>10}"
+            f" {'p90 (ms)':>10} {'p99 (ms)':>10} {'max (ms)':>10}",
+        ]
+        for action, milestones in self.summary().items():
+            for name, summary in milestones.items():
+                lines.append(
+                    f"{action:<8} {name:<16} {summary['count']:>6}"
+                    f" {summary['p50'] * 1000:>10.1f} {summary['p90'] * 1000:>10.1f}"
+                    f" {summary['p99'] * 1000:>10.1f} {summary['max'] * 1000:>10.1f}"
+                )
+        return lines
+
+
+class ChaosRunner:
+    def __init__(
+        self,
+        servers: t.Sequence[NATSD],
+        schedule: t.Optional[t.Sequence[Fault]] = None,
+        actions: t.Sequence[Signal] = DEFAULT_ACTIONS,
+        faults: int = 10,
+        downtime: float = 0,
+        interval: float = 0,
+        jetstream: bool = False,
+        streams: t.Sequence[str] = (),
+        recovery_timeout: float = 30,
+        poll_interval: float = 0.01,
+        seed: t.Optional[int] = None,
+    ) -> None:
+        """Create a new runner. Servers must be started before `run()` is called.
+
+        Arguments:
+            servers: members of the group, usually the nodes of a cluster.
+            schedule: faults to apply, in order. Default to a random schedule.
+            actions: actions drawn in random schedules. Default to KILL, STOP and RELOAD.
+            faults: number of faults in random schedules. Default is 10.
+            downtime: seconds a stopped server stays down in random schedules. Default is 0.
+            interval: seconds to wait after the group recovered, before next fault. Default is 0.
+            jetstream: wait for JetStream meta leader election after each fault. Default is False.
+            streams: names of streams which must have a leader and current replicas after each fault.
+            recovery_timeout: maximum seconds to wait for the process to exit, and for each milestone
+                once it is probed. Default is 30 seconds.
+            poll_interval: maximum seconds between two probes of a milestone, which bounds the
+                accuracy of measures. Default is 10ms.
+            seed: seed of the random generator used for random schedules.
+        """
+        if not servers:
+            raise ValueError("at least one server is required")
+        self.servers = list(servers)
+        self.rng = random.Random(seed)
+        if schedule is None:
+            if not actions:
+                raise ValueError("at least one action is required")
+            schedule = [
+                Fault(
+                    self.rng.choice(list(actions)),
+                    self.rng.randrange(len(self.servers)),
+                    downtime,
+                )
+                for _ in range(faults)
+            ]
+        for fault in schedule:
+            if not 0 <= fault.target < len(self.servers):
+                raise ValueError(f"Invalid fault target: {fault.target}")
+        self.schedule = list(schedule)
+        self.interval = interval
+        self.jetstream = jetstream
+        self.streams = list(streams)
+        self.recovery_timeout = recovery_timeout
+        self.poll_interval = poll_interval
+
+    def _backoff(self) -> Backoff:
+        return Backoff(
+            initial=min(0.001, self.poll_interval), maximum=self.poll_interval
+        )
+
+    def apply(
+        self,
+        fault: Fault,
+        recovery: Recovery,
+        started: float,
+        exited: threading.Event,
+    ) -> None:
+        """Apply a fault and record milestones reached by the faulty server itself.
+
+        `exited` is set once the faulty process exited, or right after the signal was sent for
+        actions which do not stop the process. A process which does not exit before timeout is
+        killed and started again, then the timeout is raised.
+        """
+        server = self.servers[fault.target]
+        error: t.Optional[subprocess.TimeoutExpired] = None
+        try:
+            server.send_signal(fault.action)
+            if fault.action not in EXITING_ACTIONS:
+                return
+            try:
+                server.wait(timeout=self.recovery_timeout)
+                recovery.milestones["exit"] = time.monotonic() - started
+            except subprocess.TimeoutExpired as exc:
+                # Following faults would be applied to a degraded group otherwise
+                error = exc
+                server.send_signal(Signal.KILL)
+                server.wait()
+        finally:
+            exited.set()
+        if fault.downtime:
+            time.sleep(fault.downtime)
+        server.start()
+        recovery.milestones["restart"] = time.monotonic() - started
+        if error is not None:
+            raise error
+
+    def waiters(self, fault: Fault) -> t.List[_Waiter]:
+        """Return the waiters of recovery milestones after a fault.
+
+        Leaders are expected to be elected among surviving members, which do not include the
+        faulty server when the fault stops its process.
+        """
+        group = self.servers
+        survivors = group
+        if fault.action in EXITING_ACTIONS and len(group) > 1:
+            survivors = [
+                server for index, server in enumerate(group) if index != fault.target
+            ]
+        # A single server has no survivor, its leaders are elected after restart
+        leaders_after_exit = survivors is group and fault.action in EXITING_ACTIONS
+        waiters = [
+            _Waiter(
+                "healthz",
+                functools.partial(
+                    wait_for_healthz,
+                    group,
+                    js_enabled=self.jetstream,
+                    js_server_only=self.jetstream,
+                    backoff=self._backoff(),
+                ),
+                after_exit=True,
+            )
+        ]
+        if len(group) > 1:
+            waiters.append(
+                _Waiter(
+                    "routes",
+                    functools.partial(
+                        wait_for_full_mesh, group, backoff=self._backoff()
+                    ),
+                    after_exit=True,
+                )
+            )
+        if self.jetstream:
+            waiters.append(
+                _Waiter(
+                    "meta_leader",
+                    functools.partial(
+                        wait_for_meta_leader, survivors, backoff=self._backoff()
+                    ),
+                    after_exit=leaders_after_exit,
+                )
+            )
+        for stream in self.streams:
+            waiters.append(
+                _Waiter(
+                    f"stream_leader:{stream}",
+                    functools.partial(
+                        wait_for_stream_replicas,
+                        survivors,
+                        stream,
+                        replicas=1,
+                        backoff=self._backoff(),
+                    ),
+                    after_exit=leaders_after_exit,
+                )
+            )
+            waiters.append(
+                _Waiter(
+                    f"stream:{stream}",
+                    functools.partial(
+                        wait_for_stream_replicas,
+                        group,
+                        stream,
+                        backoff=self._backoff(),
+                    ),
+                    after_exit=True,
+                )
+            )
+        return waiters
+
+    def reach(
+        self,
+        waiter: _Waiter,
+        recovery: Recovery,
+        started: float,
+        exited: threading.Event,
+    ) -> None:
+        """Wait for a milestone and record the time it was reached."""
+        if waiter.after_exit:
+            exited.wait()
+        waiter.wait(timeout=self.recovery_timeout)
+        recovery.milestones[waiter.name] = time.monotonic() - started
+
+    def inject(self, fault: Fault, recovery: Recovery, started: float) -> None:
+        """Apply a fault while waiting concurrently for each recovery milestone.
+
+        The first error encountered is recorded in the recovery.
+        """
+        exited = threading.Event()
+        waiters = self.waiters(fault)
+        with ThreadPoolExecutor(max_workers=len(waiters) + 1) as executor:
+            futures = [executor.submit(self.apply, fault, recovery, started, exited)]
+            futures.extend(
+                executor.submit(self.reach, waiter, recovery, started, exited)
+                for waiter in waiters
+            )
+        for future in futures:
+            try:
+                future.result()
+            except (TimeoutError, subprocess.TimeoutExpired) as exc:
+                if recovery.error is None:
+                    recovery.error = str(exc)
+        # Milestones are reached concurrently, keep them in the order they were reached
+        recovery.milestones = dict(
+            sorted(recovery.milestones.items(), key=lambda item: item[1])
+        )
+
+    def run(self) -> ChaosReport:
+        """Apply all faults of the schedule, one after the other, and wait for recovery after each.
+
+        Faults from which the group does not recover before timeout are reported as failures. The
+        run goes on once the group is healthy again, and is aborted when it does not recover.
+        """
+        report = ChaosReport()
+        began = time.monotonic()
+        for index, fault in enumerate(self.schedule):
+            started = time.monotonic()
+            recovery = Recovery(fault, offset=started - began)
+            report.recoveries.append(recovery)
+            self.inject(fault, recovery, started)
+            if not recovery.recovered and index + 1 < len(self.schedule):
+                try:
+                    wait_for_cluster(
+                        self.servers,
+                        jetstream=self.jetstream,
+                        timeout=self.recovery_timeout,
+                        backoff=self._backoff(),
+                    )
+                except TimeoutError as exc:
+                    report.aborted = f"group did not recover after fault {index}: {exc}"
+                    break
+            if self.interval:
+                time.sleep(self.interval)
+        return report
@@ -0,0 +1,96 @@
+"""Collect time spent in nats-server fixtures during a test session.
+
+The pytest plugin records the lifecycle timings of each `NATSD` instance created by fixtures and
+prints a summary at the end of the session. Results can also be exported to JSON using the
+`--nats-cost-json` option. With pytest-xdist, each worker sends its timings to the controller when
+it finishes, and the controller merges them into a single report.
+"""
+
+import json
+import typing as t
+from pathlib import Path
+
+from nats_tools.stats import summarize
+
+# Lifecycle phases of a server, in order
+PHASES = ("render", "resolve", "spawn", "ready", "stop", "cleanup")
+
+
+class CostReport:
+    def __init__(self) -> None:
+        """Create a new report. Timings are recorded per test and per phase."""
+        self.tests: t.Dict[str, t.Dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.tests)
+
+    def record(self, test: str, timings: t.Mapping[str, float]) -> None:
+        """Record timings of a server used by a test.
+
+        Timings of several servers used by the same test are added. Timings which are not listed
+        in `PHASES` overlap with other phases and are ignored.
+        """
+        totals = self.tests.setdefault(test, {})
+        for phase, duration in timings.items():
+            if phase not in PHASES:
+                continue
+            totals[phase] = totals.get(phase, 0.0) + duration
+
+    def merge(self, tests: t.Mapping[str, t.Mapping[str, float]]) -> None:
+        """Add timings recorded by another report, indexed by test then by phase."""
+        for test, timings in tests.items():
+            self.record(test, timings)
+
+    def total(self, test: str) -> float:
+        return sum(self.tests[test].values())
+
+    def phases(self) -> t.Dict[str, t.Dict[str, float]]:
+        """Summarize durations of each phase across all tests."""
+        return {
+            phase: summarize(
+                [timings[phase] for timings in self.tests.values() if phase in timings]
+            )
+            for phase in PHASES
+        }
+
+    def slowest(self, count: int = 5) -> t.List[t.Tuple[str, float]]:
+        """Return tests spending the most time in server fixtures, with their total duration."""
+        ranked = sorted(
+            ((test, self.total(test)) for test in self.tests),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return ranked[:count]
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "total": sum(self.total(test) for test in self.tests),
+            "phases": self.phases(),
+            "tests": self.tests,
+        }
+
+    def save(self, path: t.Union[str, Path]) -> None:
+        """Write report to a JSON file."""
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def format(self, slowest: int = 5) -> t.List[str]:
+        """Format report as lines of text."""
+        total = sum(self.total(test) for test in self.tests)
+        lines = [
+            f"{len(self.tests)} tests spent {total:.3f}s in nats-server fixtures",
+            f"{'phase':<10} {'count':>6} {'total (s)':>10} {'p50 (ms)':>10}"
+            f" {'p99 (ms)':>10} {'max (ms)':>10}",
+        ]
+        for phase, summary in self.phases().items():
+            if not summary["count"]:
+                continue
+            lines.append(
+                f"{phase:<10} {summary['count']:>6} {summary['total']:>10.3f}"
+                f" {summary['p50'] * 1000:>10.1f} {summary['p99'] * 1000:>10.1f}"
+                f" {summary['max'] * 1000:>10.1f}"
+            )
+        if slowest:
+            lines.append("slowest tests:")
+            for test, duration in self.slowest(slowest):
+                lines.append(f"  {duration:.3f}s {test}")
+        return lines
@@ -0,0 +1,237 @@
+"""Profile how a server drains its client connections in lame duck mode.
+
+`profile_lame_duck()` puts a server in lame duck mode, then polls its connections using paginated
+`/connz` requests until the process exits. The number of connections remaining over time forms the
+drain curve. When peers are given, they are polled concurrently, and each evicted client is matched
+by its connection name to measure how long it took to reconnect to another server.
+
+Connections closed while pages are requested shift the following ones to lower offsets. Pages are
+thus sorted by connection ID and overlap, so that open connections are never skipped and mistaken
+for evicted ones.
+
+Example:
+
+```python
+from nats_tools.drain import profile_lame_duck
+
+report = profile_lame_duck(cluster.nodes[0], peers=cluster.nodes[1:])
+print("\\n".join(report.format()))
+```
+
+Clients must connect with distinct names for reconnections to be measured.
+"""
+
+import json
+import time
+import typing as t
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from nats_tools.monitor import NATSMonitor, SortOption
+from nats_tools.natsd import NATSD
+from nats_tools.readiness import Target, get_monitor, probe
+from nats_tools.stats import summarize
+
+
+def list_connections(
+    monitor: NATSMonitor, page_size: int = 1024
+) -> t.List[t.Dict[str, t.Any]]:
+    """Return all open connections of a server, requesting `/connz` page by page.
+
+    Each page starts with the last connection of the previous page. When it does not, connections
+    were closed in between and the page is requested again from a lower offset, since open
+    connections may have shifted before it.
+    """
+    if page_size < 2:
+        raise ValueError("page_size must be at least 2")
+    connections: t.List[t.Dict[str, t.Any]] = []
+    offset = 0
+    # Highest connection ID listed so far
+    last: t.Optional[int] = None
+    while True:
+        page = monitor.connz(sort=SortOption.CID, offset=offset, limit=page_size)
+        items = page.get("connections") or []
+        if last is not None and offset and (not items or items[0]["cid"] > last):
+            offset = max(0, offset - page_size + 1)
+            continue
+        connections.extend(item for item in items if last is None or item["cid"] > last)
+        if connections:
+            last = connections[-1]["cid"]
+        if len(items) < page_size or offset + len(items) >= page.get("total", 0):
+            return connections
+        offset += len(items) - 1
+
+
+@dataclass
+class DrainReport:
+    """Connections of a server observed while it was in lame duck mode.
+
+    All times are in seconds since lame duck mode was entered.
+    """
+
+    initial: int
+    # Number of connections remaining over time
+    curve: t.List[t.Tuple[float, int]] = field(default_factory=list)
+    # Time when no connection remained, or None when process exited before
+    drained_at: t.Optional[float] = None
+    exited_at: t.Optional[float] = None
+    returncode: t.Optional[int] = None
+    # Time each tracked client was evicted, indexed by client name
+    evictions: t.Dict[str, float] = field(default_factory=dict)
+    # Delay between eviction and reconnection to a peer, indexed by client name
+    reconnects: t.Dict[str, float] = field(default_factory=dict)
+    # Names of evicted clients which did not reconnect to any peer
+    lost: t.List[str] = field(default_factory=list)
+
+    def summary(self) -> t.Dict[str, t.Any]:
+        return {
+            "initial": self.initial,
+            "drained_at": self.drained_at,
+            "exited_at": self.exited_at,
+            "returncode": self.returncode,
+            "reconnect": summarize(list(self.reconnects.values())),
+            "lost": len(self.lost),
+        }
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            **self.summary(),
+            "curve": self.curve,
+            "evictions": self.evictions,
+            "reconnects": self.reconnects,
+            "lost_clients": self.lost,
+        }
+
+    def save(self, path: t.Union[str, Path]) -> None:
+        """Write report to a JSON file."""
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def format(self) -> t.List[str]:
+        """Format report as lines of text."""
+
+        def _seconds(value: t.Optional[float]) -> str:
+            return "n/a" if value is None else f"{value:.3f}s"
+
+        lines = [
+            f"{self.initial} connections drained in {_seconds(self.drained_at)},"
+            f" process exited after {_seconds(self.exited_at)} with status {self.returncode}",
+        ]
+        reconnect = summarize(list(self.reconnects.values()))
+        if reconnect["count"]:
+            lines.append(
+                f"{reconnect['count']} clients reconnected:"
+                f" p50 {reconnect['p50'] * 1000:.1f}ms, p90 {reconnect['p90'] * 1000:.1f}ms,"
+                f" p99 {reconnect['p99'] * 1000:.1f}ms, max {reconnect['max'] * 1000:.1f}ms"
+            )
+        if self.lost:
+            lines.append(f"{len(self.lost)} clients did not reconnect")
+        return lines
+
+
+def profile_lame_duck(
+    server: NATSD,
+    peers: t.Sequence[Target] = (),
+    interval: float = 0.01,
+    page_size: int = 1024,
+    timeout: t.Optional[float] = 180,
+    reconnect_timeout: float = 10,
+) -> DrainReport:
+    """Enter lame duck mode and record how connections drain until the process exits.
+
+    Arguments:
+        server: a running server.
+        peers: servers or monitors clients are expected to reconnect to. Omitted by default.
+        interval: seconds between two polls. Default is 10ms.
+        page_size: number of connections requested in each `/connz` page. Default is 1024.
+        timeout: maximum seconds to wait for the process to exit. Default is 180 seconds, which is
+            longer than the default lame duck duration of nats-server.
+        reconnect_timeout: maximum seconds to wait for evicted clients to reconnect once the process
+            exited. Default is 10 seconds.
+
+    Returns:
+        a report holding the drain curve, the exit status and reconnection delays.
+
+    Raises:
+        TimeoutError: when process does not exit before timeout.
+    """
+    if server.proc is None:
+        raise TypeError("Process is not started yet")
+    monitor = server.monitor
+    peer_monitors = [get_monitor(peer) for peer in peers]
+
+    def _names(results: t.Sequence[t.Any]) -> t.Set[str]:
+        return {
+            connection["name"]
+            for result in results
+            if not isinstance(result, Exception)
+            for connection in result
+            if connection.get("name")
+        }
+
+    initial = list_connections(monitor, page_size)
+    # Clients already connected to a peer cannot be told apart from reconnected clients
+    ignored = _names(
+        probe(peer_monitors, lambda peer: list_connections(peer, page_size))
+    )
+    names = {
+        connection["cid"]: connection.get("name") or ""
+        for connection in initial
+        if connection.get("name") and connection["name"] not in ignored
+    }
+    remaining = {connection["cid"] for connection in initial}
+    report = DrainReport(initial=len(initial), curve=[(0.0, len(initial))])
+    # Time each tracked client was evicted, indexed by name
+    evicted = report.evictions
+
+    def _evict(cids: t.Iterable[int], elapsed: float) -> None:
+        for cid in cids:
+            name = names.get(cid)
+            if name and name not in evicted:
+                evicted[name] = elapsed
+
+    def _match_reconnects(results: t.Sequence[t.Any], elapsed: float) -> None:
+        for name in _names(results):
+            if name in evicted and name not in report.reconnects:
+                report.reconnects[name] = max(0.0, elapsed - evicted[name])
+
+    started = time.monotonic()
+    deadline = None if timeout is None else started + timeout
+    server.enter_lame_duck_mode()
+    while True:
+        results = probe(
+            [monitor, *peer_monitors],
+            lambda target: list_connections(target, page_size),
+        )
+        elapsed = time.monotonic() - started
+        local = results[0]
+        if not isinstance(local, Exception):
+            current = {connection["cid"] for connection in local}
+            report.curve.append((elapsed, len(current)))
+            _evict(remaining - current, elapsed)
+            remaining &= current
+            if not current and report.drained_at is None:
+                report.drained_at = elapsed
+        _match_reconnects(results[1:], elapsed)
+        if server.proc.poll() is not None:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(
+                f"Timeout ({timeout:.3f}s) while waiting for server in lame duck mode to exit"
+            )
+        time.sleep(interval)
+    report.exited_at = time.monotonic() - started
+    report.returncode = server.wait()
+    # Connections still open when process exited are closed by the exit
+    _evict(remaining, report.exited_at)
+    reconnect_deadline = time.monotonic() + reconnect_timeout
+    while peer_monitors and len(report.reconnects) < len(evicted):
+        if time.monotonic() >= reconnect_deadline:
+            break
+        time.sleep(interval)
+        results = probe(
+            peer_monitors, lambda target: list_connections(target, page_size)
+        )
+        _match_reconnects(results, time.monotonic() - started)
+    if peer_monitors:
+        report.lost = sorted(set(evicted) - set(report.reconnects))
+    return report
@@ -0,0 +1,164 @@
+"""Minimal HTTP server running in a background thread.
+
+This module is used by fake monitoring servers (replay, simulator, ...) which must answer
+`NATSMonitor` requests without a running nats-server. It also holds helpers parsing query
+parameters and formatting values the way nats-server does.
+"""
+
+import json
+import threading
+import types
+import typing as t
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+Response = t.Tuple[int, bytes]
+S = t.TypeVar("S", bound="BackgroundHTTPServer")
+
+
+def json_response(payload: t.Any, status: int = 200) -> Response:
+    """Serialize payload to a compact JSON response."""
+    return status, json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def error_response(status: int, message: str) -> Response:
+    """Return an error response formatted like nats-server errors."""
+    return json_response({"error": message}, status=status)
+
+
+def parse_bool(value: t.Optional[str], default: bool = False) -> bool:
+    """Parse a query parameter the same way as Go strconv.ParseBool."""
+    if value is None or value == "":
+        return default
+    if value in ("1", "t", "T", "TRUE", "true", "True"):
+        return True
+    if value in ("0", "f", "F", "FALSE", "false", "False"):
+        return False
+    raise ValueError(f'strconv.ParseBool: parsing "{value}": invalid syntax')
+
+
+def parse_int(value: t.Optional[str]) -> int:
+    """Parse an integer query parameter, defaulting to 0 when missing or empty."""
+    if value is None or value == "":
+        return 0
+    return int(value)
+
+
+def format_timestamp(value: datetime) -> str:
+    """Format a UTC timestamp the way nats-server does in monitoring responses."""
+    return value.replace(tzinfo=None).isoformat(timespec="microseconds") + "Z"
+
+
+def format_uptime(seconds: float) -> str:
+    """Format a duration the way nats-server does for uptime and idle times, e.g. `1h2m3s`."""
+    total = int(seconds)
+    days, total = divmod(total, 86400)
+    hours, total = divmod(total, 3600)
+    minutes, secs = divmod(total, 60)
+    result = ""
+    if days:
+        result += f"{days}d"
+    if days or hours:
+        result += f"{hours}h"
+    if days or hours or minutes:
+        result += f"{minutes}m"
+    return result + f"{secs}s"
+
+
+class BackgroundHTTPServer:
+    # Seconds between checks for a shutdown request, which bound the duration of `stop()`
+    poll_interval = 0.5
+
+    def __init__(self, address: str = "127.0.0.1", port: int = 0) -> None:
+        """Create a new HTTP server. Server is not started until `start()` is called.
+
+        Arguments:
+            address: address server should listen to. Default is 127.0.0.1.
+            port: port server should listen to. Default to a random free port.
+        """
+        self.address = address
+        self.port = port
+        self._server: t.Optional[ThreadingHTTPServer] = None
+        self._thread: t.Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.address}:{self.port}"
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        """Handle a GET request and return a status code and a body.
+
+        Arguments:
+            path: the request path, e.g. `/varz`.
+            params: the query parameters. When a parameter is repeated, last value wins.
+            query: the raw query string.
+        """
+        raise NotImplementedError
+
+    def _handler_class(self) -> t.Type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, Nagle algorithm would delay responses
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:  # noqa: N802
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query, keep_blank_values=True))
+                try:
+                    status, body = server.handle(url.path, params, url.query)
+                except Exception as exc:
+                    status, body = error_response(500, repr(exc))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: t.Any) -> None:
+                return None
+
+        return Handler
+
+    def start(self: S) -> S:
+        if self._server is not None:
+            return self
+        self._server = ThreadingHTTPServer(
+            (self.address, self.port), self._handler_class()
+        )
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            args=(self.poll_interval,),
+            name=f"{type(self).__name__}-{self.port}",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self: S) -> S:
+        return self.start()
+
+    def __exit__(
+        self,
+        error_type: t.Optional[t.Type[BaseException]] = None,
+        error: t.Optional[BaseException] = None,
+        traceback: t.Optional[types.TracebackType] = None,
+    ) -> None:
+        self.stop()
@@ -0,0 +1,393 @@
+"""Follow and search nats-server log files, including rotated files.
+
+nats-server rotates its log file when `log_size_limit` is reached: the file is renamed with a
+timestamp suffix (`nats.log.2024.01.02.15.04.05.123456789`) and a new file is created. Files can
+also be rotated externally, before `NATSD.reopen_log_file()` makes the server open a new file.
+
+`LogFollower` keeps track of the inode and offset of the file it reads, so that it only reads
+appended bytes, and does not lose lines written to a file just before it was rotated:
+
+```python
+from nats_tools.logs import LogFollower
+
+follower = LogFollower(server.log_file)
+for line in follower.read_lines():
+    ...
+```
+
+`LogSearch` searches the current and rotated files using memory maps. Each file gets a sparse
+index mapping timestamps to offsets, built by reading a single line every `stride` bytes, so that
+time window queries only read the lines within the window. Timestamps are only written when
+`logtime` is enabled, which is the default.
+
+```python
+from datetime import datetime, timedelta
+from nats_tools.logs import LogSearch
+
+with LogSearch(server.log_file) as logs:
+    for line in logs.search(start=datetime.now() - timedelta(minutes=1), pattern=r"\\[ERR\\]"):
+        print(line.timestamp, line.text)
+```
+"""
+
+import bisect
+import mmap
+import os
+import re
+import typing as t
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+# Distance in bytes between two entries of the sparse index
+DEFAULT_STRIDE = 64 * 1024
+# Timestamp written by nats-server when logtime is enabled, after the process ID
+TIMESTAMP = re.compile(
+    rb"^\[\d+\] (\d{4})/(\d\d)/(\d\d) (\d\d):(\d\d):(\d\d)\.(\d{6}) "
+)
+
+
+def parse_timestamp(line: bytes) -> t.Optional[datetime]:
+    """Return the timestamp of a log line, or None when line does not start with a timestamp."""
+    match = TIMESTAMP.match(line)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, micros = map(int, match.groups())
+    return datetime(year, month, day, hour, minute, second, micros)
+
+
+def rotated_files(path: t.Union[str, Path]) -> t.List[Path]:
+    """Return files rotated from a log file, oldest first."""
+    path = Path(path)
+    if not path.parent.is_dir():
+        return []
+    candidates = [
+        candidate
+        for candidate in path.parent.glob(f"{path.name}.*")
+        if candidate.is_file()
+    ]
+    return sorted(candidates, key=lambda item: (item.stat().st_mtime, item.name))
+
+
+def _identity(stat: os.stat_result) -> t.Tuple[int, int]:
+    return stat.st_dev, stat.st_ino
+
+
+class LogFollower:
+    def __init__(self, path: t.Union[str, Path], from_start: bool = True) -> None:
+        """Create a follower of a log file. File does not need to exist yet.
+
+        Arguments:
+            path: path of the log file.
+            from_start: read lines already written to the file. When False, only lines appended
+                after the follower was created are read. Default is True.
+        """
+        self.path = Path(path)
+        self._file: t.Optional[t.BinaryIO] = None
+        self._identity: t.Optional[t.Tuple[int, int]] = None
+        self._buffer = b""
+        # Number of times the file was rotated or truncated since follower was created
+        self.rotations = 0
+        if not from_start and self._open():
+            t.cast(t.BinaryIO, self._file).seek(0, os.SEEK_END)
+
+    @property
+    def offset(self) -> int:
+        """Offset of the next byte to read in the current file."""
+        return self._file.tell() if self._file is not None else 0
+
+    def _open(self) -> bool:
+        try:
+            handle = self.path.open("rb")
+        except FileNotFoundError:
+            return False
+        self._file = handle
+        self._identity = _identity(os.fstat(handle.fileno()))
+        return True
+
+    def _read(self, lines: t.List[str], final: bool = False) -> None:
+        """Read appended bytes, keeping the last line until it is complete."""
+        data = t.cast(t.BinaryIO, self._file).read()
+        if not data and not final:
+            return
+        data = self._buffer + data
+        *complete, self._buffer = data.split(b"\n")
+        if final and self._buffer:
+            complete.append(self._buffer)
+            self._buffer = b""
+        lines.extend(line.decode("utf-8", errors="replace") for line in complete)
+
+    def read_lines(self) -> t.List[str]:
+        """Return lines appended since last call, following rotations and truncations."""
+        lines: t.List[str] = []
+        if self._file is None and not self._open():
+            return lines
+        self._read(lines)
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            # File was renamed and no new file was created yet
+            return lines
+        if _identity(stat) != self._identity:
+            # Old file may have been written between the read and the rotation
+            self._read(lines, final=True)
+            self.close()
+            self.rotations += 1
+            if self._open():
+                self._read(lines)
+        elif stat.st_size < self.offset:
+            # File was truncated in place
+            self.rotations += 1
+            self._buffer = b""
+            t.cast(t.BinaryIO, self._file).seek(0)
+            self._read(lines)
+        return lines
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._identity = None
+
+    def __enter__(self) -> "LogFollower":
+        return self
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.close()
+
+
+@dataclass(frozen=True)
+class LogLine:
+    # Timestamp of the line, or of the previous line for lines without timestamp
+    timestamp: t.Optional[datetime]
+    text: str
+    path: str
+    offset: int
+
+
+class LogIndex:
+    def __init__(self, path: t.Union[str, Path], stride: int = DEFAULT_STRIDE) -> None:
+        """Map a log file in memory and index its timestamps.
+
+        Arguments:
+            path: path of the log file.
+            stride: distance in bytes between two entries of the index. Default is 64KiB.
+        """
+        if stride <= 0:
+            raise ValueError("stride must be a positive number of bytes")
+        self.path = Path(path)
+        self.stride = stride
+        self._file = self.path.open("rb")
+        self.identity = _identity(os.fstat(self._file.fileno()))
+        self._map: t.Optional[mmap.mmap] = None
+        self.size = 0
+        # Sparse index: timestamps, and offsets of the lines holding them
+        self.timestamps: t.List[datetime] = []
+        self.offsets: t.List[int] = []
+        self._indexed = 0
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def refresh(self) -> None:
+        """Map bytes appended since last refresh and extend the index."""
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self.size:
+            # File was truncated, index must be rebuilt
+            self.timestamps, self.offsets, self._indexed = [], [], 0
+        elif size == self.size:
+            return
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.size = size
+        if size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        while self._indexed < size:
+            self._index(self._indexed)
+            self._indexed += self.stride
+
+    def _line_start(self, offset: int) -> int:
+        """Return the offset of the first line starting at or after offset."""
+        if offset == 0:
+            return 0
+        end = t.cast(mmap.mmap, self._map).find(b"\n", offset - 1)
+        return self.size if end < 0 else end + 1
+
+    def _index(self, offset: int) -> None:
+        """Add the first timestamp found within a stride from offset to the index."""
+        start = self._line_start(offset)
+        limit = min(offset + self.stride, self.size)
+        while start < limit:
+            line, end = self._line(start)
+            timestamp = parse_timestamp(line)
+            if timestamp is not None:
+                # Keep index sorted when clock goes backward
+                if not self.timestamps or timestamp >= self.timestamps[-1]:
+                    self.timestamps.append(timestamp)
+                    self.offsets.append(start)
+                return
+            start = end
+
+    def _line(self, start: int) -> t.Tuple[bytes, int]:
+        """Return the line starting at an offset, and the offset of the next line."""
+        data = t.cast(mmap.mmap, self._map)
+        end = data.find(b"\n", start)
+        if end < 0:
+            return data[start : self.size], self.size
+        return data[start:end], end + 1
+
+    @property
+    def first(self) -> t.Optional[datetime]:
+        return self.timestamps[0] if self.timestamps else None
+
+    @property
+    def last(self) -> t.Optional[datetime]:
+        """Timestamp of the last line holding one, found by reading the end of the file."""
+        if self._map is None:
+            return None
+        start = self._line_start(max(0, self.size - self.stride))
+        last = None
+        while start < self.size:
+            line, start = self._line(start)
+            last = parse_timestamp(line) or last
+        return last or (self.timestamps[-1] if self.timestamps else None)
+
+    def search(
+        self,
+        start: t.Optional[datetime] = None,
+        end: t.Optional[datetime] = None,
+        pattern: t.Union[str, bytes, t.Pattern[bytes], None] = None,
+    ) -> t.Iterator[LogLine]:
+        """Yield lines written between start and end (both included) matching pattern.
+
+        Arguments:
+            start: earliest timestamp. Default to the beginning of the file.
+            end: latest timestamp. Default to the end of the file.
+            pattern: a regular expression searched in each line. Omitted by default.
+        """
+        if self._map is None:
+            return
+        regex = _compile(pattern)
+        offset = 0
+        timestamp: t.Optional[datetime] = None
+        if start is not None:
+            # Last entry strictly before start: lines with timestamp equal to start may precede
+            # the first entry equal to start
+            index = bisect.bisect_left(self.timestamps, start) - 1
+            if index >= 0:
+                offset = self.offsets[index]
+        path = self.path.as_posix()
+        while offset < self.size:
+            line, following = self._line(offset)
+            timestamp = parse_timestamp(line) or timestamp
+            if end is not None and timestamp is not None and timestamp > end:
+                return
+            if (start is None or (timestamp is not None and timestamp >= start)) and (
+                regex is None or regex.search(line)
+            ):
+                yield LogLine(
+                    timestamp, line.decode("utf-8", errors="replace"), path, offset
+                )
+            offset = following
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> "LogIndex":
+        return self
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.close()
+
+
+def _compile(
+    pattern: t.Union[str, bytes, t.Pattern[bytes], None],
+) -> t.Optional[t.Pattern[bytes]]:
+    if pattern is None or isinstance(pattern, re.Pattern):
+        return pattern
+    if isinstance(pattern, str):
+        pattern = pattern.encode()
+    return re.compile(pattern)
+
+
+class LogSearch:
+    def __init__(self, path: t.Union[str, Path], stride: int = DEFAULT_STRIDE) -> None:
+        """Search a log file and the files rotated from it.
+
+        Indexes are kept between searches, and only extended with lines appended since.
+
+        Arguments:
+            path: path of the current log file.
+            stride: distance in bytes between two entries of the index of each file. Default is 64KiB.
+        """
+        self.path = Path(path)
+        self.stride = stride
+        self._indexes: t.Dict[str, LogIndex] = {}
+
+    def files(self) -> t.List[Path]:
+        """Return rotated files, oldest first, followed by the current file."""
+        files = rotated_files(self.path)
+        if self.path.is_file():
+            files.append(self.path)
+        return files
+
+    def indexes(self) -> t.List[LogIndex]:
+        """Return the index of each file, creating or refreshing indexes as needed."""
+        indexes: t.List[LogIndex] = []
+        known = self._indexes
+        self._indexes = {}
+        for path in self.files():
+            key = path.as_posix()
+            index = known.pop(key, None)
+            try:
+                if index is not None and index.identity != _identity(path.stat()):
+                    # File was replaced by another one with the same name
+                    index.close()
+                    index = None
+                if index is None:
+                    index = LogIndex(path, self.stride)
+                else:
+                    index.refresh()
+            except FileNotFoundError:
+                continue
+            self._indexes[key] = index
+            indexes.append(index)
+        for index in known.values():
+            index.close()
+        return indexes
+
+    def search(
+        self,
+        start: t.Optional[datetime] = None,
+        end: t.Optional[datetime] = None,
+        pattern: t.Union[str, bytes, t.Pattern[bytes], None] = None,
+    ) -> t.Iterator[LogLine]:
+        """Yield lines of all files written between start and end matching pattern, oldest first.
+
+        Files which do not overlap the time window are skipped without being read.
+        """
+        regex = _compile(pattern)
+        for index in self.indexes():
+            if end is not None and index.first is not None and index.first > end:
+                break
+            if start is not None:
+                last = index.last
+                if last is not None and last < start:
+                    continue
+            yield from index.search(start, end, regex)
+
+    def close(self) -> None:
+        for index in self._indexes.values():
+            index.close()
+        self._indexes = {}
+
+    def __enter__(self) -> "LogSearch":
+        return self
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.close()
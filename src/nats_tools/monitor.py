@@ -1,9 +1,14 @@
+import asyncio
+import time
 import types
 import typing as t
 from enum import Enum
 
 import httpx
 
+from nats_tools.backoff import Backoff
+from nats_tools.tracing import tracer
+
 
 class SortOption(str, Enum):
     # Connection ID
@@ -46,17 +51,46 @@ class StateOption(str, Enum):
     ANY = "any"
 
 
+def _decode(
+    response: httpx.Response, attributes: t.Dict[str, t.Any]
+) -> t.Dict[str, t.Any]:
+    attributes["status"] = response.status_code
+    attributes["bytes"] = len(response.content)
+    response.raise_for_status()
+    started = time.perf_counter()
+    data = t.cast(t.Dict[str, t.Any], response.json())
+    attributes["decode"] = time.perf_counter() - started
+    return data
+
+
+def count_interest(subsz: t.Dict[str, t.Any]) -> int:
+    """Return the number of subscriptions matching the test subject of a /subsz response."""
+    return max(subsz.get("total") or 0, len(subsz.get("subscriptions_list") or []))
+
+
 class NATSMonitor:
-    def __init__(self, endpoint: str) -> None:
+    def __init__(
+        self, endpoint: str, transport: t.Optional[httpx.BaseTransport] = None
+    ) -> None:
+        """Create a new monitoring client.
+
+        Arguments:
+            endpoint: base URL of the monitoring endpoint (e.g. `http://127.0.0.1:8222`).
+            transport: optional httpx transport used to send requests. Default to httpx default transport.
+        """
         self.endpoint = endpoint
+        self.transport = transport
         self._client: t.Optional[httpx.Client] = None
 
     def _request(self, endpoint: str, **params: t.Any) -> t.Dict[str, t.Any]:
         if self._client is None:
-            self._client = httpx.Client(base_url=self.endpoint)
-        response = self._client.get(endpoint, params=params)
-        response.raise_for_status()
-        return t.cast(t.Dict[str, t.Any], response.json())
+            self._client = httpx.Client(
+                base_url=self.endpoint, transport=self.transport
+            )
+        with tracer.span(
+            "monitor.request", url=self.endpoint, endpoint=endpoint, params=params
+        ) as attributes:
+            return _decode(self._client.get(endpoint, params=params), attributes)
 
     def varz(self) -> t.Dict[str, t.Any]:
         """The /varz endpoint returns general information about the server state and configuration.
@@ -153,6 +187,7 @@ class NATSMonitor:
             "subs": subs.value,
             "offset": offset,
             "limit": limit,
+            "state": state.value,
         }
         if cid:
             params["cid"] = int(cid)
@@ -287,18 +322,69 @@ class NATSMonitor:
             params["js_server_only"] = 1
         return self._request("/healthz", **params)
 
+    def wait_for_interest(
+        self,
+        subject: str,
+        min_subs: int = 1,
+        timeout: t.Optional[float] = 10,
+        backoff: t.Optional[Backoff] = None,
+    ) -> int:
+        """Wait until at least `min_subs` subscriptions match subject.
+
+        Subscriptions are counted using `/subsz?subs=1&test=<subject>`, so only subscriptions
+        local to the server (client and leafnode connections) are considered.
+
+        Arguments:
+            subject: a literal subject messages would be published on.
+            min_subs: minimum number of matching subscriptions. Default is 1.
+            timeout: maximum seconds to wait. Default is 10 seconds.
+            backoff: backoff used between probes. Default to a new `Backoff` instance.
+
+        Returns:
+            the number of matching subscriptions.
+
+        Raises:
+            TimeoutError: when interest does not propagate before timeout.
+        """
+        backoff = backoff or Backoff()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Only the number of matches is needed, so page size is kept as small as possible
+            count = count_interest(
+                self.subsz(subs=True, test=subject, limit=max(min_subs, 1))
+            )
+            if count >= min_subs:
+                return count
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Timeout ({timeout:.3f}s) while waiting for {min_subs} subscriptions on {subject} (found {count})"
+                )
+            backoff.sleep(deadline)
+
 
 class AsyncNATSMonitor:
-    def __init__(self, endpoint: str) -> None:
+    def __init__(
+        self, endpoint: str, transport: t.Optional[httpx.AsyncBaseTransport] = None
+    ) -> None:
+        """Create a new asynchronous monitoring client.
+
+        Arguments:
+            endpoint: base URL of the monitoring endpoint (e.g. `http://127.0.0.1:8222`).
+            transport: optional httpx transport used to send requests. Default to httpx default transport.
+        """
         self.endpoint = endpoint
+        self.transport = transport
         self._client: t.Optional[httpx.AsyncClient] = None
 
     async def _request(self, endpoint: str, **params: t.Any) -> t.Dict[str, t.Any]:
         if self._client is None:
-            self._client = httpx.AsyncClient(base_url=self.endpoint)
-        response = await self._client.get(endpoint, params=params)
-        response.raise_for_status()
-        return t.cast(t.Dict[str, t.Any], response.json())
+            self._client = httpx.AsyncClient(
+                base_url=self.endpoint, transport=self.transport
+            )
+        with tracer.span(
+            "monitor.request", url=self.endpoint, endpoint=endpoint, params=params
+        ) as attributes:
+            return _decode(await self._client.get(endpoint, params=params), attributes)
 
     async def varz(self) -> t.Dict[str, t.Any]:
         """The /varz endpoint returns general information about the server state and configuration.
@@ -395,6 +481,7 @@ class AsyncNATSMonitor:
             "subs": subs.value,
             "offset": offset,
             "limit": limit,
+            "state": state.value,
         }
         if cid:
             params["cid"] = int(cid)
@@ -529,6 +616,47 @@ class AsyncNATSMonitor:
             params["js_server_only"] = 1
         return await self._request("/healthz", **params)
 
+    async def wait_for_interest(
+        self,
+        subject: str,
+        min_subs: int = 1,
+        timeout: t.Optional[float] = 10,
+        backoff: t.Optional[Backoff] = None,
+    ) -> int:
+        """Wait until at least `min_subs` subscriptions match subject.
+
+        Subscriptions are counted using `/subsz?subs=1&test=<subject>`, so only subscriptions
+        local to the server (client and leafnode connections) are considered.
+
+        Arguments:
+            subject: a literal subject messages would be published on.
+            min_subs: minimum number of matching subscriptions. Default is 1.
+            timeout: maximum seconds to wait. Default is 10 seconds.
+            backoff: backoff used between probes. Default to a new `Backoff` instance.
+
+        Returns:
+            the number of matching subscriptions.
+
+        Raises:
+            TimeoutError: when interest does not propagate before timeout.
+        """
+        backoff = backoff or Backoff()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            count = count_interest(
+                await self.subsz(subs=True, test=subject, limit=max(min_subs, 1))
+            )
+            if count >= min_subs:
+                return count
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Timeout ({timeout:.3f}s) while waiting for {min_subs} subscriptions on {subject} (found {count})"
+                )
+            delay = backoff.next_delay()
+            if deadline is not None:
+                delay = min(delay, max(deadline - time.monotonic(), 0))
+            await asyncio.sleep(delay)
+
     async def close(self) -> None:
         if self._client and not self._client.is_closed:
             await self._client.aclose()
@@ -1,22 +1,82 @@
+import contextlib
+import json
+import math
 import os
 import shutil
 import signal
+import socket
 import subprocess
-import tempfile
 import time
 import types
 import typing as t
 import warnings
 import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
 
 import httpx
 
+from nats_tools.backoff import Backoff
 from nats_tools.monitor import NATSMonitor
+from nats_tools.registry import ProcessRegistry, ServerRecord, get_process_registry
 from nats_tools.templates import ConfigGenerator
+from nats_tools.tracing import Span, tracer
+from nats_tools.workspace import WorkspaceManager, get_workspace_manager
 
 DEFAULT_BIN_DIR = Path.home().joinpath("nats-server").absolute()
+# Profiles which can be collected using `NATSD.capture_profiles()`
+PROFILE_KINDS = ("cpu", "heap", "goroutine", "block")
+
+
+def find_nats_server(bin_name: str = "nats-server") -> t.Optional[str]:
+    """Return the path of the nats-server executable, or None when it cannot be found."""
+    # Check if there is an nats-server binary in the current working directory
+    if Path(bin_name).is_file():
+        return Path(bin_name).resolve(True).as_posix()
+    # Path in `../scripts/install_nats.sh`
+    if DEFAULT_BIN_DIR.joinpath(bin_name).is_file():
+        return DEFAULT_BIN_DIR.joinpath(bin_name).as_posix()
+    # This directory contains binary
+    return shutil.which(bin_name)
+
+
+def find_free_port(address: str = "127.0.0.1") -> int:
+    """Return a TCP port which is currently free on given address."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((address, 0))
+        return int(sock.getsockname()[1])
+
+
+def find_free_ports(count: int, address: str = "127.0.0.1") -> t.List[int]:
+    """Return distinct TCP ports which are currently free on given address.
+
+    Sockets are kept open until all ports are found, so that the same port is never returned twice.
+    """
+    with contextlib.ExitStack() as stack:
+        ports: t.List[int] = []
+        for _ in range(count):
+            sock = stack.enter_context(
+                socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            )
+            sock.bind((address, 0))
+            ports.append(int(sock.getsockname()[1]))
+        return ports
+
+
+def _ports_file_written(directory: Path, pid: int) -> bool:
+    """Check whether server process wrote its ports file in directory.
+
+    Server writes the file `<executable>_<pid>.ports` once all its listeners accept connections.
+    """
+    for path in directory.glob(f"*_{pid}.ports"):
+        try:
+            # File is not written atomically
+            json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        return True
+    return False
 
 
 class InvalidWindowsSignal(Enum):
@@ -71,6 +131,7 @@ class NATSD:
         user: t.Optional[str] = None,
         password: t.Optional[str] = None,
         users: t.Optional[t.List[t.Dict[str, t.Any]]] = None,
+        accounts: t.Optional[t.Dict[str, t.Dict[str, t.Any]]] = None,
         token: t.Optional[str] = None,
         http_port: int = 8222,
         debug: t.Optional[bool] = None,
@@ -98,7 +159,9 @@ class NATSD:
         allow_leafnodes: bool = False,
         leafnodes_listen_address: t.Optional[str] = None,
         leafnodes_listen_port: t.Optional[int] = None,
-        leafnode_remotes: t.Optional[t.Dict[str, t.Any]] = None,
+        leafnode_remotes: t.Union[
+            t.Dict[str, t.Any], t.List[t.Dict[str, t.Any]], None
+        ] = None,
         websocket_listen_address: t.Optional[str] = None,
         websocket_listen_port: t.Optional[int] = None,
         websocket_advertise_url: t.Optional[str] = None,
@@ -118,6 +181,28 @@ class NATSD:
         config_file: t.Union[str, Path, None] = None,
         max_cpus: t.Optional[float] = None,
         start_timeout: float = 1,
+        output_file: t.Union[str, Path, None] = None,
+        workspace: t.Optional[WorkspaceManager] = None,
+        registry: t.Optional[ProcessRegistry] = None,
+        profiling: bool = False,
+        prof_port: t.Optional[int] = None,
+        prof_block_rate: t.Optional[int] = None,
+        max_payload: t.Optional[int] = None,
+        max_pending: t.Optional[int] = None,
+        write_deadline: t.Union[int, float, str, None] = None,
+        max_connections: t.Optional[int] = None,
+        max_subscriptions: t.Optional[int] = None,
+        max_control_line: t.Optional[int] = None,
+        ping_interval: t.Union[int, float, str, None] = None,
+        ping_max: t.Optional[int] = None,
+        no_fast_producer_stall: t.Optional[bool] = None,
+        sync_interval: t.Union[int, float, str, None] = None,
+        lame_duck_duration: t.Union[int, float, str, None] = None,
+        lame_duck_grace_period: t.Union[int, float, str, None] = None,
+        gateway_name: t.Optional[str] = None,
+        gateway_listen: t.Optional[str] = None,
+        gateway_advertise: t.Optional[str] = None,
+        gateways: t.Optional[t.Dict[str, t.List[str]]] = None,
     ) -> None:
         """Create a new instance of nats-server daemon.
 
@@ -128,10 +213,14 @@ class NATSD:
             user: username required for connections. Omitted by default.
             password: password required for connections. Omitted by default.
             token: authorization token required for connections. Omitted by default.
+            accounts: accounts definitions, indexed by account name. Each account may define users and jetstream limits. Omitted by default.
             http_port: port for http monitoring. Default is 8222.
             debug: enable debugging output. Default is False.
             trace: enable raw traces. Default is False.
             pid_file: file to write process ID to. Omitted by default.
+            port_file_dir: directory where server writes a file containing its open ports. Default to a
+                directory of the process registry. The file is used to detect when server accepts
+                connections.
             log_file: file to redirect log output to. Omitted by default.
             tls_cert: server certificate file (TLS is enabled when both cert and key are provided)
             tls_key: server key file (TLS is enabled when both cert and key are provided)
@@ -146,11 +235,46 @@ class NATSD:
             config_file: path to a configuration file. None by default.
             max_cpus: maximum number of CPU configured using GOMAXPROCS environment variable. By default all CPUs can be used.
             start_timeout: amount of time to wait before raising an error when starting the daemon with wait=True.
+            output_file: file receiving standard output and error of the process. By default, output is displayed in debug mode and discarded otherwise.
+            workspace: manager of the directory holding generated config and store directory. Default to `get_workspace_manager()`.
+            registry: registry where started server is recorded. Default to `get_process_registry()`.
+            profiling: expose Go profiling data (pprof) on a free port unless prof_port is provided. Disabled by default.
+            prof_port: port exposing Go profiling data. Enables profiling when set.
+            prof_block_rate: sampling rate of blocking events, required to collect block profiles. Omitted by default.
+            max_payload, max_pending, write_deadline, max_connections, max_subscriptions, max_control_line,
+            ping_interval, ping_max, no_fast_producer_stall, sync_interval: performance limits, see
+                `ConfigGenerator.render()` for their effects. Server defaults are used when omitted.
+            lame_duck_duration: time spent evicting clients in lame duck mode. Server default is 2 minutes.
+            lame_duck_grace_period: delay before clients are evicted in lame duck mode. Server default is 10 seconds.
+            gateway_name: name of the gateway, equal to the cluster name. Enables gateways when set.
+            gateway_listen: address where gateway connections are accepted, as `host:port`.
+            gateway_advertise: address advertised to other gateways. Omitted by default.
+            gateways: URLs of the gateways of remote clusters, indexed by cluster name.
         """
+        # Duration in seconds of each phase of the server lifecycle
+        self.timings: t.Dict[str, float] = {}
+        started = time.perf_counter()
+        # Directory holding generated config and store directory, created when server is started
+        self.workspace_manager = workspace or get_workspace_manager()
+        self.workspace = self.workspace_manager.allocate()
+        self._finalizer = weakref.finalize(
+            self, self.workspace_manager.remove, self.workspace
+        )
+        if not store_directory:
+            store_directory = self.workspace.joinpath("jetstream")
+            self._store_dir_is_temporary = True
+        else:
+            self._store_dir_is_temporary = False
+        self.store_dir = Path(store_directory)
+        if profiling and prof_port is None:
+            prof_port = find_free_port(address)
+        self.prof_port = prof_port
+        # Options used to render configuration. None when an existing config file is used.
+        self.config_options: t.Optional[t.Dict[str, t.Any]] = None
+        self._config: t.Optional[str] = None
         if config_file is None:
-            config_file = Path(tempfile.mkdtemp()).joinpath("nats.conf")
-            generator = ConfigGenerator()
-            config_str = generator.render(
+            config_file = self.workspace.joinpath("nats.conf")
+            self.config_options = dict(
                 address=address,
                 port=port,
                 client_advertise=client_advertise,
@@ -159,6 +283,7 @@ class NATSD:
                 user=user,
                 password=password,
                 users=users,
+                accounts=accounts,
                 token=token,
                 http_port=http_port,
                 debug=debug,
@@ -203,9 +328,28 @@ class NATSD:
                 allow_delete_jwt=allow_delete_jwt,
                 compare_jwt_interval=compare_jwt_interval,
                 resolver_preload=resolver_preload,
+                prof_port=prof_port,
+                prof_block_rate=prof_block_rate,
+                max_payload=max_payload,
+                max_pending=max_pending,
+                write_deadline=write_deadline,
+                max_connections=max_connections,
+                max_subscriptions=max_subscriptions,
+                max_control_line=max_control_line,
+                ping_interval=ping_interval,
+                ping_max=ping_max,
+                no_fast_producer_stall=no_fast_producer_stall,
+                sync_interval=sync_interval,
+                lame_duck_duration=lame_duck_duration,
+                lame_duck_grace_period=lame_duck_grace_period,
+                gateway_name=gateway_name,
+                gateway_listen=gateway_listen,
+                gateway_advertise=gateway_advertise,
+                gateways=gateways,
             )
-            config_file.write_text(config_str)
-            weakref.finalize(self, shutil.rmtree, config_file.parent, True)
+            # Config is rendered now to report invalid options early, but written on start
+            self._config = ConfigGenerator().render(**self.config_options)
+        render_duration = time.perf_counter() - started
         self.server_name = server_name
         self.address = address
         self.port = port
@@ -232,7 +376,11 @@ class NATSD:
             "on",
         )
         self.pid_file = Path(pid_file).absolute().as_posix() if pid_file else None
+        self.port_file_dir = (
+            Path(port_file_dir).absolute().as_posix() if port_file_dir else None
+        )
         self.log_file = Path(log_file).absolute().as_posix() if log_file else None
+        self.output_file = Path(output_file) if output_file else None
         self.max_cpus = max_cpus
 
         self.tls_cert = tls_cert
@@ -259,24 +407,107 @@ class NATSD:
         self.cluster_listen = cluster_listen
         self.routes = routes
         self.no_advertise = no_advertise
+        self.gateway_name = gateway_name
+        self.gateway_listen = gateway_listen
+        self.gateways = gateways
 
         self.jetstream_enabled = with_jetstream
-        if store_directory:
-            self.store_dir = Path(store_directory)
-            self._store_dir_is_temporary = False
-        else:
-            self.store_dir = Path(tempfile.mkdtemp()).resolve(True)
-            self._store_dir_is_temporary = True
-            weakref.finalize(self, shutil.rmtree, self.store_dir.as_posix(), True)
 
+        self.registry = registry
         self.proc: t.Optional["subprocess.Popen[bytes]"] = None
+        # True when instance adopted a server which was already running
+        self.attached = False
+        self.attached_pid: t.Optional[int] = None
         self.monitor = NATSMonitor(f"http://{self.address}:{self.http_port}")
+        self._record("render", render_duration)
+
+    def _record(self, phase: str, duration: float, **attributes: t.Any) -> None:
+        """Record duration of a lifecycle phase and emit the matching span."""
+        self.timings[phase] = duration
+        if tracer.hooks:
+            tracer.emit(
+                Span(
+                    f"natsd.{phase}",
+                    time.time() - duration,
+                    duration,
+                    {"port": self.port, **attributes},
+                )
+            )
+
+    @classmethod
+    def attach(
+        cls,
+        address: str = "127.0.0.1",
+        port: int = 4222,
+        http_port: int = 8222,
+        with_jetstream: bool = False,
+        server_name: t.Optional[str] = None,
+        **options: t.Any,
+    ) -> "NATSD":
+        """Adopt a server which is already running instead of starting a new one.
+
+        Attached servers are not stopped by `stop()`. Signals can only be sent when the server was
+        started by `NATSD` and recorded in process registry.
+
+        Arguments:
+            address: address server listens to. Default is 127.0.0.1.
+            port: client port of the server. Default is 4222.
+            http_port: monitoring port of the server. Default is 8222.
+            with_jetstream: require JetStream to be enabled. Default is False.
+            server_name: require server to use this name. Any name is accepted by default.
+            options: other options accepted by `NATSD`, used to describe the server.
+
+        Raises:
+            httpx.HTTPError: when server is not reachable.
+            ValueError: when server is not compatible with requested options.
+        """
+        server = cls(
+            address=address,
+            port=port,
+            http_port=http_port,
+            with_jetstream=with_jetstream,
+            server_name=server_name,
+            **options,
+        )
+        varz = server.monitor.varz()
+        if varz.get("port") != port:
+            raise ValueError(
+                f"Server monitored on port {http_port} listens on port {varz.get('port')}"
+            )
+        if with_jetstream and not (varz.get("jetstream") or {}).get("config"):
+            raise ValueError("JetStream is not enabled on running server")
+        if server_name and varz.get("server_name") != server_name:
+            raise ValueError(
+                f"Running server is named {varz.get('server_name')} instead of {server_name}"
+            )
+        registry = server.registry or get_process_registry()
+        record = registry.find(port, address)
+        server.attached = True
+        server.attached_pid = record.pid if record else None
+        return server
+
+    @property
+    def pid(self) -> t.Optional[int]:
+        """Process ID of the server, if known."""
+        if self.proc is not None:
+            return self.proc.pid
+        return self.attached_pid
 
     def is_alive(self) -> bool:
+        if self.attached:
+            try:
+                self.monitor.varz()
+            except httpx.HTTPError:
+                return False
+            return True
         if self.proc is None:
             return False
         return self.proc.poll() is None
 
+    def _unregister(self) -> None:
+        if self.proc is not None and self.proc.poll() is not None:
+            (self.registry or get_process_registry()).unregister(self.workspace.name)
+
     def _cleanup_on_exit(self) -> None:
         if self.proc and self.proc.poll() is None:
             print(
@@ -284,19 +515,26 @@ class NATSD:
                 % self.port
             )
             self.kill()
+        self._unregister()
+
+    def cleanup(self) -> None:
+        """Remove workspace holding generated config and temporary store directory. Server must be stopped first.
+
+        Workspace is renamed immediately but deleted in background by default.
+        """
+        started = time.perf_counter()
+        self._finalizer()
+        self._record("cleanup", time.perf_counter() - started)
 
     def start(self, wait: bool = False) -> "NATSD":
-        # Check if there is an nats-server binary in the current working directory
-        if Path(self.bin_name).is_file():
-            self.bin_path = Path(self.bin_name).resolve(True).as_posix()
-        # Path in `../scripts/install_nats.sh`
-        elif DEFAULT_BIN_DIR.joinpath(self.bin_name).is_file():
-            self.bin_path = DEFAULT_BIN_DIR.joinpath(self.bin_name).as_posix()
-        # This directory contains binary
-        else:
-            self.bin_path = shutil.which(self.bin_name)
-            if self.bin_path is None:
-                raise FileNotFoundError("nats-server executable not found")
+        if self.attached:
+            raise TypeError("Attached servers cannot be started")
+        started = time.perf_counter()
+        self.bin_path = find_nats_server(self.bin_name)
+        if self.bin_path is None:
+            raise FileNotFoundError("nats-server executable not found")
+        self._record("resolve", time.perf_counter() - started, bin_path=self.bin_path)
+        started = time.perf_counter()
 
         cmd = [
             self.bin_path,
@@ -308,6 +546,11 @@ class NATSD:
             self.address,
         ]
 
+        registry = self.registry or get_process_registry()
+        if self._config is not None or self._store_dir_is_temporary:
+            self.workspace_manager.create(self.workspace)
+        if self._config is not None and self.config_file is not None:
+            self.config_file.write_text(self._config)
         if self.config_file is not None:
             if not self.config_file.exists():
                 raise FileNotFoundError(self.config_file)
@@ -316,25 +559,59 @@ class NATSD:
             cmd.append("--config")
             cmd.append(config_file)
 
+        # Pid file is used to detect orphan servers
+        pid_file = self.pid_file
+        if pid_file is None:
+            pid_file = registry.pid_file(self.workspace.name).as_posix()
+            cmd.extend(["--pid", pid_file])
+        # Ports file is written once all listeners accept connections
+        port_file_dir = self.port_file_dir
+        if port_file_dir is None:
+            port_file_dir = registry.port_file_dir(self.workspace.name).as_posix()
+        cmd.extend(["--ports_file_dir", port_file_dir])
+
         env = os.environ.copy()
 
         if self.max_cpus:
-            env["GOMAXPROCS"] = format(self.max_cpus, ".2f")
+            # Go runtime only accepts an integer and silently ignores other values
+            env["GOMAXPROCS"] = str(max(1, math.ceil(self.max_cpus)))
 
-        if self.debug:
+        if self.output_file:
+            with self.output_file.open("ab") as output:
+                self.proc = subprocess.Popen(
+                    cmd, stdout=output, stderr=subprocess.STDOUT, env=env
+                )
+        elif self.debug:
             self.proc = subprocess.Popen(cmd, env=env)
         else:
             self.proc = subprocess.Popen(
                 cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env
             )
 
+        registry.register(
+            ServerRecord(
+                name=self.workspace.name,
+                pid=self.proc.pid,
+                owner=os.getpid(),
+                address=self.address,
+                port=self.port,
+                http_port=self.http_port,
+                pid_file=pid_file,
+                config_file=self.config_file.as_posix() if self.config_file else None,
+                started=time.time(),
+            )
+        )
+        self._record("spawn", time.perf_counter() - started, pid=self.proc.pid)
         if self.debug:
             print(
                 "[\033[0;33mDEBUG\033[0;0m] Server listening on port %d started."
                 % self.port
             )
         if wait:
+            started = time.perf_counter()
             deadline = time.time() + self.timeout or float("inf")
+            backoff = Backoff()
+            accepted = False
             while True:
                 status = self.proc.poll()
                 if status is not None:
@@ -352,20 +629,31 @@ class NATSD:
                     raise TimeoutError(
                         f"nats-server failed to start before timeout ({self.timeout:.3f}s)"
                     )
+                if not accepted and _ports_file_written(
+                    Path(port_file_dir), self.proc.pid
+                ):
+                    accepted = True
+                    self._record("accept", time.perf_counter() - started)
                 try:
                     self.monitor.varz()
-                    break
+                    if accepted:
+                        break
                 except httpx.HTTPError as exc:
-                    print(
-                        f"[\033[0;31mDEBUG\033[0;0m] Waiting for server to be up. Last error: {type(exc).__name__} - {repr(exc)}."
-                    )
-                    time.sleep(0.1)
-                    continue
+                    if self.debug:
+                        print(
+                            f"[\033[0;31mDEBUG\033[0;0m] Waiting for server to be up. Last error: {type(exc).__name__} - {repr(exc)}."
+                        )
+                time.sleep(backoff.next_delay())
+            self._record("ready", time.perf_counter() - started)
 
         weakref.finalize(self, self._cleanup_on_exit)
         return self
 
     def stop(self, timeout: t.Optional[float] = 10) -> None:
+        if self.attached:
+            # Adopted servers are left running
+            return
+        started = time.perf_counter()
         if self.debug:
             print(
                 "[\033[0;33mDEBUG\033[0;0m] Server listening on %d will stop."
@@ -396,6 +684,8 @@ class NATSD:
                     "[\033[0;33mDEBUG\033[0;0m] Server listening on %d was stopped."
                     % self.port
                 )
+        self._record("stop", time.perf_counter() - started)
+        self._unregister()
         expected = 15 if os.name == "nt" else 1
         if self.proc and self.proc.returncode != expected:
             raise subprocess.CalledProcessError(
@@ -417,36 +707,42 @@ class NATSD:
         status = self.proc.poll()
         if status is not None:
             return status
-        return self.proc.wait(timeout=timeout)
+        started = time.perf_counter()
+        status = self.proc.wait(timeout=timeout)
+        self._record("exit", time.perf_counter() - started, returncode=status)
+        return status
 
     def send_signal(self, sig: t.Union[int, signal.Signals, Signal]) -> None:
-        if self.proc is None:
+        pid = self.pid
+        if pid is None:
             raise TypeError("Process is not started yet")
-        status = self.proc.poll()
-        if status is not None:
-            raise subprocess.CalledProcessError(status, cmd=self.proc.args)
+        if self.proc is not None:
+            status = self.proc.poll()
+            if status is not None:
+                raise subprocess.CalledProcessError(status, cmd=self.proc.args)
+        tracer.event("natsd.signal", port=self.port, signal=getattr(sig, "name", sig))
         if os.name != "nt":
             if not isinstance(sig, Signal):
                 sig = signal.Signals(sig)
                 sig = Signal(sig)
-            os.kill(self.proc.pid, sig.value)
+            os.kill(pid, sig.value)
         else:
             sig = Signal(sig)
             if isinstance(sig.value, InvalidWindowsSignal):
                 # Use a subprocess to explicitely call `nats-server --signal` which will handle signal correctly on Windows
                 if sig.value == InvalidWindowsSignal.SIGKILL:
-                    os.kill(self.proc.pid, signal.SIGINT)
+                    os.kill(pid, signal.SIGINT)
                 elif sig.value == InvalidWindowsSignal.SIGQUIT:
-                    os.kill(self.proc.pid, signal.SIGBREAK)  # type: ignore[attr-defined]
+                    os.kill(pid, signal.SIGBREAK)  # type: ignore[attr-defined]
                 elif sig.value == InvalidWindowsSignal.SIGHUP:
                     warnings.warn("Config reload is not supported on Windows")
                 elif sig.value == InvalidWindowsSignal.SIGUSR1:
                     warnings.warn("Log file roration is not supported on Windows")
                 elif sig.value == InvalidWindowsSignal.SIGUSR2:
                     warnings.warn("Lame Duck Mode is not supported on Windows")
-                    os.kill(self.proc.pid, signal.SIGINT)
+                    os.kill(pid, signal.SIGINT)
             else:
-                os.kill(self.proc.pid, sig.value)
+                os.kill(pid, sig.value)
 
     def quit(self, timeout: t.Optional[float] = None) -> None:
         self.send_signal(Signal.QUIT)
@@ -469,6 +765,136 @@ class NATSD:
     def reload_config(self) -> None:
         self.send_signal(Signal.RELOAD)
 
+    def update_config(
+        self, wait: bool = True, timeout: float = 5, **options: t.Any
+    ) -> None:
+        """Render configuration again using updated options and reload the server.
+
+        Only servers which do not use an existing config file can be updated.
+
+        Arguments:
+            wait: wait until server reports a new configuration load time. Default is True.
+            timeout: maximum seconds to wait for the reload. Default is 5 seconds.
+            options: options accepted by `ConfigGenerator.render()` which should be updated.
+        """
+        if self.config_options is None or self.config_file is None:
+            raise TypeError("Configuration was not generated and cannot be updated")
+        config_options = {**self.config_options, **options}
+        config_str = ConfigGenerator().render(**config_options)
+        self.config_options = config_options
+        self._config = config_str
+        if not self.is_alive():
+            # Config is written on start
+            return
+        previous = self.monitor.varz()["config_load_time"] if wait else None
+        self.config_file.write_text(config_str)
+        self.reload_config()
+        if wait:
+            Backoff().wait(
+                lambda: self.monitor.varz()["config_load_time"] != previous,
+                timeout=timeout,
+                message="configuration reload",
+            )
+
+    def _profile(
+        self, name: str, path: t.Union[str, Path], timeout: float, **params: t.Any
+    ) -> Path:
+        if self.prof_port is None:
+            raise TypeError("Profiling is not enabled")
+        path = Path(path)
+        url = f"http://{self.address}:{self.prof_port}/debug/pprof/{name}"
+        with httpx.stream("GET", url, params=params, timeout=timeout) as response:
+            response.raise_for_status()
+            with path.open("wb") as output:
+                for chunk in response.iter_bytes():
+                    output.write(chunk)
+        return path
+
+    def cpu_profile(self, path: t.Union[str, Path], seconds: int = 30) -> Path:
+        """Collect a CPU profile during given number of seconds and write it to path.
+
+        Profiles can be analyzed using `go tool pprof`.
+        """
+        return self._profile("profile", path, timeout=seconds + 10, seconds=seconds)
+
+    def heap_profile(self, path: t.Union[str, Path]) -> Path:
+        """Write a sampling of memory allocations of live objects to path."""
+        return self._profile("heap", path, timeout=10)
+
+    def goroutine_profile(self, path: t.Union[str, Path], debug: int = 0) -> Path:
+        """Write stack traces of all goroutines to path.
+
+        Use debug=2 to write a human readable dump instead of a pprof profile.
+        """
+        return self._profile("goroutine", path, timeout=10, debug=debug)
+
+    def block_profile(self, path: t.Union[str, Path]) -> Path:
+        """Write stack traces that led to blocking on synchronization primitives to path.
+
+        Profile is empty unless server was created with `prof_block_rate`.
+        """
+        return self._profile("block", path, timeout=10)
+
+    def capture_profiles(
+        self,
+        directory: t.Union[str, Path],
+        seconds: int = 5,
+        kinds: t.Sequence[str] = PROFILE_KINDS,
+        prefix: str = "",
+    ) -> t.Dict[str, Path]:
+        """Collect several profiles into a directory.
+
+        CPU profile is collected first, during given number of seconds, other profiles are
+        snapshots taken right after.
+
+        Arguments:
+            directory: directory where profiles are written as `<prefix><kind>.pprof`.
+            seconds: duration of CPU profile. Default is 5 seconds.
+            kinds: profiles to collect, among `cpu`, `heap`, `goroutine` and `block`. Default to all.
+            prefix: prefix of file names.
+
+        Returns:
+            path of each collected profile.
+        """
+        unknown = set(kinds) - set(PROFILE_KINDS)
+        if unknown:
+            raise ValueError(f"Unsupported profiles: {sorted(unknown)}")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths: t.Dict[str, Path] = {}
+        for kind in PROFILE_KINDS:
+            if kind not in kinds:
+                continue
+            path = directory.joinpath(f"{prefix}{kind}.pprof")
+            if kind == "cpu":
+                paths[kind] = self.cpu_profile(path, seconds)
+            elif kind == "heap":
+                paths[kind] = self.heap_profile(path)
+            elif kind == "goroutine":
+                paths[kind] = self.goroutine_profile(path)
+            else:
+                paths[kind] = self.block_profile(path)
+        return paths
+
+    def capture_profiles_in_background(
+        self,
+        directory: t.Union[str, Path],
+        seconds: int = 5,
+        kinds: t.Sequence[str] = PROFILE_KINDS,
+        prefix: str = "",
+    ) -> "Future[t.Dict[str, Path]]":
+        """Same as `capture_profiles()`, but profiles are collected within a background thread.
+
+        This can be used as `on_measure` callback of `BenchmarkSuite.run()` in order to profile the
+        server while it is under load.
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(
+            self.capture_profiles, directory, seconds, kinds, prefix
+        )
+        executor.shutdown(wait=False)
+        return future
+
     def __enter__(self) -> "NATSD":
         return self.start(wait=True)
 
@@ -0,0 +1,370 @@
+"""A TCP proxy injecting network faults between NATS clients and servers, or between routes.
+
+`FaultProxy` forwards connections to a target address using an asyncio event loop running in a
+background thread. Faults are configured independently for each direction, and can be changed
+while connections are open:
+
+- `latency` and `jitter` delay each chunk of data, while preserving ordering.
+- `bandwidth` caps throughput in bytes per second.
+- `chunk_size` splits writes into partial writes of at most this size.
+- `blackhole` silently drops data while keeping connections open.
+
+`reset()` aborts all open connections with a TCP reset, and `reject` resets new connections as soon
+as they are accepted. Bytes received, forwarded and dropped are counted for each direction.
+
+Servers advertise the address of the proxy using `client_advertise` or `cluster_url` options, so that
+clients reconnect and routes reconnect through the proxy:
+
+```python
+from nats_tools.natsd import NATSD
+from nats_tools.proxy import FaultProxy
+
+with FaultProxy(("127.0.0.1", 4222)) as proxy:
+    with NATSD(port=4222, client_advertise=proxy.advertise):
+        proxy.set(latency=0.05, jitter=0.01)
+        # Connect clients to proxy.url
+        ...
+```
+"""
+
+import asyncio
+import random
+import socket
+import struct
+import threading
+import typing as t
+from dataclasses import dataclass, field, replace
+
+from nats_tools.natsd import NATSD
+
+DIRECTIONS = ("upstream", "downstream")
+READ_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Faults:
+    """Faults applied to data flowing in a single direction."""
+
+    latency: float = 0
+    jitter: float = 0
+    bandwidth: t.Optional[int] = None
+    chunk_size: t.Optional[int] = None
+    blackhole: bool = False
+
+    def __post_init__(self) -> None:
+        if self.latency < 0 or self.jitter < 0:
+            raise ValueError("latency and jitter must not be negative")
+        if self.bandwidth is not None and self.bandwidth <= 0:
+            raise ValueError("bandwidth must be a positive number of bytes per second")
+        if self.chunk_size is not None and self.chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive number of bytes")
+
+    def delay(self, rng: random.Random) -> float:
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+
+
+@dataclass
+class Counters:
+    received: int = 0
+    forwarded: int = 0
+    dropped: int = 0
+
+
+@dataclass
+class _Link:
+    """A proxied connection, made of the accepted and the outgoing stream."""
+
+    client: asyncio.StreamWriter
+    server: t.Optional[asyncio.StreamWriter] = None
+    tasks: t.List["asyncio.Task[None]"] = field(default_factory=list)
+
+
+def _abort(writer: asyncio.StreamWriter) -> None:
+    """Close a connection with a TCP reset instead of a graceful shutdown."""
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        try:
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+        except OSError:
+            pass
+    writer.transport.abort()
+
+
+class FaultProxy:
+    def __init__(
+        self,
+        target: t.Tuple[str, int],
+        address: str = "127.0.0.1",
+        port: int = 0,
+        seed: t.Optional[int] = None,
+    ) -> None:
+        """Create a new proxy. Proxy does not accept connections until `start()` is called.
+
+        Arguments:
+            target: address and port connections are forwarded to.
+            address: address proxy should listen to. Default is 127.0.0.1.
+            port: port proxy should listen to. Default to a random free port, known once started.
+            seed: seed of the random generator used for jitter, for reproducible delays.
+        """
+        self.target = target
+        self.address = address
+        self.port = port
+        self.faults = {direction: Faults() for direction in DIRECTIONS}
+        self.counters = {direction: Counters() for direction in DIRECTIONS}
+        # When True, new connections are reset as soon as they are accepted
+        self.reject = False
+        self.connections = 0
+        self.resets = 0
+        self._rng = random.Random(seed)
+        self._links: t.List[_Link] = []
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._thread: t.Optional[threading.Thread] = None
+        self._server: t.Optional[asyncio.Server] = None
+
+    @classmethod
+    def for_server(
+        cls, server: NATSD, kind: str = "client", **kwargs: t.Any
+    ) -> "FaultProxy":
+        """Create a proxy forwarding to the client port or to the cluster port of a server.
+
+        Arguments:
+            server: a `NATSD` instance, which may not be started yet.
+            kind: `client` or `route`. Default is `client`.
+            kwargs: other arguments of `FaultProxy`.
+        """
+        if kind == "client":
+            return cls((server.address, server.port), **kwargs)
+        if kind == "route":
+            listen = (server.config_options or {}).get("cluster_listen")
+            if not listen:
+                raise TypeError("Cluster is not enabled on server")
+            host, _, port = listen.rpartition(":")
+            return cls((host.split("//")[-1], int(port)), **kwargs)
+        raise ValueError(f"Invalid proxy kind: {kind}")
+
+    @property
+    def advertise(self) -> str:
+        """Address of the proxy as `host:port`, for `client_advertise` or `cluster_url` options."""
+        return f"{self.address}:{self.port}"
+
+    @property
+    def url(self) -> str:
+        return f"nats://{self.address}:{self.port}"
+
+    def _directions(self, direction: str) -> t.Tuple[str, ...]:
+        if direction == "both":
+            return DIRECTIONS
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Invalid direction: {direction}")
+        return (direction,)
+
+    def set(self, direction: str = "both", **faults: t.Any) -> None:
+        """Change faults applied to data flowing in a direction.
+
+        Changes apply to open connections, for data not yet scheduled for delivery.
+
+        Arguments:
+            direction: `upstream` (client to server), `downstream` (server to client) or `both`.
+            faults: fields of `Faults` to change. Other fields are kept.
+        """
+        for name in self._directions(direction):
+            self.faults[name] = replace(self.faults[name], **faults)
+
+    def clear(self) -> None:
+        """Remove all faults."""
+        self.faults = {direction: Faults() for direction in DIRECTIONS}
+        self.reject = False
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        """Return connection and byte counters of each direction."""
+        stats: t.Dict[str, t.Any] = {
+            "connections": self.connections,
+            "active": len(self._links),
+            "resets": self.resets,
+        }
+        for direction, counters in self.counters.items():
+            stats[direction] = {
+                "received": counters.received,
+                "forwarded": counters.forwarded,
+                "dropped": counters.dropped,
+            }
+        return stats
+
+    def reset(self) -> int:
+        """Abort all open connections with a TCP reset.
+
+        Returns:
+            the number of connections which were reset.
+        """
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return 0
+
+        async def _reset() -> int:
+            links, self._links = self._links, []
+            for link in links:
+                self._abort(link)
+            return len(links)
+
+        return asyncio.run_coroutine_threadsafe(_reset(), loop).result()
+
+    def _abort(self, link: _Link) -> None:
+        for task in link.tasks:
+            task.cancel()
+        _abort(link.client)
+        if link.server is not None:
+            _abort(link.server)
+        self.resets += 1
+
+    async def _pump(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        direction: str,
+        link: _Link,
+    ) -> None:
+        """Forward data read from reader to writer, applying faults of direction."""
+        counters = self.counters[direction]
+        queue: "asyncio.Queue[t.Tuple[float, bytes]]" = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+
+        async def _deliver() -> None:
+            while True:
+                deliver_at, data = await queue.get()
+                if not data:
+                    break
+                wait = deliver_at - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                faults = self.faults[direction]
+                size = faults.chunk_size or len(data)
+                if faults.bandwidth:
+                    # Throttled data is written in small pieces, each after its transfer time
+                    size = min(size, max(1, faults.bandwidth // 20))
+                for start in range(0, len(data), size):
+                    chunk = data[start : start + size]
+                    if faults.bandwidth:
+                        await asyncio.sleep(len(chunk) / faults.bandwidth)
+                    writer.write(chunk)
+                    await writer.drain()
+                    counters.forwarded += len(chunk)
+            if writer.can_write_eof():
+                writer.write_eof()
+
+        delivery = asyncio.ensure_future(_deliver())
+        link.tasks.append(delivery)
+        # Delivery times never decrease, so that jitter does not reorder data
+        previous = 0.0
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                counters.received += len(data)
+                faults = self.faults[direction]
+                if faults.blackhole:
+                    counters.dropped += len(data)
+                    continue
+                previous = max(previous, loop.time() + faults.delay(self._rng))
+                queue.put_nowait((previous, data))
+            queue.put_nowait((previous, b""))
+            await delivery
+        except (ConnectionError, OSError):
+            delivery.cancel()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        link = _Link(client=writer)
+        if self.reject:
+            self._abort(link)
+            return
+        try:
+            server_reader, server_writer = await asyncio.open_connection(*self.target)
+        except OSError:
+            self._abort(link)
+            return
+        link.server = server_writer
+        self._links.append(link)
+        pumps = [
+            asyncio.ensure_future(self._pump(reader, server_writer, "upstream", link)),
+            asyncio.ensure_future(
+                self._pump(server_reader, writer, "downstream", link)
+            ),
+        ]
+        link.tasks.extend(pumps)
+        try:
+            await asyncio.gather(*pumps)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if link in self._links:
+                self._links.remove(link)
+                writer.close()
+                server_writer.close()
+
+    def start(self) -> "FaultProxy":
+        """Start accepting connections."""
+        if self._loop is not None:
+            return self
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        self._thread = threading.Thread(
+            target=loop.run_forever, name=f"nats-proxy-{self.port}", daemon=True
+        )
+        self._thread.start()
+
+        async def _serve() -> asyncio.Server:
+            return await asyncio.start_server(self._handle, self.address, self.port)
+
+        try:
+            self._server = asyncio.run_coroutine_threadsafe(_serve(), loop).result()
+        except BaseException:
+            self.stop()
+            raise
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self, timeout: t.Optional[float] = 10) -> None:
+        """Stop accepting connections and close open connections."""
+        loop = self._loop
+        if loop is None:
+            return
+
+        async def _shutdown() -> None:
+            if self._server is not None:
+                self._server.close()
+                await self._server.wait_closed()
+            links, self._links = self._links, []
+            for link in links:
+                for task in link.tasks:
+                    task.cancel()
+                link.client.close()
+                if link.server is not None:
+                    link.server.close()
+
+        if loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout)
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        loop.close()
+        self._loop = None
+        self._thread = None
+        self._server = None
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self) -> "FaultProxy":
+        return self.start()
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.stop()
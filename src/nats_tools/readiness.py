@@ -0,0 +1,432 @@
+"""Wait for clusters to be ready using monitoring endpoints.
+
+All waiters probe every node concurrently and poll using an adaptive backoff, so they return as soon
+as the condition holds on all nodes instead of relying on fixed sleeps.
+
+Example:
+
+```python
+from nats_tools.readiness import wait_for_cluster, wait_for_stream_replicas
+
+wait_for_cluster(nodes, jetstream=True, timeout=10)
+# Create stream "ORDERS" with 3 replicas, then
+wait_for_stream_replicas(nodes, "ORDERS", replicas=3)
+```
+"""
+
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from nats_tools.backoff import Backoff
+from nats_tools.monitor import NATSMonitor, count_interest
+from nats_tools.natsd import NATSD
+from nats_tools.standin import StandInServer
+from nats_tools.subjects import subject_matches
+
+Target = t.Union[NATSD, StandInServer, NATSMonitor]
+T = t.TypeVar("T")
+
+
+def get_monitor(target: Target) -> NATSMonitor:
+    """Return the monitor of a server, or target itself when it is already a monitor."""
+    if isinstance(target, NATSMonitor):
+        return target
+    return target.monitor
+
+
+def probe(
+    targets: t.Sequence[Target],
+    func: t.Callable[[NATSMonitor], T],
+) -> t.List[t.Union[T, Exception]]:
+    """Call func concurrently with the monitor of each target.
+
+    Errors raised while querying monitoring endpoints are returned instead of being raised.
+    """
+    monitors = [get_monitor(target) for target in targets]
+
+    def _call(monitor: NATSMonitor) -> t.Union[T, Exception]:
+        try:
+            return func(monitor)
+        except (httpx.HTTPError, ValueError) as exc:
+            return exc
+
+    if len(monitors) <= 1:
+        return [_call(monitor) for monitor in monitors]
+    with ThreadPoolExecutor(max_workers=len(monitors)) as executor:
+        return list(executor.map(_call, monitors))
+
+
+class _Poller:
+    """Poll a check until it succeeds and keep track of the last reason of failure."""
+
+    def __init__(self, description: str) -> None:
+        self.description = description
+        self.reason = "no probe done yet"
+
+    def message(self) -> str:
+        return f"{self.description} (last state: {self.reason})"
+
+    def run(
+        self,
+        check: t.Callable[[], t.Optional[str]],
+        timeout: t.Optional[float],
+        backoff: t.Optional[Backoff],
+    ) -> None:
+        def _condition() -> bool:
+            reason = check()
+            if reason is None:
+                return True
+            self.reason = reason
+            return False
+
+        (backoff or Backoff()).wait(_condition, timeout, self.message)
+
+
+def wait_for_healthz(
+    targets: t.Sequence[Target],
+    js_enabled: bool = False,
+    js_server_only: bool = False,
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> None:
+    """Wait until `/healthz` reports OK on all nodes.
+
+    Arguments:
+        targets: NATSD instances or monitors.
+        js_enabled: require JetStream to be enabled.
+        js_server_only: skip health check of JetStream accounts, streams and consumers.
+        timeout: maximum seconds to wait. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+    """
+    poller = _Poller("healthz on all nodes")
+
+    def check() -> t.Optional[str]:
+        results = probe(
+            targets,
+            lambda monitor: monitor.healthz(
+                js_enabled=js_enabled, js_server_only=js_server_only
+            ),
+        )
+        unhealthy = [
+            f"node {index}: {result!r}"
+            for index, result in enumerate(results)
+            if isinstance(result, Exception) or result.get("status") != "ok"
+        ]
+        return "; ".join(unhealthy) if unhealthy else None
+
+    poller.run(check, timeout, backoff)
+
+
+def wait_for_full_mesh(
+    targets: t.Sequence[Target],
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> None:
+    """Wait until every node has a route to every other node.
+
+    Arguments:
+        targets: NATSD instances or monitors of all cluster members.
+        timeout: maximum seconds to wait. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+    """
+    poller = _Poller(f"full mesh between {len(targets)} nodes")
+    server_ids: t.List[t.Optional[str]] = [None] * len(targets)
+
+    def check() -> t.Optional[str]:
+        missing = [index for index, value in enumerate(server_ids) if value is None]
+        if missing:
+            varz = probe([targets[index] for index in missing], NATSMonitor.varz)
+            for index, result in zip(missing, varz):
+                if not isinstance(result, Exception):
+                    server_ids[index] = result["server_id"]
+            if any(value is None for value in server_ids):
+                return "some nodes are not reachable"
+        expected = set(t.cast(t.List[str], server_ids))
+        problems: t.List[str] = []
+        for index, result in enumerate(probe(targets, NATSMonitor.routez)):
+            if isinstance(result, Exception):
+                problems.append(f"node {index}: {result!r}")
+                continue
+            # Several routes may exist towards the same remote when route pooling is enabled
+            remotes = {route.get("remote_id") for route in result.get("routes") or []}
+            absent = expected - remotes - {server_ids[index]}
+            if absent:
+                problems.append(f"node {index} has no route to {len(absent)} nodes")
+        return "; ".join(problems) if problems else None
+
+    poller.run(check, timeout, backoff)
+
+
+def wait_for_meta_leader(
+    targets: t.Sequence[Target],
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> str:
+    """Wait until a JetStream meta leader is elected and known by all nodes.
+
+    Arguments:
+        targets: NATSD instances or monitors of all cluster members.
+        timeout: maximum seconds to wait. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+
+    Returns:
+        the name of the meta leader.
+    """
+    poller = _Poller("JetStream meta leader")
+    leader: t.List[str] = []
+
+    def check() -> t.Optional[str]:
+        # Only the meta leader answers successfully when leader_only is used
+        answers = probe(targets, lambda monitor: monitor.jsz(leader_only=True))
+        candidates = [
+            index
+            for index, answer in enumerate(answers)
+            if not isinstance(answer, Exception) and not answer.get("disabled")
+        ]
+        if len(candidates) != 1:
+            return f"{len(candidates)} nodes claim to be meta leader"
+        results = probe(targets, NATSMonitor.jsz)
+        names: t.Set[t.Optional[str]] = set()
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                return f"node {index}: {result!r}"
+            names.add((result.get("meta_cluster") or {}).get("leader"))
+        if len(names) != 1 or None in names or "" in names:
+            return f"nodes do not agree on meta leader: {names}"
+        leader.append(t.cast(str, names.pop()))
+        return None
+
+    poller.run(check, timeout, backoff)
+    return leader[-1]
+
+
+def wait_for_stream_replicas(
+    targets: t.Sequence[Target],
+    stream: str,
+    replicas: t.Optional[int] = None,
+    account: t.Optional[str] = None,
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> t.Dict[str, t.Any]:
+    """Wait until a stream has a leader and the expected number of current replicas.
+
+    Arguments:
+        targets: NATSD instances or monitors of all cluster members.
+        stream: name of the stream.
+        replicas: expected number of current replicas, leader included. Default to the stream configured replicas.
+        account: account of the stream. Default to all accounts.
+        timeout: maximum seconds to wait. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+
+    Returns:
+        the stream details reported by the stream leader.
+    """
+    poller = _Poller(f"stream {stream} replicas")
+    names: t.List[t.Optional[str]] = [None] * len(targets)
+    details: t.List[t.Dict[str, t.Any]] = []
+
+    def check() -> t.Optional[str]:
+        missing = [index for index, value in enumerate(names) if value is None]
+        if missing:
+            varz = probe([targets[index] for index in missing], NATSMonitor.varz)
+            for index, result in zip(missing, varz):
+                if not isinstance(result, Exception):
+                    names[index] = result["server_name"]
+        results = probe(
+            targets,
+            lambda monitor: monitor.jsz(
+                acc=account, streams=True, config=replicas is None
+            ),
+        )
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                continue
+            for account_detail in result.get("account_details") or []:
+                for detail in account_detail.get("stream_detail") or []:
+                    if detail.get("name") != stream:
+                        continue
+                    cluster = detail.get("cluster") or {}
+                    if not cluster.get("leader") or cluster["leader"] != names[index]:
+                        continue
+                    expected = replicas
+                    if expected is None:
+                        expected = (detail.get("config") or {}).get("num_replicas", 1)
+                    current = 1 + sum(
+                        1
+                        for replica in cluster.get("replicas") or []
+                        if replica.get("current")
+                    )
+                    if current < t.cast(int, expected):
+                        return f"{current}/{expected} replicas are current"
+                    details.append(detail)
+                    return None
+        return "stream leader not found"
+
+    poller.run(check, timeout, backoff)
+    return details[-1]
+
+
+def wait_for_cluster(
+    targets: t.Sequence[Target],
+    jetstream: bool = False,
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> None:
+    """Wait until all nodes are healthy, fully meshed and, when jetstream is True, agree on a meta leader.
+
+    Arguments:
+        targets: NATSD instances or monitors of all cluster members.
+        jetstream: wait for JetStream meta leader election. Default is False.
+        timeout: maximum seconds to wait for each step. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+    """
+    wait_for_healthz(
+        targets,
+        js_enabled=jetstream,
+        js_server_only=jetstream,
+        timeout=timeout,
+        backoff=backoff,
+    )
+    if len(targets) > 1:
+        wait_for_full_mesh(targets, timeout=timeout, backoff=backoff)
+        if jetstream:
+            wait_for_meta_leader(targets, timeout=timeout, backoff=backoff)
+
+
+def wait_for_gateways(
+    targets: t.Sequence[Target],
+    gateways: t.Iterable[str],
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> None:
+    """Wait until every node has an outbound gateway connection to each remote cluster.
+
+    Each server connects to a single server of every remote cluster, so checking outbound
+    gateways of all servers of a super-cluster is enough to confirm that clusters are connected.
+
+    Arguments:
+        targets: NATSD instances or monitors of all super-cluster members.
+        gateways: names of the clusters of the super-cluster. Name of the local cluster is ignored.
+        timeout: maximum seconds to wait. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+    """
+    names = set(gateways)
+    poller = _Poller(f"gateways to {sorted(names)} on all nodes")
+
+    def check() -> t.Optional[str]:
+        problems: t.List[str] = []
+        for index, result in enumerate(probe(targets, NATSMonitor.gatewayz)):
+            if isinstance(result, Exception):
+                problems.append(f"node {index}: {result!r}")
+                continue
+            expected = names - {result.get("name")}
+            connected = {
+                name
+                for name, gateway in (result.get("outbound_gateways") or {}).items()
+                if (gateway.get("connection") or {}).get("cid")
+            }
+            absent = expected - connected
+            if absent:
+                problems.append(f"node {index} has no gateway to {sorted(absent)}")
+        return "; ".join(problems) if problems else None
+
+    poller.run(check, timeout, backoff)
+
+
+def wait_for_leafnodes(
+    targets: t.Sequence[Target],
+    count: int = 1,
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> None:
+    """Wait until every node has at least `count` leafnode connections.
+
+    Arguments:
+        targets: NATSD instances or monitors, either leafnodes or the servers they connect to.
+        count: minimum number of leafnode connections of each node. Default is 1.
+        timeout: maximum seconds to wait. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+    """
+    poller = _Poller(f"{count} leafnode connections on all nodes")
+
+    def check() -> t.Optional[str]:
+        problems: t.List[str] = []
+        for index, result in enumerate(probe(targets, NATSMonitor.leafz)):
+            if isinstance(result, Exception):
+                problems.append(f"node {index}: {result!r}")
+            elif result.get("leafnodes", 0) < count:
+                problems.append(
+                    f"node {index} has {result.get('leafnodes', 0)} leafnode connections"
+                )
+        return "; ".join(problems) if problems else None
+
+    poller.run(check, timeout, backoff)
+
+
+def wait_for_interest(
+    targets: t.Sequence[Target],
+    subject: str,
+    min_subs: int = 1,
+    timeout: t.Optional[float] = 10,
+    backoff: t.Optional[Backoff] = None,
+) -> int:
+    """Wait until interest on subject has propagated to every node of a cluster.
+
+    Interest has propagated once at least `min_subs` subscriptions match subject across all nodes,
+    and each node either holds a matching subscription or has received interest for subject
+    through a route or a leafnode connection.
+
+    Arguments:
+        targets: NATSD instances or monitors of all cluster members.
+        subject: a literal subject messages would be published on.
+        min_subs: minimum number of matching subscriptions across all nodes. Default is 1.
+        timeout: maximum seconds to wait. Default is 10 seconds.
+        backoff: backoff used between probes. Default to a new `Backoff` instance.
+
+    Returns:
+        the total number of matching subscriptions.
+    """
+    poller = _Poller(f"{min_subs} subscriptions on {subject} on all nodes")
+    total: t.List[int] = []
+
+    def remote_interest(monitor: NATSMonitor) -> bool:
+        routez = monitor.routez(subs=True)
+        for route in routez.get("routes") or []:
+            for pattern in route.get("subscriptions_list") or []:
+                if subject_matches(subject, pattern):
+                    return True
+        leafz = monitor.leafz(subs=True)
+        for leaf in leafz.get("leafs") or []:
+            for pattern in leaf.get("subscriptions_list") or []:
+                if subject_matches(subject, pattern):
+                    return True
+        return False
+
+    def check() -> t.Optional[str]:
+        counts = probe(
+            targets,
+            lambda monitor: count_interest(
+                monitor.subsz(subs=True, test=subject, limit=max(min_subs, 1))
+            ),
+        )
+        for index, count in enumerate(counts):
+            if isinstance(count, Exception):
+                return f"node {index}: {count!r}"
+        local = t.cast(t.List[int], counts)
+        if sum(local) < min_subs:
+            return f"{sum(local)} matching subscriptions"
+        # Nodes without local subscriptions must have received interest from another node
+        pending = [index for index, count in enumerate(local) if not count]
+        remote = probe([targets[index] for index in pending], remote_interest)
+        missing = [
+            index for index, result in zip(pending, remote) if result is not True
+        ]
+        if missing:
+            return f"nodes {missing} did not receive interest yet"
+        total.append(sum(local))
+        return None
+
+    poller.run(check, timeout, backoff)
+    return total[-1]
@@ -0,0 +1,368 @@
+"""Record monitoring traffic and replay it offline.
+
+Recordings are gzip compressed JSON lines files. The first line is a header, and each following
+line describes a single request/response exchange. Files are append-only: reopening an existing
+recording appends a new gzip member, which is transparently read back as a single stream. Offsets
+of each session start at 0, and are shifted when read so that sessions are replayed one after the
+other.
+
+Compressed data is flushed after each exchange, so that a recording interrupted before the recorder
+was closed (crash, interrupted test session, ...) can still be read up to its last exchange.
+
+Example:
+
+```python
+from nats_tools.recording import MonitorRecorder, ReplayServer
+
+# Capture traffic
+with MonitorRecorder("incident.jsonl.gz") as recorder:
+    monitor = recorder.monitor("http://127.0.0.1:8222")
+    monitor.varz()
+    monitor.connz()
+
+# Serve it back later, 10 times faster than it was captured
+with ReplayServer("incident.jsonl.gz", speed=10) as server:
+    monitor = NATSMonitor(server.url)
+    monitor.varz()
+```
+"""
+
+import gzip
+import json
+import threading
+import time
+import types
+import typing as t
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+import httpx
+
+from nats_tools.httpserver import BackgroundHTTPServer, Response, error_response
+from nats_tools.monitor import AsyncNATSMonitor, NATSMonitor
+
+RECORDING_VERSION = 1
+
+
+@dataclass
+class Exchange:
+    """A recorded request/response exchange.
+
+    Attributes:
+        offset: seconds elapsed between recorder start and request start.
+        duration: seconds elapsed between request start and response end.
+        path: request path, e.g. `/connz`.
+        query: raw query string.
+        status: response status code.
+        body: response body.
+    """
+
+    offset: float
+    duration: float
+    path: str
+    query: str
+    status: int
+    body: str
+
+    @property
+    def key(self) -> t.Tuple[str, t.Tuple[t.Tuple[str, str], ...]]:
+        """Key used to match incoming requests against recorded exchanges."""
+        return request_key(self.path, self.query)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "t": round(self.offset, 6),
+                "d": round(self.duration, 6),
+                "p": self.path,
+                "q": self.query,
+                "s": self.status,
+                "b": self.body,
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, data: t.Dict[str, t.Any]) -> "Exchange":
+        return cls(
+            offset=data["t"],
+            duration=data["d"],
+            path=data["p"],
+            query=data["q"],
+            status=data["s"],
+            body=data["b"],
+        )
+
+
+def request_key(path: str, query: str) -> t.Tuple[str, t.Tuple[t.Tuple[str, str], ...]]:
+    """Normalize a request so that parameter order does not matter."""
+    return path, tuple(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def _read_lines(path: Path) -> t.Iterator[str]:
+    """Iterate over complete lines of a gzip file, ignoring a truncated last member."""
+    with gzip.open(path, "rb") as stream:
+        try:
+            for line in stream:
+                # Last line may be incomplete when recorder was interrupted while writing
+                if line.endswith(b"\n"):
+                    yield line.decode("utf-8")
+        except EOFError:
+            return
+
+
+def read_recording(path: t.Union[str, Path]) -> t.Iterator[Exchange]:
+    """Iterate over exchanges found in a recording file.
+
+    Exchanges of sessions appended to an existing recording are shifted to start once the last
+    exchange of the previous session ended. Reading stops at the last complete exchange when the
+    recording was not closed properly.
+
+    Arguments:
+        path: path to the recording file.
+    """
+    # Offset of the current session, and time at which the last exchange ended
+    base = end = 0.0
+    for line in _read_lines(Path(path)):
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        if "version" in data:
+            if data["version"] != RECORDING_VERSION:
+                raise ValueError(f"Unsupported recording version: {data['version']}")
+            base = end
+            continue
+        exchange = Exchange.from_json(data)
+        exchange.offset += base
+        end = max(end, exchange.offset + exchange.duration)
+        yield exchange
+
+
+class MonitorRecorder:
+    def __init__(self, path: t.Union[str, Path], compresslevel: int = 6) -> None:
+        """Create a new recorder writing exchanges to a compressed append-only file.
+
+        Arguments:
+            path: path to the recording file. Exchanges are appended when file already exists.
+            compresslevel: gzip compression level. Default is 6.
+        """
+        self.path = Path(path)
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._stream: t.Optional[gzip.GzipFile] = None
+        self._started = time.monotonic()
+
+    def open(self) -> "MonitorRecorder":
+        if self._stream is None:
+            self._stream = gzip.GzipFile(
+                self.path, "ab", compresslevel=self.compresslevel
+            )
+            self._started = time.monotonic()
+            header = {"version": RECORDING_VERSION, "started": time.time()}
+            self._write(json.dumps(header))
+        return self
+
+    def _write(self, line: str) -> None:
+        assert self._stream is not None
+        self._stream.write(line.encode("utf-8") + b"\n")
+        # Make line readable even if the gzip member is never terminated
+        self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+    def record(
+        self,
+        request: httpx.Request,
+        status: int,
+        body: bytes,
+        started: float,
+        finished: float,
+    ) -> None:
+        """Append an exchange to the recording.
+
+        Arguments:
+            request: the request which was sent.
+            status: the response status code.
+            body: the response body.
+            started: monotonic time at which request was sent.
+            finished: monotonic time at which response was received.
+        """
+        exchange = Exchange(
+            offset=started - self._started,
+            duration=finished - started,
+            path=request.url.path,
+            query=request.url.query.decode("ascii"),
+            status=status,
+            body=body.decode("utf-8"),
+        )
+        with self._lock:
+            if self._stream is None:
+                raise RuntimeError("Recorder is not opened")
+            self._write(exchange.to_json())
+
+    def transport(
+        self, transport: t.Optional[httpx.BaseTransport] = None
+    ) -> "RecordingTransport":
+        """Return an httpx transport recording all exchanges."""
+        return RecordingTransport(self, transport)
+
+    def async_transport(
+        self, transport: t.Optional[httpx.AsyncBaseTransport] = None
+    ) -> "AsyncRecordingTransport":
+        """Return an async httpx transport recording all exchanges."""
+        return AsyncRecordingTransport(self, transport)
+
+    def monitor(self, endpoint: str) -> NATSMonitor:
+        """Create a `NATSMonitor` which records all its requests."""
+        return NATSMonitor(endpoint, transport=self.transport())
+
+    def async_monitor(self, endpoint: str) -> AsyncNATSMonitor:
+        """Create an `AsyncNATSMonitor` which records all its requests."""
+        return AsyncNATSMonitor(endpoint, transport=self.async_transport())
+
+    def __enter__(self) -> "MonitorRecorder":
+        return self.open()
+
+    def __exit__(
+        self,
+        error_type: t.Optional[t.Type[BaseException]] = None,
+        error: t.Optional[BaseException] = None,
+        traceback: t.Optional[types.TracebackType] = None,
+    ) -> None:
+        self.close()
+
+
+def _replayable_headers(response: httpx.Response) -> t.List[t.Tuple[str, str]]:
+    # Body is already decoded, so encoding related headers must not be forwarded
+    return [
+        (key, value)
+        for key, value in response.headers.items()
+        if key.lower()
+        not in ("content-encoding", "content-length", "transfer-encoding")
+    ]
+
+
+class RecordingTransport(httpx.BaseTransport):
+    def __init__(
+        self,
+        recorder: MonitorRecorder,
+        transport: t.Optional[httpx.BaseTransport] = None,
+    ) -> None:
+        self.recorder = recorder
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        response = self.transport.handle_request(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        self.recorder.record(
+            request, response.status_code, content, started, time.monotonic()
+        )
+        return httpx.Response(
+            response.status_code,
+            headers=_replayable_headers(response),
+            content=content,
+            request=request,
+        )
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        recorder: MonitorRecorder,
+        transport: t.Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.recorder = recorder
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        self.recorder.record(
+            request, response.status_code, content, started, time.monotonic()
+        )
+        return httpx.Response(
+            response.status_code,
+            headers=_replayable_headers(response),
+            content=content,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class ReplayServer(BackgroundHTTPServer):
+    def __init__(
+        self,
+        recording: t.Union[str, Path, t.Iterable[Exchange]],
+        speed: t.Optional[float] = 1,
+        address: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Create a fake monitoring server answering requests from a recording.
+
+        Requests are matched against recorded exchanges using their path and query parameters.
+        When a request is received several times, recorded responses are served in order, and
+        the last one is repeated once all responses have been served.
+
+        Arguments:
+            recording: a path to a recording file or an iterable of exchanges.
+            speed: replay speed factor. Use 1 to replay at original speed, 10 to replay
+                10 times faster, and None or 0 to replay without any delay. Default is 1.
+            address: address server should listen to. Default is 127.0.0.1.
+            port: port server should listen to. Default to a random free port.
+        """
+        super().__init__(address=address, port=port)
+        if isinstance(recording, (str, Path)):
+            recording = read_recording(recording)
+        self.speed = speed
+        self.exchanges: t.Dict[
+            t.Tuple[str, t.Tuple[t.Tuple[str, str], ...]], t.List[Exchange]
+        ] = {}
+        for exchange in recording:
+            self.exchanges.setdefault(exchange.key, []).append(exchange)
+        self._cursors: t.Dict[t.Tuple[str, t.Tuple[t.Tuple[str, str], ...]], int] = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def start(self) -> "ReplayServer":
+        self.rewind()
+        return super().start()
+
+    def rewind(self) -> None:
+        """Restart replay from the beginning of the recording."""
+        with self._lock:
+            self._cursors.clear()
+            self._started = time.monotonic()
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        key = request_key(path, query)
+        with self._lock:
+            exchanges = self.exchanges.get(key)
+            if not exchanges:
+                return error_response(404, f"No recorded response for {path}?{query}")
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = min(index + 1, len(exchanges) - 1)
+            exchange = exchanges[index]
+        if self.speed:
+            # Wait until the time at which request was originally sent, then simulate server latency
+            delay = self._started + exchange.offset / self.speed - time.monotonic()
+            time.sleep(max(0.0, delay) + exchange.duration / self.speed)
+        return exchange.status, exchange.body.encode("utf-8")
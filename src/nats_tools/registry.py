@@ -0,0 +1,186 @@
+"""Keep track of started servers in order to stop servers left running by crashed processes.
+
+Each server started by `NATSD` is recorded in a runtime directory (`run` directory within the
+workspace root by default) along with the pid file and the ports file written by the server. A
+server is an orphan when the process which started it is not running anymore while the server
+still is.
+"""
+
+import json
+import os
+import shutil
+import signal
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from nats_tools.workspace import default_root, pid_exists
+
+
+@dataclass
+class ServerRecord:
+    """A server started by a process.
+
+    Attributes:
+        name: unique name of the record.
+        pid: process ID of the server.
+        owner: process ID of the process which started the server.
+        address: address server listens to.
+        port: client port.
+        http_port: monitoring port.
+        pid_file: file where server wrote its process ID.
+        config_file: configuration file of the server, if any.
+        started: timestamp when server was started.
+    """
+
+    name: str
+    pid: int
+    owner: int
+    address: str
+    port: int
+    http_port: int
+    pid_file: str
+    config_file: t.Optional[str] = None
+    started: float = 0
+
+    @classmethod
+    def from_dict(cls, data: t.Dict[str, t.Any]) -> "ServerRecord":
+        return cls(**data)
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return asdict(self)
+
+    def is_running(self) -> bool:
+        """Check that server is still running, using pid file to detect process ID reuse."""
+        if not pid_exists(self.pid):
+            return False
+        try:
+            return int(Path(self.pid_file).read_text().strip() or 0) == self.pid
+        except (OSError, ValueError):
+            return False
+
+    def is_orphan(self) -> bool:
+        return self.owner != os.getpid() and not pid_exists(self.owner)
+
+
+class ProcessRegistry:
+    def __init__(self, directory: t.Union[str, Path, None] = None) -> None:
+        """Create a new registry.
+
+        Arguments:
+            directory: directory holding records and pid files. Default to `run` directory within the workspace root.
+        """
+        self.directory = (
+            Path(directory) if directory else default_root().joinpath("run")
+        )
+
+    def pid_file(self, name: str) -> Path:
+        """Return the pid file path which should be used by a server."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.directory.joinpath(f"{name}.pid")
+
+    def port_file_dir(self, name: str) -> Path:
+        """Return the directory where a server should write its ports file."""
+        directory = self.directory.joinpath(f"{name}.ports")
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def register(self, record: ServerRecord) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory.joinpath(f"{record.name}.json")
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(record.to_dict()))
+        tmp.replace(path)
+
+    def unregister(self, name: str) -> None:
+        for suffix in (".json", ".pid"):
+            self.directory.joinpath(f"{name}{suffix}").unlink(missing_ok=True)
+        shutil.rmtree(self.directory.joinpath(f"{name}.ports"), ignore_errors=True)
+
+    def records(self) -> t.List[ServerRecord]:
+        if not self.directory.is_dir():
+            return []
+        found: t.List[ServerRecord] = []
+        for path in self.directory.glob("*.json"):
+            try:
+                found.append(ServerRecord.from_dict(json.loads(path.read_text())))
+            except (OSError, ValueError, TypeError):
+                continue
+        return found
+
+    def find(
+        self, port: int, address: t.Optional[str] = None
+    ) -> t.Optional[ServerRecord]:
+        """Find a running server listening on port."""
+        for record in self.records():
+            if record.port != port or (address and record.address != address):
+                continue
+            if record.is_running():
+                return record
+        return None
+
+    def orphans(self) -> t.List[ServerRecord]:
+        """Find running servers whose owner process is not running anymore."""
+        return [
+            record
+            for record in self.records()
+            if record.is_orphan() and record.is_running()
+        ]
+
+    def reap(self, timeout: float = 5) -> t.List[ServerRecord]:
+        """Stop orphan servers in parallel and remove records of servers which are not running.
+
+        Servers are sent a TERM signal, then killed when they do not exit before timeout.
+
+        Returns:
+            the stopped orphan servers.
+        """
+        orphans: t.List[ServerRecord] = []
+        for record in self.records():
+            if not record.is_orphan():
+                continue
+            if record.is_running():
+                orphans.append(record)
+            else:
+                self.unregister(record.name)
+
+        def _stop(record: ServerRecord) -> None:
+            try:
+                os.kill(record.pid, signal.SIGTERM)
+                deadline = time.monotonic() + timeout
+                while pid_exists(record.pid) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                if pid_exists(record.pid):
+                    os.kill(record.pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+            except ProcessLookupError:
+                pass
+            self.unregister(record.name)
+
+        if orphans:
+            with ThreadPoolExecutor(max_workers=len(orphans)) as executor:
+                list(executor.map(_stop, orphans))
+        return orphans
+
+
+_registry: t.Optional[ProcessRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_process_registry() -> ProcessRegistry:
+    """Return the registry used by default, creating it and stopping orphan servers on first call."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProcessRegistry()
+            _registry.reap()
+        return _registry
+
+
+def set_process_registry(registry: t.Optional[ProcessRegistry]) -> None:
+    """Replace the registry used by default. A new one is created on next use when registry is None."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
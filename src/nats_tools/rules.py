@@ -0,0 +1,433 @@
+"""Declarative alert rules evaluated over a stream of monitoring snapshots.
+
+A snapshot is a dictionary mapping monitoring endpoint names (`"varz"`, `"connz"`, `"jsz"`, ...)
+to the responses returned by `NATSMonitor`. Rules are evaluated incrementally: each condition only
+keeps the previous value it observed, so evaluating a snapshot costs O(number of rules).
+
+Example:
+
+```python
+from nats_tools.rules import RateOfChange, Rule, RulesEngine, Threshold
+
+engine = RulesEngine(
+    [
+        Rule("slow-consumers", RateOfChange("varz.slow_consumers", ">", 0)),
+        Rule("pending-bytes", Threshold("connz.connections.*.pending_bytes", ">", 1 << 20)),
+        Rule("routes", Threshold("routez.num_routes", "<", 2)),
+    ]
+)
+engine.on_event(print)
+engine.evaluate(engine.snapshot(natsd.monitor))
+engine.assert_not_firing()
+```
+"""
+
+import abc
+import logging
+import operator
+import threading
+import time
+import typing as t
+from dataclasses import dataclass, field
+
+import httpx
+
+from nats_tools.monitor import NATSMonitor
+
+logger = logging.getLogger(__name__)
+
+Snapshot = t.Mapping[str, t.Mapping[str, t.Any]]
+Selector = t.Union[str, t.Callable[[Snapshot], t.Any]]
+Callback = t.Callable[["AlertEvent"], None]
+
+OPERATORS: t.Dict[str, t.Callable[[t.Any, t.Any], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+AGGREGATES: t.Dict[str, t.Callable[[t.List[float]], float]] = {
+    "max": max,
+    "min": min,
+    "sum": sum,
+    "count": len,
+    "avg": lambda values: sum(values) / len(values),
+}
+
+
+def _lookup(value: t.Any, parts: t.Sequence[str]) -> t.List[t.Any]:
+    """Resolve a dotted path. A `*` part expands every item of a list (or every value of a mapping)."""
+    if not parts:
+        return [value]
+    head, tail = parts[0], parts[1:]
+    if head == "*":
+        if isinstance(value, t.Mapping):
+            items: t.Iterable[t.Any] = value.values()
+        elif isinstance(value, (list, tuple)):
+            items = value
+        else:
+            return []
+        results: t.List[t.Any] = []
+        for item in items:
+            results.extend(_lookup(item, tail))
+        return results
+    if isinstance(value, t.Mapping):
+        if head not in value:
+            return []
+        return _lookup(value[head], tail)
+    if isinstance(value, (list, tuple)) and head.isdigit():
+        index = int(head)
+        if index >= len(value):
+            return []
+        return _lookup(value[index], tail)
+    return []
+
+
+def select(
+    snapshot: Snapshot, selector: Selector, aggregate: str = "max"
+) -> t.Optional[float]:
+    """Extract a numeric value from a snapshot.
+
+    Arguments:
+        snapshot: the snapshot to read values from.
+        selector: either a callable or a dotted path such as `"varz.slow_consumers"`. Use `*` to
+            expand lists, e.g. `"connz.connections.*.pending_bytes"`.
+        aggregate: how values are reduced when the selector matches several values.
+            One of `max`, `min`, `sum`, `count` or `avg`. Default is `max`.
+
+    Returns:
+        the selected value, or None when the selector does not match anything.
+    """
+    if callable(selector):
+        try:
+            value = selector(snapshot)
+        except (KeyError, IndexError, TypeError, ZeroDivisionError):
+            return None
+        return None if value is None else float(value)
+    values = [
+        float(value)
+        for value in _lookup(snapshot, selector.split("."))
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+    if aggregate == "count":
+        return float(len(values))
+    if not values:
+        return None
+    return float(AGGREGATES[aggregate](values))
+
+
+class Condition(abc.ABC):
+    """Base class for conditions. A condition is stateful and must not be shared between rules."""
+
+    selector: Selector
+
+    def endpoints(self) -> t.Set[str]:
+        """Return the monitoring endpoints this condition reads from (empty when unknown)."""
+        if isinstance(self.selector, str):
+            return {self.selector.split(".", 1)[0]}
+        return set()
+
+    @abc.abstractmethod
+    def evaluate(
+        self, snapshot: Snapshot, timestamp: float, firing: bool
+    ) -> t.Tuple[bool, t.Optional[float]]:
+        """Return whether condition holds and the observed value."""
+        raise NotImplementedError
+
+
+class Threshold(Condition):
+    def __init__(
+        self,
+        selector: Selector,
+        op: str,
+        value: float,
+        clear: t.Optional[float] = None,
+        aggregate: str = "max",
+    ) -> None:
+        """Compare a selected value against a threshold.
+
+        Arguments:
+            selector: a dotted path or a callable returning a number.
+            op: comparison operator (`>`, `>=`, `<`, `<=`, `==`, `!=`).
+            value: threshold which must be crossed for the condition to hold.
+            clear: hysteresis threshold. Once firing, the condition holds until `op(value, clear)`
+                becomes false. Default to `value` (no hysteresis).
+            aggregate: aggregation used when selector expands to several values. Default is `max`.
+        """
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate: {aggregate}")
+        self.selector = selector
+        self.op = op
+        self.value = value
+        self.clear = value if clear is None else clear
+        self.aggregate = aggregate
+        self._compare = OPERATORS[op]
+
+    def evaluate(
+        self, snapshot: Snapshot, timestamp: float, firing: bool
+    ) -> t.Tuple[bool, t.Optional[float]]:
+        observed = select(snapshot, self.selector, self.aggregate)
+        if observed is None:
+            return False, None
+        threshold = self.clear if firing else self.value
+        return self._compare(observed, threshold), observed
+
+
+class RateOfChange(Condition):
+    def __init__(
+        self,
+        selector: Selector,
+        op: str,
+        value: float,
+        clear: t.Optional[float] = None,
+        aggregate: str = "max",
+        per_second: bool = True,
+    ) -> None:
+        """Compare the rate of change of a selected value against a threshold.
+
+        The first snapshot only records the observed value, so the condition never holds on it.
+
+        Arguments:
+            selector: a dotted path or a callable returning a number.
+            op: comparison operator (`>`, `>=`, `<`, `<=`, `==`, `!=`).
+            value: threshold for the rate of change.
+            clear: hysteresis threshold. Default to `value` (no hysteresis).
+            aggregate: aggregation used when selector expands to several values. Default is `max`.
+            per_second: divide the delta by elapsed seconds when True, else compare raw deltas
+                between consecutive snapshots. Default is True.
+        """
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate: {aggregate}")
+        self.selector = selector
+        self.op = op
+        self.value = value
+        self.clear = value if clear is None else clear
+        self.aggregate = aggregate
+        self.per_second = per_second
+        self._compare = OPERATORS[op]
+        self._previous: t.Optional[t.Tuple[float, float]] = None
+
+    def evaluate(
+        self, snapshot: Snapshot, timestamp: float, firing: bool
+    ) -> t.Tuple[bool, t.Optional[float]]:
+        observed = select(snapshot, self.selector, self.aggregate)
+        if observed is None:
+            return False, None
+        previous, self._previous = self._previous, (timestamp, observed)
+        if previous is None:
+            return False, None
+        delta = observed - previous[1]
+        if self.per_second:
+            elapsed = timestamp - previous[0]
+            if elapsed <= 0:
+                return firing, None
+            delta = delta / elapsed
+        threshold = self.clear if firing else self.value
+        return self._compare(delta, threshold), delta
+
+
+@dataclass
+class AlertEvent:
+    """An event emitted when a rule starts or stops firing."""
+
+    rule: str
+    firing: bool
+    value: t.Optional[float]
+    timestamp: float
+
+
+@dataclass
+class Rule:
+    """A named condition.
+
+    Attributes:
+        name: name of the rule, used in emitted events.
+        condition: the condition to evaluate.
+        for_count: number of consecutive snapshots where condition must hold before firing. Default is 1.
+        endpoints: monitoring endpoints required by the rule. Inferred from dotted path selectors by default.
+    """
+
+    name: str
+    condition: Condition
+    for_count: int = 1
+    endpoints: t.Optional[t.Set[str]] = None
+    firing: bool = field(default=False, init=False)
+    value: t.Optional[float] = field(default=None, init=False)
+    _pending: int = field(default=0, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.for_count < 1:
+            raise ValueError("for_count must be greater or equal to 1")
+        if self.endpoints is None:
+            self.endpoints = self.condition.endpoints()
+
+    def evaluate(self, snapshot: Snapshot, timestamp: float) -> t.Optional[AlertEvent]:
+        """Evaluate rule against snapshot and return an event when rule state changes."""
+        holds, self.value = self.condition.evaluate(snapshot, timestamp, self.firing)
+        if holds:
+            self._pending += 1
+            if not self.firing and self._pending >= self.for_count:
+                self.firing = True
+                return AlertEvent(self.name, True, self.value, timestamp)
+        else:
+            self._pending = 0
+            if self.firing:
+                self.firing = False
+                return AlertEvent(self.name, False, self.value, timestamp)
+        return None
+
+
+class RulesEngine:
+    def __init__(
+        self,
+        rules: t.Iterable[Rule] = (),
+        callbacks: t.Iterable[Callback] = (),
+    ) -> None:
+        """Create a new rules engine.
+
+        Arguments:
+            rules: rules to evaluate on each snapshot.
+            callbacks: functions called with each emitted `AlertEvent`.
+
+        Raises:
+            ValueError: when two rules have the same name.
+        """
+        self.rules: t.List[Rule] = []
+        self.callbacks: t.List[Callback] = list(callbacks)
+        self.history: t.List[AlertEvent] = []
+        # Number of snapshots which could not be taken by `watch()`
+        self.snapshot_errors = 0
+        self._lock = threading.Lock()
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule: Rule) -> None:
+        if any(existing.name == rule.name for existing in self.rules):
+            raise ValueError(f"A rule named {rule.name} already exists")
+        self.rules.append(rule)
+
+    def on_event(self, callback: Callback) -> None:
+        self.callbacks.append(callback)
+
+    @property
+    def firing(self) -> t.List[Rule]:
+        """Rules currently firing."""
+        return [rule for rule in self.rules if rule.firing]
+
+    @property
+    def endpoints(self) -> t.Set[str]:
+        """Monitoring endpoints which must be present in snapshots."""
+        endpoints: t.Set[str] = set()
+        for rule in self.rules:
+            endpoints.update(rule.endpoints or ())
+        return endpoints
+
+    def snapshot(
+        self,
+        monitor: NATSMonitor,
+        options: t.Optional[t.Mapping[str, t.Mapping[str, t.Any]]] = None,
+    ) -> t.Dict[str, t.Dict[str, t.Any]]:
+        """Query the endpoints required by rules and return a snapshot.
+
+        Arguments:
+            monitor: the monitor used to query endpoints.
+            options: optional keyword arguments per endpoint, e.g. `{"connz": {"limit": 4096}}`.
+        """
+        options = options or {}
+        return {
+            endpoint: getattr(monitor, endpoint)(**options.get(endpoint, {}))
+            for endpoint in sorted(self.endpoints)
+        }
+
+    def evaluate(
+        self, snapshot: Snapshot, timestamp: t.Optional[float] = None
+    ) -> t.List[AlertEvent]:
+        """Evaluate all rules against a snapshot.
+
+        Arguments:
+            snapshot: the snapshot to evaluate.
+            timestamp: time at which snapshot was taken. Default to current monotonic time.
+
+        Returns:
+            the list of events emitted during evaluation.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            events = [
+                event
+                for event in (rule.evaluate(snapshot, timestamp) for rule in self.rules)
+                if event is not None
+            ]
+            self.history.extend(events)
+        for event in events:
+            for callback in self.callbacks:
+                callback(event)
+        return events
+
+    def watch(
+        self,
+        monitor: NATSMonitor,
+        interval: float = 1,
+        options: t.Optional[t.Mapping[str, t.Mapping[str, t.Any]]] = None,
+        stop: t.Optional[threading.Event] = None,
+    ) -> threading.Event:
+        """Evaluate rules periodically in a background thread.
+
+        Snapshots which cannot be taken because of HTTP errors are logged and counted in
+        `snapshot_errors`. Any other error stops the thread.
+
+        Arguments:
+            monitor: the monitor used to take snapshots.
+            interval: seconds between two snapshots. Default is 1 second.
+            options: optional keyword arguments per endpoint.
+            stop: an event used to stop watching. A new event is created when omitted.
+
+        Returns:
+            the event which must be set to stop watching.
+        """
+        stop = stop or threading.Event()
+
+        def _loop() -> None:
+            assert stop is not None
+            while not stop.is_set():
+                started = time.monotonic()
+                try:
+                    snapshot = self.snapshot(monitor, options)
+                except httpx.HTTPError as exc:
+                    # Server may be unavailable for a short period (restart, reload, ...)
+                    self.snapshot_errors += 1
+                    logger.warning("Failed to take monitoring snapshot: %r", exc)
+                    snapshot = None
+                if snapshot is not None:
+                    self.evaluate(snapshot, started)
+                stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+        threading.Thread(target=_loop, name="nats-rules-engine", daemon=True).start()
+        return stop
+
+    def assert_not_firing(self, *names: str) -> None:
+        """Raise an AssertionError if any rule (or any of the given rules) is firing."""
+        firing = [rule for rule in self.firing if not names or rule.name in names]
+        if firing:
+            details = ", ".join(f"{rule.name} (value={rule.value})" for rule in firing)
+            raise AssertionError(f"Rules firing: {details}")
+
+    def assert_never_fired(self, *names: str) -> None:
+        """Raise an AssertionError if any rule (or any of the given rules) fired at least once."""
+        fired = sorted(
+            {
+                event.rule
+                for event in self.history
+                if event.firing and (not names or event.rule in names)
+            }
+        )
+        if fired:
+            raise AssertionError(f"Rules fired: {', '.join(fired)}")
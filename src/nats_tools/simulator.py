@@ -0,0 +1,681 @@
+"""Simulate the monitoring endpoint of a large nats-server.
+
+`MonitorSimulator` generates schema-compatible responses for `/varz`, `/connz`, `/jsz`, `/subsz`,
+`/routez`, `/accstatz` and `/healthz` at an arbitrary scale. Values are generated from a seed,
+so responses are deterministic, and objects are only materialized for the requested page.
+
+Example:
+
+```python
+from nats_tools.monitor import NATSMonitor
+from nats_tools.simulator import MonitorSimulator
+
+with MonitorSimulator(connections=100_000, streams=10_000) as simulator:
+    monitor = NATSMonitor(simulator.url)
+    page = monitor.connz(sort="pending", offset=1024, limit=1024)
+```
+"""
+
+import bisect
+import itertools
+import random
+import threading
+import time
+import typing as t
+from datetime import datetime, timedelta, timezone
+
+from nats_tools.httpserver import (
+    BackgroundHTTPServer,
+    Response,
+    format_timestamp,
+    format_uptime,
+    json_response,
+    parse_bool,
+    parse_int,
+)
+from nats_tools.subjects import subject_matches
+
+DEFAULT_LIST_SIZE = 1024
+
+CLOSED_REASONS = [
+    "Client Closed",
+    "Slow Consumer (Write Deadline)",
+    "Stale Connection",
+    "Authentication Timeout",
+    "Server Shutdown",
+]
+
+# Sort options which order results in ascending order. All other options use descending order.
+ASCENDING_SORTS = {"cid", "start", "reason"}
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class MonitorSimulator(BackgroundHTTPServer):
+    def __init__(
+        self,
+        connections: int = 1000,
+        closed_connections: int = 0,
+        subscriptions_per_connection: int = 10,
+        accounts: int = 1,
+        streams: int = 0,
+        consumers_per_stream: int = 1,
+        routes: int = 0,
+        latency: float = 0,
+        jitter: float = 0,
+        seed: int = 0,
+        server_name: str = "simulator",
+        address: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Create a new monitoring endpoint simulator.
+
+        Arguments:
+            connections: number of open client connections.
+            closed_connections: number of closed connections reported with `state=closed`.
+            subscriptions_per_connection: average number of subscriptions per connection.
+            accounts: number of accounts. Connections and streams are spread evenly across accounts.
+            streams: number of JetStream streams. JetStream is disabled when 0.
+            consumers_per_stream: number of consumers for each stream.
+            routes: number of cluster routes.
+            latency: seconds to wait before answering each request.
+            jitter: maximum random seconds added to latency.
+            seed: seed used to generate values.
+            server_name: name of the simulated server.
+            address: address server should listen to. Default is 127.0.0.1.
+            port: port server should listen to. Default to a random free port.
+        """
+        super().__init__(address=address, port=port)
+        self.connections = connections
+        self.closed_connections = closed_connections
+        self.subscriptions_per_connection = subscriptions_per_connection
+        self.accounts = max(accounts, 1)
+        self.streams = streams
+        self.consumers_per_stream = consumers_per_stream
+        self.routes = routes
+        self.latency = latency
+        self.jitter = jitter
+        self.server_name = server_name
+        self.server_id = "N" + "".join(
+            random.Random(seed).choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ234567")
+            for _ in range(55)
+        )
+        self.started = datetime.now(timezone.utc)
+        self._random = random.Random(seed)
+        self._jitter_random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._orders: t.Dict[t.Tuple[str, str], t.List[int]] = {}
+        total = connections + closed_connections
+        rnd = self._random
+        max_uptime = 86400.0
+        self._uptime = [rnd.uniform(0, max_uptime) for _ in range(total)]
+        # Connection IDs are assigned in start order, so uptime must decrease with cid
+        self._uptime.sort(reverse=True)
+        self._idle = [rnd.uniform(0, min(up, 600)) for up in self._uptime]
+        self._in_msgs = [rnd.randint(0, 1_000_000) for _ in range(total)]
+        self._out_msgs = [rnd.randint(0, 1_000_000) for _ in range(total)]
+        self._in_bytes = [msgs * rnd.randint(16, 1024) for msgs in self._in_msgs]
+        self._out_bytes = [msgs * rnd.randint(16, 1024) for msgs in self._out_msgs]
+        self._pending = [
+            rnd.randint(0, 1 << 20) if rnd.random() < 0.05 else 0 for _ in range(total)
+        ]
+        self._subs = [
+            rnd.randint(0, 2 * subscriptions_per_connection) for _ in range(total)
+        ]
+        # Number of subscriptions of connections up to each connection, used to page subscriptions
+        self._subs_until = list(itertools.accumulate(self._subs))
+        self._stopped = [rnd.uniform(0, up) for up in self._uptime]
+        self._stream_messages = [rnd.randint(0, 10_000_000) for _ in range(streams)]
+        self._stream_bytes = [
+            msgs * rnd.randint(16, 1024) for msgs in self._stream_messages
+        ]
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        if self.latency or self.jitter:
+            with self._lock:
+                jitter = self._jitter_random.uniform(0, self.jitter)
+            time.sleep(self.latency + jitter)
+        handlers: t.Dict[str, t.Callable[[t.Dict[str, str]], t.Dict[str, t.Any]]] = {
+            "/varz": self.varz,
+            "/connz": self.connz,
+            "/jsz": self.jsz,
+            "/subsz": self.subsz,
+            "/routez": self.routez,
+            "/accstatz": self.accstatz,
+            "/healthz": self.healthz,
+        }
+        handler = handlers.get(path.rstrip("/") or "/")
+        if handler is None:
+            return 404, b"404 page not found\n"
+        try:
+            return json_response(handler(params))
+        except (_BadRequest, ValueError) as exc:
+            return 400, str(exc).encode("utf-8")
+
+    # Helpers
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    def _account(self, index: int) -> str:
+        return "$G" if self.accounts == 1 else f"ACC{index % self.accounts}"
+
+    def _is_closed(self, cid: int) -> bool:
+        return cid > self.connections
+
+    def _subscriptions(self, cid: int) -> t.List[t.Tuple[str, t.Optional[str], int]]:
+        """Return (subject, queue group, sid) of each subscription of a connection."""
+        account = self._account(cid)
+        results: t.List[t.Tuple[str, t.Optional[str], int]] = []
+        for sid in range(1, self._subs[cid - 1] + 1):
+            if sid % 5 == 0:
+                subject = f"sim.{account}.{cid % 100}.*"
+            elif sid % 11 == 0:
+                subject = f"sim.{account}.>"
+            else:
+                subject = f"sim.{account}.{cid % 100}.{sid}"
+            qgroup = f"q{sid % 3}" if sid % 7 == 0 else None
+            results.append((subject, qgroup, sid))
+        return results
+
+    def _subscription_detail(
+        self, cid: int, subject: str, qgroup: t.Optional[str], sid: int
+    ) -> t.Dict[str, t.Any]:
+        detail: t.Dict[str, t.Any] = {
+            "account": self._account(cid),
+            "subject": subject,
+            "sid": str(sid),
+            "msgs": (self._out_msgs[cid - 1] // max(self._subs[cid - 1], 1)),
+            "cid": cid,
+        }
+        if qgroup:
+            detail["qgroup"] = qgroup
+        return detail
+
+    def _order(self, sort: str, state: str) -> t.List[int]:
+        key = (sort, state)
+        with self._lock:
+            if key in self._orders:
+                return self._orders[key]
+        if state == "open":
+            cids = range(1, self.connections + 1)
+        elif state == "closed":
+            cids = range(
+                self.connections + 1, self.connections + self.closed_connections + 1
+            )
+        else:
+            cids = range(1, self.connections + self.closed_connections + 1)
+        values: t.Dict[str, t.Callable[[int], t.Any]] = {
+            "cid": lambda cid: cid,
+            "start": lambda cid: cid,
+            "subs": lambda cid: self._subs[cid - 1],
+            "pending": lambda cid: self._pending[cid - 1],
+            "msgs_to": lambda cid: self._out_msgs[cid - 1],
+            "msgs_from": lambda cid: self._in_msgs[cid - 1],
+            "bytes_to": lambda cid: self._out_bytes[cid - 1],
+            "bytes_from": lambda cid: self._in_bytes[cid - 1],
+            "last": lambda cid: -self._idle[cid - 1],
+            "idle": lambda cid: self._idle[cid - 1],
+            "uptime": lambda cid: self._uptime[cid - 1],
+            "stop": lambda cid: -self._stopped[cid - 1],
+            "reason": lambda cid: CLOSED_REASONS[cid % len(CLOSED_REASONS)],
+        }
+        value = values[sort]
+        if sort in ASCENDING_SORTS:
+            order = sorted(cids, key=lambda cid: (value(cid), cid))
+        else:
+            order = sorted(cids, key=lambda cid: (value(cid), -cid), reverse=True)
+        with self._lock:
+            self._orders[key] = order
+        return order
+
+    def _connection(
+        self, cid: int, now: datetime, auth: bool, subs: t.Union[bool, str]
+    ) -> t.Dict[str, t.Any]:
+        index = cid - 1
+        uptime = self._uptime[index]
+        start = self.started - timedelta(seconds=uptime)
+        idle = self._idle[index]
+        connection: t.Dict[str, t.Any] = {
+            "cid": cid,
+            "kind": "Client",
+            "type": "nats",
+            "ip": "127.0.0.1",
+            "port": 10000 + cid % 50000,
+            "start": format_timestamp(start),
+            "last_activity": format_timestamp(now - timedelta(seconds=idle)),
+            "rtt": "1ms",
+            "uptime": format_uptime(uptime),
+            "idle": format_uptime(idle),
+            "pending_bytes": self._pending[index],
+            "in_msgs": self._in_msgs[index],
+            "out_msgs": self._out_msgs[index],
+            "in_bytes": self._in_bytes[index],
+            "out_bytes": self._out_bytes[index],
+            "subscriptions": self._subs[index],
+            "name": f"client-{cid}",
+            "lang": "python3",
+            "version": "2.2.0",
+        }
+        if self._is_closed(cid):
+            stopped = self._stopped[index]
+            connection["stop"] = format_timestamp(now - timedelta(seconds=stopped))
+            connection["reason"] = CLOSED_REASONS[cid % len(CLOSED_REASONS)]
+            connection["pending_bytes"] = 0
+        if auth:
+            connection["authorized_user"] = f"user-{cid % self.accounts}"
+            connection["account"] = self._account(cid)
+        if subs == "detail":
+            connection["subscriptions_list_detail"] = [
+                self._subscription_detail(cid, subject, qgroup, sid)
+                for subject, qgroup, sid in self._subscriptions(cid)
+            ]
+        elif subs:
+            connection["subscriptions_list"] = [
+                subject for subject, _, _ in self._subscriptions(cid)
+            ]
+        return connection
+
+    # Endpoints
+
+    def healthz(self, params: t.Dict[str, str]) -> t.Dict[str, t.Any]:
+        if parse_bool(params.get("js_enabled")) and not self.streams:
+            raise _BadRequest("JetStream not enabled")
+        return {"status": "ok"}
+
+    def varz(self, params: t.Dict[str, str]) -> t.Dict[str, t.Any]:
+        now = self._now()
+        open_cids = range(self.connections)
+        return {
+            "server_id": self.server_id,
+            "server_name": self.server_name,
+            "version": "2.9.14",
+            "proto": 1,
+            "go": "go1.19.5",
+            "host": "0.0.0.0",
+            "port": 4222,
+            "max_connections": 65536,
+            "ping_interval": 120000000000,
+            "ping_max": 2,
+            "http_host": self.address,
+            "http_port": self.port,
+            "http_base_path": "",
+            "https_port": 0,
+            "auth_timeout": 2,
+            "max_control_line": 4096,
+            "max_payload": 1048576,
+            "max_pending": 67108864,
+            "cluster": {"name": "simulator"} if self.routes else {},
+            "gateway": {},
+            "leaf": {},
+            "mqtt": {},
+            "websocket": {},
+            "jetstream": self._jetstream_varz() if self.streams else {},
+            "tls_timeout": 2,
+            "write_deadline": 10000000000,
+            "start": format_timestamp(self.started),
+            "now": format_timestamp(now),
+            "uptime": format_uptime((now - self.started).total_seconds()),
+            "mem": 64 * 1024 * 1024 + self.connections * 4096,
+            "cores": 8,
+            "gomaxprocs": 8,
+            "cpu": 1.5,
+            "connections": self.connections,
+            "total_connections": self.connections + self.closed_connections,
+            "routes": self.routes,
+            "remotes": self.routes,
+            "leafnodes": 0,
+            "in_msgs": sum(self._in_msgs[i] for i in open_cids),
+            "out_msgs": sum(self._out_msgs[i] for i in open_cids),
+            "in_bytes": sum(self._in_bytes[i] for i in open_cids),
+            "out_bytes": sum(self._out_bytes[i] for i in open_cids),
+            "slow_consumers": 0,
+            "subscriptions": sum(self._subs[i] for i in open_cids),
+            "http_req_stats": {},
+            "config_load_time": format_timestamp(self.started),
+            "system_account": "$SYS",
+        }
+
+    def _jetstream_varz(self) -> t.Dict[str, t.Any]:
+        return {
+            "config": self._jetstream_config(),
+            "stats": {
+                "memory": 0,
+                "storage": sum(self._stream_bytes),
+                "reserved_memory": 0,
+                "reserved_storage": 0,
+                "accounts": self.accounts,
+                "ha_assets": 0,
+                "api": {"total": 0, "errors": 0},
+            },
+        }
+
+    def _jetstream_config(self) -> t.Dict[str, t.Any]:
+        return {
+            "max_memory": 1 << 30,
+            "max_storage": 1 << 40,
+            "store_dir": "/tmp/nats/jetstream",
+            "sync_interval": 120000000000,
+        }
+
+    def connz(self, params: t.Dict[str, str]) -> t.Dict[str, t.Any]:
+        sort = params.get("sort") or "cid"
+        if sort not in (
+            "cid",
+            "start",
+            "subs",
+            "pending",
+            "msgs_to",
+            "msgs_from",
+            "bytes_to",
+            "bytes_from",
+            "last",
+            "idle",
+            "uptime",
+            "stop",
+            "reason",
+        ):
+            raise _BadRequest(f"Invalid sorting option: {sort}")
+        state = params.get("state") or "open"
+        if state not in ("open", "closed", "any"):
+            raise _BadRequest(f"Invalid state option: {state}")
+        if sort in ("stop", "reason") and state != "closed":
+            raise _BadRequest(f"Sort by {sort} only valid on closed connections")
+        subs_param = params.get("subs")
+        subs: t.Union[bool, str] = (
+            "detail" if subs_param == "detail" else parse_bool(subs_param)
+        )
+        auth = parse_bool(params.get("auth"))
+        offset = max(parse_int(params.get("offset")), 0)
+        limit = parse_int(params.get("limit"))
+        if limit <= 0:
+            limit = DEFAULT_LIST_SIZE
+        now = self._now()
+        cid = parse_int(params.get("cid"))
+        cids: t.Sequence[int]
+        if cid:
+            # A single connection is requested, pagination is ignored
+            known = 0 < cid <= self.connections + self.closed_connections
+            cids = [cid] if known else []
+            total = len(cids)
+            offset = 0
+        elif params.get("mqtt_client"):
+            cids = []
+            total = 0
+        else:
+            order = self._order(sort, state)
+            cids = order[offset : offset + limit]
+            total = len(order)
+        return {
+            "server_id": self.server_id,
+            "now": format_timestamp(now),
+            "num_connections": len(cids),
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "connections": [self._connection(cid, now, auth, subs) for cid in cids],
+        }
+
+    def subsz(self, params: t.Dict[str, str]) -> t.Dict[str, t.Any]:
+        subs = parse_bool(params.get("subs"))
+        offset = max(parse_int(params.get("offset")), 0)
+        limit = parse_int(params.get("limit"))
+        if limit <= 0:
+            limit = DEFAULT_LIST_SIZE
+        test = params.get("test")
+        if test is not None and (
+            not test or "*" in test.split(".") or ">" in test.split(".")
+        ):
+            raise _BadRequest(
+                f"Invalid test subject, must be valid publish subject: {test}"
+            )
+        num_subscriptions = (
+            self._subs_until[self.connections - 1] if self.connections else 0
+        )
+        result: t.Dict[str, t.Any] = {
+            "server_id": self.server_id,
+            "now": format_timestamp(self._now()),
+            "num_subscriptions": num_subscriptions,
+            "num_cache": 0,
+            "num_inserts": num_subscriptions,
+            "num_removes": 0,
+            "num_matches": 0,
+            "cache_hit_rate": 0,
+            "max_fanout": 0,
+            "avg_fanout": 0,
+            "total": 0,
+            "offset": offset,
+            "limit": limit,
+        }
+        if subs:
+            details: t.List[t.Dict[str, t.Any]] = []
+            if test:
+                total = 0
+                for cid in range(1, self.connections + 1):
+                    for subject, qgroup, sid in self._subscriptions(cid):
+                        if not subject_matches(test, subject):
+                            continue
+                        if offset <= total < offset + limit:
+                            details.append(
+                                self._subscription_detail(cid, subject, qgroup, sid)
+                            )
+                        total += 1
+            else:
+                total = num_subscriptions
+                # First connection holding a subscription past offset
+                cid = bisect.bisect_right(self._subs_until, offset) + 1
+                skip = offset - (self._subs_until[cid - 2] if cid > 1 else 0)
+                while cid <= self.connections and len(details) < limit:
+                    for subject, qgroup, sid in self._subscriptions(cid)[skip:]:
+                        if len(details) >= limit:
+                            break
+                        details.append(
+                            self._subscription_detail(cid, subject, qgroup, sid)
+                        )
+                    cid += 1
+                    skip = 0
+            result["total"] = total
+            result["subscriptions_list"] = details
+        return result
+
+    def routez(self, params: t.Dict[str, str]) -> t.Dict[str, t.Any]:
+        subs_param = params.get("subs")
+        subs: t.Union[bool, str] = (
+            "detail" if subs_param == "detail" else parse_bool(subs_param)
+        )
+        now = self._now()
+        routes: t.List[t.Dict[str, t.Any]] = []
+        for rid in range(1, self.routes + 1):
+            route: t.Dict[str, t.Any] = {
+                "rid": rid,
+                "remote_id": f"NROUTE{rid}",
+                "did_solicit": rid % 2 == 0,
+                "is_configured": True,
+                "ip": "127.0.0.1",
+                "port": 6222 + rid,
+                "start": format_timestamp(self.started),
+                "last_activity": format_timestamp(now),
+                "rtt": "1ms",
+                "uptime": format_uptime((now - self.started).total_seconds()),
+                "idle": "0s",
+                "pending_size": 0,
+                "in_msgs": 0,
+                "out_msgs": 0,
+                "in_bytes": 0,
+                "out_bytes": 0,
+                "subscriptions": 0,
+            }
+            if subs == "detail":
+                route["subscriptions_list_detail"] = []
+            elif subs:
+                route["subscriptions_list"] = []
+            routes.append(route)
+        return {
+            "server_id": self.server_id,
+            "now": format_timestamp(now),
+            "num_routes": self.routes,
+            "routes": routes,
+        }
+
+    def accstatz(self, params: t.Dict[str, str]) -> t.Dict[str, t.Any]:
+        unused = parse_bool(params.get("unused"))
+        stats: t.Dict[str, t.Dict[str, t.Any]] = {}
+        for index in range(self.accounts):
+            name = self._account(index)
+            stats[name] = {
+                "acc": name,
+                "conns": 0,
+                "leafnodes": 0,
+                "total_conns": 0,
+                "num_subscriptions": 0,
+                "sent": {"msgs": 0, "bytes": 0},
+                "received": {"msgs": 0, "bytes": 0},
+                "slow_consumers": 0,
+            }
+        for cid in range(1, self.connections + 1):
+            index = cid - 1
+            stat = stats[self._account(cid)]
+            stat["conns"] += 1
+            stat["total_conns"] += 1
+            stat["num_subscriptions"] += self._subs[index]
+            stat["sent"]["msgs"] += self._out_msgs[index]
+            stat["sent"]["bytes"] += self._out_bytes[index]
+            stat["received"]["msgs"] += self._in_msgs[index]
+            stat["received"]["bytes"] += self._in_bytes[index]
+        return {
+            "server_id": self.server_id,
+            "now": format_timestamp(self._now()),
+            "account_statz": [
+                stat for stat in stats.values() if unused or stat["conns"]
+            ],
+        }
+
+    def jsz(self, params: t.Dict[str, str]) -> t.Dict[str, t.Any]:
+        if not self.streams:
+            return {
+                "server_id": self.server_id,
+                "now": format_timestamp(self._now()),
+                "disabled": True,
+                "config": {},
+            }
+        streams = parse_bool(params.get("streams"))
+        consumers = parse_bool(params.get("consumers"))
+        config = parse_bool(params.get("config"))
+        accounts = parse_bool(params.get("accounts")) or streams or consumers
+        streams = streams or consumers
+        acc = params.get("acc")
+        offset = max(parse_int(params.get("offset")), 0)
+        limit = parse_int(params.get("limit"))
+        if limit <= 0:
+            limit = DEFAULT_LIST_SIZE
+        now = self._now()
+        total_consumers = self.streams * self.consumers_per_stream
+        result: t.Dict[str, t.Any] = {
+            "server_id": self.server_id,
+            "now": format_timestamp(now),
+            "config": self._jetstream_config(),
+            "memory": 0,
+            "storage": sum(self._stream_bytes),
+            "reserved_memory": 0,
+            "reserved_storage": 0,
+            "accounts": self.accounts,
+            "ha_assets": 0,
+            "api": {"total": 0, "errors": 0},
+            "streams": self.streams,
+            "consumers": total_consumers,
+            "messages": sum(self._stream_messages),
+            "bytes": sum(self._stream_bytes),
+        }
+        if accounts or acc:
+            names = [self._account(index) for index in range(self.accounts)]
+            if acc:
+                names = [name for name in names if name == acc]
+            result["account_details"] = [
+                self._account_detail(name, now, streams, consumers, config)
+                for name in names[offset : offset + limit]
+            ]
+        return result
+
+    def _account_detail(
+        self,
+        name: str,
+        now: datetime,
+        streams: bool,
+        consumers: bool,
+        config: bool,
+    ) -> t.Dict[str, t.Any]:
+        indexes = [
+            index for index in range(self.streams) if self._account(index) == name
+        ]
+        detail: t.Dict[str, t.Any] = {
+            "name": name,
+            "id": name,
+            "memory": 0,
+            "storage": sum(self._stream_bytes[index] for index in indexes),
+            "reserved_memory": 0,
+            "reserved_storage": 0,
+            "accounts": 0,
+            "ha_assets": 0,
+            "api": {"total": 0, "errors": 0},
+        }
+        if streams:
+            detail["stream_detail"] = [
+                self._stream_detail(index, now, consumers, config) for index in indexes
+            ]
+        return detail
+
+    def _stream_detail(
+        self, index: int, now: datetime, consumers: bool, config: bool
+    ) -> t.Dict[str, t.Any]:
+        name = f"STREAM{index}"
+        messages = self._stream_messages[index]
+        created = format_timestamp(self.started)
+        stream: t.Dict[str, t.Any] = {
+            "name": name,
+            "created": created,
+            "cluster": {"leader": self.server_name},
+            "state": {
+                "messages": messages,
+                "bytes": self._stream_bytes[index],
+                "first_seq": 1 if messages else 0,
+                "first_ts": created,
+                "last_seq": messages,
+                "last_ts": format_timestamp(now),
+                "num_subjects": 1,
+                "consumer_count": self.consumers_per_stream,
+            },
+        }
+        if config:
+            stream["config"] = {
+                "name": name,
+                "subjects": [f"sim.streams.{index}.>"],
+                "retention": "limits",
+                "max_consumers": -1,
+                "max_msgs": -1,
+                "max_bytes": -1,
+                "max_age": 0,
+                "max_msg_size": -1,
+                "storage": "file",
+                "discard": "old",
+                "num_replicas": 1,
+                "duplicate_window": 120000000000,
+            }
+        if consumers:
+            stream["consumer_detail"] = [
+                {
+                    "stream_name": name,
+                    "name": f"CONSUMER{consumer}",
+                    "created": created,
+                    "delivered": {"consumer_seq": messages, "stream_seq": messages},
+                    "ack_floor": {"consumer_seq": messages, "stream_seq": messages},
+                    "num_ack_pending": 0,
+                    "num_redelivered": 0,
+                    "num_waiting": 0,
+                    "num_pending": 0,
+                    "cluster": {"leader": self.server_name},
+                }
+                for consumer in range(self.consumers_per_stream)
+            ]
+        return stream
@@ -0,0 +1,915 @@
+"""An in-process stand-in for nats-server, for tests which only need core NATS.
+
+`StandInServer` implements the core client protocol (`INFO`, `CONNECT`, `PUB`, `HPUB`, `SUB`,
+`UNSUB`, `PING`/`PONG`) with wildcards, queue groups and no responders notifications, using an
+asyncio server running in a background thread. A minimal monitoring endpoint (`/varz`, `/connz`,
+`/subsz`, `/healthz`, `/routez`, `/leafz`) is served so that `NATSMonitor` can be used.
+
+It exposes the same interface as `NATSD`, starts in about a millisecond, and does not require
+nats-server to be installed. JetStream, clustering, TLS and accounts are not supported: options
+enabling them raise `ValueError`. Signals are emulated: lame duck mode evicts all
+clients at once before stopping the server, config reload and log file reopening have no effect,
+and `update_config()` only changes authentication and limits applied to new connections.
+
+Example:
+
+```python
+from nats_tools.standin import StandInServer
+
+with StandInServer(port=0, http_port=0) as server:
+    print(server.port, server.monitor.varz()["connections"])
+```
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import secrets
+import threading
+import time
+import typing as t
+from datetime import datetime, timezone
+
+from nats_tools.httpserver import (
+    BackgroundHTTPServer,
+    Response,
+    error_response,
+    format_timestamp,
+    format_uptime,
+    json_response,
+    parse_bool,
+    parse_int,
+)
+from nats_tools.monitor import NATSMonitor
+from nats_tools.natsd import Signal
+from nats_tools.simulator import DEFAULT_LIST_SIZE
+from nats_tools.subjects import SubjectIndex, Subscription, subject_matches
+
+VERSION = "2.10.0-standin"
+MAX_PAYLOAD = 1024 * 1024
+# Status message sent to requesters when no subscription matches the request subject
+NO_RESPONDERS = b"NATS/1.0 503\r\n\r\n"
+
+# NATSD options which have no effect on the stand-in server
+IGNORED_OPTIONS = {
+    "debug",
+    "trace",
+    "trace_verbose",
+    "logtime",
+    "output_file",
+    "max_cpus",
+    "start_timeout",
+    "workspace",
+    "registry",
+    "pid_file",
+    "port_file_dir",
+    "log_file",
+    "log_size_limit",
+    "server_tags",
+    "client_advertise",
+    "store_directory",
+    "max_pending",
+    "write_deadline",
+    "max_control_line",
+    "ping_interval",
+    "ping_max",
+    "no_fast_producer_stall",
+}
+# NATSD options which can be changed using `update_config()`
+UPDATABLE_OPTIONS = {
+    "user",
+    "password",
+    "token",
+    "users",
+    "max_payload",
+    "max_connections",
+}
+# NATSD options supported by the stand-in server
+SUPPORTED_OPTIONS = {"address", "port", "http_port", "server_name"} | UPDATABLE_OPTIONS
+
+
+class _Connection(asyncio.Protocol):
+    """A client connection accepted by the stand-in server."""
+
+    def __init__(self, server: "StandInServer", cid: int) -> None:
+        self.server = server
+        self.cid = cid
+        self.transport: t.Optional[asyncio.Transport] = None
+        self.ip = ""
+        self.port = 0
+        self.options: t.Dict[str, t.Any] = {}
+        self.authorized_user = ""
+        self.connected = False
+        self.subscriptions: t.Dict[str, Subscription] = {}
+        # Messages delivered to each subscription, and maximum set using UNSUB
+        self.delivered: t.Dict[str, int] = {}
+        self.limits: t.Dict[str, int] = {}
+        self.in_msgs = 0
+        self.out_msgs = 0
+        self.in_bytes = 0
+        self.out_bytes = 0
+        self.started = time.time()
+        self.last_activity = self.started
+        self._buffer = bytearray()
+        # Header line of a message waiting for its payload
+        self._message: t.Optional[t.Tuple[str, t.Optional[str], int, int]] = None
+
+    @property
+    def pending_bytes(self) -> int:
+        if self.transport is None or self.transport.is_closing():
+            return 0
+        return self.transport.get_write_buffer_size()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = t.cast(asyncio.Transport, transport)
+        peer = self.transport.get_extra_info("peername") or ("", 0)
+        self.ip, self.port = peer[0], peer[1]
+        info = self.server.info(self)
+        self.write(b"INFO " + json.dumps(info).encode() + b"\r\n")
+        if not self.server.accepts_connection():
+            self.error("maximum connections exceeded")
+            return
+        self.server.connections[self.cid] = self
+
+    def connection_lost(self, exc: t.Optional[Exception]) -> None:
+        self.server.connections.pop(self.cid, None)
+        for subscription in self.subscriptions.values():
+            self.server.index.remove(subscription)
+        self.subscriptions.clear()
+
+    def write(self, data: bytes) -> None:
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(data)
+
+    def error(self, message: str) -> None:
+        """Send an error and close the connection."""
+        self.write(f"-ERR '{message}'\r\n".encode())
+        if self.transport is not None:
+            self.transport.close()
+
+    def data_received(self, data: bytes) -> None:
+        self.last_activity = time.time()
+        buffer = self._buffer
+        buffer += data
+        offset = 0
+        size = len(buffer)
+        while self.transport is not None and not self.transport.is_closing():
+            if self._message is not None:
+                subject, reply, headers, length = self._message
+                if size - offset < length + 2:
+                    break
+                payload = bytes(buffer[offset : offset + length])
+                offset += length + 2
+                self._message = None
+                self.in_msgs += 1
+                self.in_bytes += length
+                self.server.publish(self, subject, reply, headers, payload)
+                continue
+            end = buffer.find(b"\r\n", offset)
+            if end < 0:
+                break
+            try:
+                line = bytes(buffer[offset:end]).decode()
+            except UnicodeDecodeError:
+                self.error("Unknown Protocol Operation")
+                break
+            offset = end + 2
+            self._process(line)
+        del buffer[:offset]
+
+    def _process(self, line: str) -> None:
+        op, _, args = line.partition(" ")
+        op = op.upper()
+        if not self.connected and op != "CONNECT" and self.server.auth_required:
+            self.error("Authorization Violation")
+            return
+        if op == "CONNECT":
+            self._connect(args)
+        elif op == "PING":
+            self.write(b"PONG\r\n")
+        elif op == "PONG":
+            pass
+        elif op == "SUB":
+            self._subscribe(args.split())
+        elif op == "UNSUB":
+            self._unsubscribe(args.split())
+        elif op in ("PUB", "HPUB"):
+            self._publish(op, args.split())
+        else:
+            self.error("Unknown Protocol Operation")
+            return
+        if self.options.get("verbose") and op not in ("PING", "PONG"):
+            self.write(b"+OK\r\n")
+
+    def _connect(self, args: str) -> None:
+        try:
+            self.options = json.loads(args)
+        except ValueError:
+            self.error("Invalid CONNECT options")
+            return
+        user = self.server.authenticate(self.options)
+        if user is None:
+            self.error("Authorization Violation")
+            return
+        self.authorized_user = user
+        self.connected = True
+
+    def _subscribe(self, parts: t.List[str]) -> None:
+        if len(parts) not in (2, 3):
+            self.error("Unknown Protocol Operation")
+            return
+        subject, sid = parts[0], parts[-1]
+        if not _valid_subject(subject, wildcards=True):
+            self.error("Invalid Subject")
+            return
+        queue = parts[1] if len(parts) == 3 else None
+        previous = self.subscriptions.pop(sid, None)
+        if previous is not None:
+            self.server.index.remove(previous)
+        subscription = Subscription(subject, cid=self.cid, sid=sid, queue=queue)
+        self.subscriptions[sid] = subscription
+        self.delivered[sid] = 0
+        self.server.index.add(subscription)
+
+    def _unsubscribe(self, parts: t.List[str]) -> None:
+        if len(parts) not in (1, 2):
+            self.error("Unknown Protocol Operation")
+            return
+        sid = parts[0]
+        if sid not in self.subscriptions:
+            return
+        maximum = _parse_size(parts[1]) if len(parts) == 2 else None
+        if len(parts) == 2 and maximum is None:
+            self.error("Unknown Protocol Operation")
+            return
+        if maximum is not None and maximum > self.delivered[sid]:
+            self.limits[sid] = maximum
+            return
+        self.remove_subscription(sid)
+
+    def remove_subscription(self, sid: str) -> None:
+        subscription = self.subscriptions.pop(sid, None)
+        if subscription is not None:
+            self.server.index.remove(subscription)
+        self.delivered.pop(sid, None)
+        self.limits.pop(sid, None)
+
+    def _publish(self, op: str, parts: t.List[str]) -> None:
+        count = 3 if op == "PUB" else 4
+        if len(parts) not in (count - 1, count):
+            self.error("Unknown Protocol Operation")
+            return
+        length = _parse_size(parts[-1])
+        headers = _parse_size(parts[-2]) if op == "HPUB" else 0
+        if length is None or headers is None or headers > length:
+            self.error("Unknown Protocol Operation")
+            return
+        if length > self.server.max_payload:
+            self.error("Maximum Payload Violation")
+            return
+        if not _valid_subject(parts[0], wildcards=False):
+            self.error("Invalid Publish Subject")
+            return
+        reply = parts[1] if len(parts) == count else None
+        self._message = (parts[0], reply, headers, length)
+
+    def deliver(
+        self,
+        sid: str,
+        subject: str,
+        reply: t.Optional[str],
+        headers: int,
+        payload: bytes,
+    ) -> None:
+        reply_part = f" {reply}" if reply else ""
+        if headers and self.options.get("headers"):
+            line = f"HMSG {subject} {sid}{reply_part} {headers} {len(payload)}\r\n"
+        else:
+            # Headers are dropped when client does not support them
+            payload = payload[headers:]
+            line = f"MSG {subject} {sid}{reply_part} {len(payload)}\r\n"
+        self.write(line.encode() + payload + b"\r\n")
+        self.out_msgs += 1
+        self.out_bytes += len(payload)
+        if sid in self.delivered:
+            self.delivered[sid] += 1
+            limit = self.limits.get(sid)
+            if limit is not None and self.delivered[sid] >= limit:
+                self.remove_subscription(sid)
+
+
+# Sort options of /connz, with the function returning the sort key of a connection
+CONNZ_SORTS: t.Dict[str, t.Callable[[_Connection], t.Any]] = {
+    "cid": lambda connection: connection.cid,
+    "start": lambda connection: connection.started,
+    "subs": lambda connection: len(connection.subscriptions),
+    "pending": lambda connection: connection.pending_bytes,
+    "msgs_to": lambda connection: connection.out_msgs,
+    "msgs_from": lambda connection: connection.in_msgs,
+    "bytes_to": lambda connection: connection.out_bytes,
+    "bytes_from": lambda connection: connection.in_bytes,
+    "last": lambda connection: connection.last_activity,
+    "idle": lambda connection: -connection.last_activity,
+    "uptime": lambda connection: -connection.started,
+}
+
+
+def _parse_size(value: str) -> t.Optional[int]:
+    """Parse a size of the protocol, returning None when it is not a non-negative integer."""
+    if not value.isascii() or not value.isdigit():
+        return None
+    return int(value)
+
+
+def _valid_subject(subject: str, wildcards: bool) -> bool:
+    tokens = subject.split(".")
+    for index, token in enumerate(tokens):
+        if not token:
+            return False
+        if token in ("*", ">"):
+            if not wildcards or (token == ">" and index != len(tokens) - 1):
+                return False
+    return True
+
+
+class _Monitor(BackgroundHTTPServer):
+    poll_interval = 0.01
+
+    def __init__(self, server: "StandInServer", address: str, port: int) -> None:
+        super().__init__(address=address, port=port)
+        self.server = server
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        return self.server.call(self.server.handle_monitoring, path, params)
+
+
+def _unsupported(options: t.Dict[str, t.Any], allowed: t.Set[str]) -> t.List[str]:
+    return sorted(
+        name
+        for name, value in options.items()
+        if name not in allowed and value not in (None, False)
+    )
+
+
+def _check_options(options: t.Dict[str, t.Any], allowed: t.Set[str]) -> None:
+    unsupported = _unsupported(options, allowed)
+    if unsupported:
+        raise ValueError(
+            f"Options not supported by stand-in server: {', '.join(unsupported)}"
+        )
+
+
+def unsupported_options(options: t.Dict[str, t.Any]) -> t.List[str]:
+    """Return the names of `NATSD` options enabling features not supported by `StandInServer`."""
+    return _unsupported(options, SUPPORTED_OPTIONS | IGNORED_OPTIONS)
+
+
+class StandInServer:
+    def __init__(
+        self,
+        address: str = "127.0.0.1",
+        port: int = 4222,
+        http_port: int = 8222,
+        server_name: t.Optional[str] = None,
+        user: t.Optional[str] = None,
+        password: t.Optional[str] = None,
+        token: t.Optional[str] = None,
+        users: t.Optional[t.List[t.Dict[str, t.Any]]] = None,
+        max_payload: t.Optional[int] = None,
+        max_connections: t.Optional[int] = None,
+        **options: t.Any,
+    ) -> None:
+        """Create a new stand-in server. Server is not started until `start()` is called.
+
+        Arguments:
+            address: host address server should listen to. Default is 127.0.0.1.
+            port: client port. Use 0 to listen on a free port. Default is 4222.
+            http_port: monitoring port. Use 0 to listen on a free port. Default is 8222.
+            server_name: the server name. Default to the server ID.
+            user: username required for connections. Omitted by default.
+            password: password required for connections. Omitted by default.
+            token: authorization token required for connections. Omitted by default.
+            users: users allowed to connect, as dictionaries with `user` and `password` keys.
+            max_payload: maximum payload size in bytes. Default is 1MB.
+            max_connections: maximum number of client connections. Unlimited by default.
+            options: other `NATSD` options. Options without effect on core NATS are ignored.
+
+        Raises:
+            ValueError: when an option enables a feature which is not supported.
+        """
+        _check_options(options, IGNORED_OPTIONS)
+        self.address = address
+        self.port = port
+        self.http_port = http_port
+        self.server_id = "N" + secrets.token_hex(27).upper()
+        self.server_name = server_name or self.server_id
+        self._configure(
+            user=user,
+            password=password,
+            token=token,
+            users=users,
+            max_payload=max_payload,
+            max_connections=max_connections,
+        )
+        # Attributes shared with NATSD
+        self.timings: t.Dict[str, float] = {}
+        self.proc = None
+        self.attached = False
+        self.jetstream_enabled = False
+        self.tls = False
+        self.tls_verify = False
+        self.tls_cert: t.Optional[str] = None
+        self.tls_key: t.Optional[str] = None
+        self.tls_ca_cert: t.Optional[str] = None
+        self.config_options: t.Optional[t.Dict[str, t.Any]] = None
+        self.monitor = NATSMonitor(f"http://{self.address}:{self.http_port}")
+        self.config_load_time = datetime.now(timezone.utc)
+
+        self.connections: t.Dict[int, _Connection] = {}
+        self.index = SubjectIndex()
+        self.total_connections = 0
+        self.started = datetime.now(timezone.utc)
+        self._cids = itertools.count(1)
+        self._random = random.Random()
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._thread: t.Optional[threading.Thread] = None
+        self._server: t.Optional[asyncio.Server] = None
+        self._monitor = _Monitor(self, address, http_port)
+
+    def _configure(
+        self,
+        user: t.Optional[str],
+        password: t.Optional[str],
+        token: t.Optional[str],
+        users: t.Optional[t.List[t.Dict[str, t.Any]]],
+        max_payload: t.Optional[int],
+        max_connections: t.Optional[int],
+    ) -> None:
+        if user or password:
+            if not (user and password):
+                raise ValueError(
+                    "Both user and password argument must be provided together"
+                )
+        self.user = user
+        self.password = password
+        self.token = token
+        self.users = {entry["user"]: entry.get("password") for entry in users or []}
+        if user and password:
+            self.users[user] = password
+        self.max_payload = max_payload or MAX_PAYLOAD
+        self.max_connections = max_connections
+        self._options: t.Dict[str, t.Any] = {
+            "user": user,
+            "password": password,
+            "token": token,
+            "users": users,
+            "max_payload": max_payload,
+            "max_connections": max_connections,
+        }
+
+    @property
+    def auth_required(self) -> bool:
+        return bool(self.users or self.token)
+
+    @property
+    def pid(self) -> t.Optional[int]:
+        return None
+
+    def info(self, connection: _Connection) -> t.Dict[str, t.Any]:
+        return {
+            "server_id": self.server_id,
+            "server_name": self.server_name,
+            "version": VERSION,
+            "proto": 1,
+            "host": self.address,
+            "port": self.port,
+            "headers": True,
+            "auth_required": self.auth_required,
+            "max_payload": self.max_payload,
+            "client_id": connection.cid,
+            "client_ip": connection.ip,
+        }
+
+    def accepts_connection(self) -> bool:
+        if self.max_connections and len(self.connections) >= self.max_connections:
+            return False
+        self.total_connections += 1
+        return True
+
+    def authenticate(self, options: t.Dict[str, t.Any]) -> t.Optional[str]:
+        """Return the authorized user of a connection, or None when connection is rejected."""
+        if self.token:
+            return "" if options.get("auth_token") == self.token else None
+        if self.users:
+            name = options.get("user")
+            if name in self.users and self.users[name] == options.get("pass"):
+                return t.cast(str, name)
+            return None
+        return ""
+
+    def publish(
+        self,
+        publisher: _Connection,
+        subject: str,
+        reply: t.Optional[str],
+        headers: int,
+        payload: bytes,
+    ) -> None:
+        match = self.index.match(subject)
+        delivered = False
+        for subscription in match.subscriptions:
+            connection = self.connections.get(subscription.cid)
+            if connection is not None:
+                connection.deliver(subscription.sid, subject, reply, headers, payload)
+                delivered = True
+        for members in match.queues.values():
+            member = self._random.choice(members)
+            connection = self.connections.get(member.cid)
+            if connection is not None:
+                connection.deliver(member.sid, subject, reply, headers, payload)
+                delivered = True
+        if (
+            not delivered
+            and reply
+            and publisher.options.get("headers")
+            and publisher.options.get("no_responders")
+        ):
+            for sid, subscription in list(publisher.subscriptions.items()):
+                if subject_matches(reply, subscription.subject):
+                    publisher.deliver(
+                        sid, reply, None, len(NO_RESPONDERS), NO_RESPONDERS
+                    )
+                    break
+
+    def call(
+        self, func: t.Callable[..., Response], *args: t.Any, timeout: float = 10
+    ) -> Response:
+        """Call a function within the event loop of the server and return its result."""
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return error_response(503, "server is not running")
+
+        async def _call() -> Response:
+            return func(*args)
+
+        return asyncio.run_coroutine_threadsafe(_call(), loop).result(timeout)
+
+    # Lifecycle
+
+    def start(self, wait: bool = False) -> "StandInServer":
+        """Start the server. Server accepts connections once this method returns, wait is ignored."""
+        if self._loop is not None:
+            return self
+        started = time.perf_counter()
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        self._thread = threading.Thread(
+            target=loop.run_forever, name=f"nats-standin-{self.port}", daemon=True
+        )
+        self._thread.start()
+
+        async def _serve() -> asyncio.Server:
+            return await loop.create_server(
+                lambda: _Connection(self, next(self._cids)), self.address, self.port
+            )
+
+        try:
+            self._server = asyncio.run_coroutine_threadsafe(_serve(), loop).result()
+            self.port = self._server.sockets[0].getsockname()[1]
+            self._monitor.start()
+        except BaseException:
+            self.stop()
+            raise
+        self.http_port = self._monitor.port
+        self.monitor = NATSMonitor(f"http://{self.address}:{self.http_port}")
+        self.started = datetime.now(timezone.utc)
+        self.timings["spawn"] = time.perf_counter() - started
+        return self
+
+    def stop(self, timeout: t.Optional[float] = 10) -> None:
+        """Close all connections and stop the server."""
+        loop = self._loop
+        if loop is None:
+            return
+        started = time.perf_counter()
+        self._monitor.stop()
+
+        async def _shutdown() -> None:
+            if self._server is not None:
+                self._server.close()
+            for connection in list(self.connections.values()):
+                if connection.transport is not None:
+                    connection.transport.close()
+            if self._server is not None:
+                await self._server.wait_closed()
+
+        if loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout)
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        loop.close()
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self.timings["stop"] = time.perf_counter() - started
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def cleanup(self) -> None:
+        """Nothing is written to disk, so there is nothing to clean up."""
+
+    def wait(self, timeout: t.Optional[float] = None) -> int:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return 0
+
+    def kill(self, timeout: t.Optional[float] = None) -> None:
+        self.stop(timeout)
+
+    def term(self, timeout: t.Optional[float] = 10) -> None:
+        self.stop(timeout)
+
+    def quit(self, timeout: t.Optional[float] = None) -> None:
+        self.stop(timeout)
+
+    def send_signal(self, sig: t.Union[int, Signal]) -> None:
+        """Emulate the effect of a signal sent to nats-server."""
+        if self._loop is None:
+            raise TypeError("Process is not started yet")
+        sig = sig if isinstance(sig, Signal) else Signal(sig)
+        if sig == Signal.LDM:
+            self.enter_lame_duck_mode()
+        elif sig in (Signal.RELOAD, Signal.REOPEN):
+            pass
+        else:
+            self.stop()
+
+    def reopen_log_file(self) -> None:
+        """Nothing is logged, so reopening the log file has no effect."""
+
+    def enter_lame_duck_mode(self) -> None:
+        """Stop accepting connections, notify clients, then evict them all and stop.
+
+        Unlike nats-server, clients are not evicted over a duration: server stops immediately.
+        """
+        if self._loop is None:
+            raise TypeError("Process is not started yet")
+
+        def _notify() -> Response:
+            if self._server is not None:
+                self._server.close()
+            for connection in self.connections.values():
+                info = {**self.info(connection), "ldm": True}
+                connection.write(b"INFO " + json.dumps(info).encode() + b"\r\n")
+            return 200, b""
+
+        self.call(_notify)
+        self.stop()
+
+    def reload_config(self) -> None:
+        """Configuration is only changed using `update_config()`, so reloading has no effect."""
+
+    def update_config(
+        self, wait: bool = True, timeout: float = 5, **options: t.Any
+    ) -> None:
+        """Update authentication and limits, applied to new connections.
+
+        Arguments:
+            wait: ignored, options are updated once this method returns.
+            timeout: maximum seconds to wait for the update. Default is 5 seconds.
+            options: options which should be updated, among `UPDATABLE_OPTIONS`. Options without
+                effect on the stand-in server are ignored.
+
+        Raises:
+            ValueError: when an option cannot be updated.
+        """
+        _check_options(options, IGNORED_OPTIONS | UPDATABLE_OPTIONS)
+        updated = {
+            **self._options,
+            **{
+                key: value for key, value in options.items() if key in UPDATABLE_OPTIONS
+            },
+        }
+
+        def _update() -> Response:
+            self._configure(**updated)
+            self.config_load_time = datetime.now(timezone.utc)
+            return 200, b""
+
+        if self._loop is None:
+            _update()
+        else:
+            self.call(_update, timeout=timeout)
+
+    def __enter__(self) -> "StandInServer":
+        return self.start(wait=True)
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.stop()
+
+    # Monitoring, called within the event loop
+
+    def handle_monitoring(self, path: str, params: t.Dict[str, str]) -> Response:
+        handlers: t.Dict[str, t.Callable[[t.Dict[str, str]], Response]] = {
+            "/varz": self.varz,
+            "/connz": self.connz,
+            "/subsz": self.subsz,
+            "/healthz": self.healthz,
+            "/routez": lambda _: json_response(
+                {"server_id": self.server_id, "num_routes": 0, "routes": []}
+            ),
+            "/leafz": lambda _: json_response(
+                {"server_id": self.server_id, "leafnodes": 0, "leafs": []}
+            ),
+        }
+        handler = handlers.get(path.rstrip("/") or "/")
+        if handler is None:
+            return 404, b"404 page not found\n"
+        try:
+            return handler(params)
+        except ValueError as exc:
+            return 400, str(exc).encode("utf-8")
+
+    def healthz(self, params: t.Dict[str, str]) -> Response:
+        if parse_bool(params.get("js_enabled")):
+            return json_response(
+                {"status": "unavailable", "error": "JetStream not enabled"}, 503
+            )
+        return json_response({"status": "ok"})
+
+    def varz(self, params: t.Dict[str, str]) -> Response:
+        now = datetime.now(timezone.utc)
+        connections = list(self.connections.values())
+        return json_response(
+            {
+                "server_id": self.server_id,
+                "server_name": self.server_name,
+                "version": VERSION,
+                "proto": 1,
+                "host": self.address,
+                "port": self.port,
+                "auth_required": self.auth_required,
+                "max_connections": self.max_connections or 65536,
+                "http_host": self.address,
+                "http_port": self.http_port,
+                "max_payload": self.max_payload,
+                "cluster": {},
+                "gateway": {},
+                "leaf": {},
+                "jetstream": {},
+                "start": format_timestamp(self.started),
+                "now": format_timestamp(now),
+                "uptime": format_uptime((now - self.started).total_seconds()),
+                "connections": len(connections),
+                "total_connections": self.total_connections,
+                "routes": 0,
+                "remotes": 0,
+                "leafnodes": 0,
+                "in_msgs": sum(connection.in_msgs for connection in connections),
+                "out_msgs": sum(connection.out_msgs for connection in connections),
+                "in_bytes": sum(connection.in_bytes for connection in connections),
+                "out_bytes": sum(connection.out_bytes for connection in connections),
+                "slow_consumers": 0,
+                "subscriptions": len(self.index),
+                "config_load_time": format_timestamp(self.config_load_time),
+            }
+        )
+
+    def _connection(
+        self, connection: _Connection, now: float, auth: bool, subs: t.Union[bool, str]
+    ) -> t.Dict[str, t.Any]:
+        result: t.Dict[str, t.Any] = {
+            "cid": connection.cid,
+            "kind": "Client",
+            "type": "nats",
+            "ip": connection.ip,
+            "port": connection.port,
+            "start": format_timestamp(
+                datetime.fromtimestamp(connection.started, timezone.utc)
+            ),
+            "last_activity": format_timestamp(
+                datetime.fromtimestamp(connection.last_activity, timezone.utc)
+            ),
+            "uptime": format_uptime(now - connection.started),
+            "idle": format_uptime(now - connection.last_activity),
+            "pending_bytes": connection.pending_bytes,
+            "in_msgs": connection.in_msgs,
+            "out_msgs": connection.out_msgs,
+            "in_bytes": connection.in_bytes,
+            "out_bytes": connection.out_bytes,
+            "subscriptions": len(connection.subscriptions),
+            "name": connection.options.get("name", ""),
+            "lang": connection.options.get("lang", ""),
+            "version": connection.options.get("version", ""),
+        }
+        if auth and connection.authorized_user:
+            result["authorized_user"] = connection.authorized_user
+        if subs == "detail":
+            result["subscriptions_list_detail"] = [
+                self._subscription_detail(subscription, connection)
+                for subscription in connection.subscriptions.values()
+            ]
+        elif subs:
+            result["subscriptions_list"] = [
+                subscription.subject
+                for subscription in connection.subscriptions.values()
+            ]
+        return result
+
+    def _subscription_detail(
+        self, subscription: Subscription, connection: _Connection
+    ) -> t.Dict[str, t.Any]:
+        detail: t.Dict[str, t.Any] = {
+            "account": subscription.account,
+            "subject": subscription.subject,
+            "sid": subscription.sid,
+            "msgs": connection.delivered.get(subscription.sid, 0),
+            "cid": connection.cid,
+        }
+        if subscription.queue:
+            detail["qgroup"] = subscription.queue
+        if subscription.sid in connection.limits:
+            detail["max"] = connection.limits[subscription.sid]
+        return detail
+
+    def connz(self, params: t.Dict[str, str]) -> Response:
+        sort = params.get("sort") or "cid"
+        if sort not in CONNZ_SORTS:
+            raise ValueError(f"Invalid sorting option: {sort}")
+        state = params.get("state") or "open"
+        if state not in ("open", "closed", "any"):
+            raise ValueError(f"Invalid state option: {state}")
+        subs_param = params.get("subs")
+        subs: t.Union[bool, str] = (
+            "detail" if subs_param == "detail" else parse_bool(subs_param)
+        )
+        offset = max(parse_int(params.get("offset")), 0)
+        limit = parse_int(params.get("limit"))
+        if limit <= 0:
+            limit = DEFAULT_LIST_SIZE
+        # Closed connections are not kept
+        connections = [] if state == "closed" else list(self.connections.values())
+        cid = parse_int(params.get("cid"))
+        if cid:
+            connections = [
+                connection for connection in connections if connection.cid == cid
+            ]
+            offset = 0
+        key = CONNZ_SORTS[sort]
+        connections.sort(key=key, reverse=sort not in ("cid", "start"))
+        page = connections[offset : offset + limit]
+        now = time.time()
+        auth = parse_bool(params.get("auth"))
+        return json_response(
+            {
+                "server_id": self.server_id,
+                "now": format_timestamp(datetime.now(timezone.utc)),
+                "num_connections": len(page),
+                "total": len(connections),
+                "offset": offset,
+                "limit": limit,
+                "connections": [
+                    self._connection(connection, now, auth, subs) for connection in page
+                ],
+            }
+        )
+
+    def subsz(self, params: t.Dict[str, str]) -> Response:
+        offset = max(parse_int(params.get("offset")), 0)
+        limit = parse_int(params.get("limit"))
+        if limit <= 0:
+            limit = DEFAULT_LIST_SIZE
+        test = params.get("test")
+        if test is not None and not _valid_subject(test, wildcards=False):
+            raise ValueError(
+                f"Invalid test subject, must be valid publish subject: {test}"
+            )
+        details = [
+            self._subscription_detail(subscription, connection)
+            for connection in list(self.connections.values())
+            for subscription in connection.subscriptions.values()
+            if test is None or subject_matches(test, subscription.subject)
+        ]
+        result: t.Dict[str, t.Any] = {
+            "server_id": self.server_id,
+            "now": format_timestamp(datetime.now(timezone.utc)),
+            "num_subscriptions": len(self.index),
+            "num_cache": 0,
+            "num_inserts": 0,
+            "num_removes": 0,
+            "num_matches": 0,
+            "cache_hit_rate": 0,
+            "max_fanout": 0,
+            "avg_fanout": 0,
+            "total": len(details),
+            "offset": offset,
+            "limit": limit,
+        }
+        if parse_bool(params.get("subs")):
+            result["subscriptions_list"] = details[offset : offset + limit]
+        return json_response(result)
@@ -0,0 +1,172 @@
+"""Small statistics helpers used to summarize timing samples."""
+
+import math
+import typing as t
+
+
+def percentile(samples: t.Sequence[float], q: float) -> float:
+    """Compute a percentile using linear interpolation between closest ranks.
+
+    Arguments:
+        samples: the samples. They do not need to be sorted.
+        q: the percentile to compute, between 0 and 100.
+
+    Returns:
+        the percentile, or NaN when there is no sample.
+    """
+    if not samples:
+        return math.nan
+    if not 0 <= q <= 100:
+        raise ValueError("percentile must be between 0 and 100")
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples: t.Sequence[float]) -> t.Dict[str, float]:
+    """Summarize samples into count, total, min, max, mean, stdev and common percentiles."""
+    count = len(samples)
+    if not count:
+        return {"count": 0, "total": 0.0}
+    total = math.fsum(samples)
+    mean = total / count
+    variance = math.fsum((sample - mean) ** 2 for sample in samples) / count
+    return {
+        "count": count,
+        "total": total,
+        "min": min(samples),
+        "max": max(samples),
+        "mean": mean,
+        "stdev": math.sqrt(variance),
+        "p50": percentile(samples, 50),
+        "p90": percentile(samples, 90),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+class LogHistogram:
+    def __init__(self, precision: int = 7) -> None:
+        """A histogram of non-negative integers using log-linear buckets, similar to HDR histograms.
+
+        Values below `2 ** precision` are recorded exactly. Larger values are recorded into buckets
+        whose width grows with the value, so that the relative error stays below `2 ** (1 - precision)`
+        (1.6% using the default precision) while memory only grows with the log of the largest value.
+
+        Arguments:
+            precision: number of significant bits kept for each value. Default is 7.
+        """
+        if precision < 2:
+            raise ValueError("precision must be at least 2")
+        self.precision = precision
+        self.counts: t.Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.precision
+        if shift <= 0:
+            return value
+        return (shift << (self.precision - 1)) + (value >> shift)
+
+    def _bounds(self, index: int) -> t.Tuple[int, int]:
+        """Return the lowest and highest value of a bucket."""
+        half = 1 << (self.precision - 1)
+        if index < 2 * half:
+            return index, index
+        shift = index // half - 1
+        mantissa = index - shift * half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("value must not be negative")
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += count
+        self.total += value * count
+
+    def merge(self, other: "LogHistogram") -> None:
+        """Add values recorded by another histogram using the same precision."""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge histograms with distinct precisions")
+        if not other.count:
+            return
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.min = min(self.min, other.min) if self.count else other.min
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, q: float) -> float:
+        """Estimate a percentile, between 0 and 100, as the middle of the bucket holding it.
+
+        Returns:
+            the percentile, or NaN when histogram is empty.
+        """
+        if not 0 <= q <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if not self.count:
+            return math.nan
+        if q == 100:
+            return float(self.max)
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min(max((low + high) / 2, self.min), self.max)
+        return float(self.max)
+
+    def summary(self, scale: float = 1) -> t.Dict[str, float]:
+        """Summarize values into count, min, max, mean and common percentiles.
+
+        Arguments:
+            scale: factor applied to values, for example `1e-9` to convert nanoseconds to seconds.
+        """
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": self.min * scale,
+            "max": self.max * scale,
+            "mean": self.total / self.count * scale,
+            "p50": self.percentile(50) * scale,
+            "p90": self.percentile(90) * scale,
+            "p99": self.percentile(99) * scale,
+            "p999": self.percentile(99.9) * scale,
+        }
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "precision": self.precision,
+            "counts": self.counts,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: t.Dict[str, t.Any]) -> "LogHistogram":
+        histogram = cls(data["precision"])
+        histogram.counts = {
+            int(index): count for index, count in data["counts"].items()
+        }
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
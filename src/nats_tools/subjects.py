@@ -0,0 +1,272 @@
+"""Helpers to work with NATS subjects and wildcards."""
+
+import typing as t
+from dataclasses import dataclass, field
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from nats_tools.monitor import NATSMonitor
+
+
+def tokenize(subject: str) -> t.List[str]:
+    """Split a subject into tokens."""
+    return subject.split(".")
+
+
+def subject_matches(subject: str, pattern: str) -> bool:
+    """Check whether a literal subject matches a subscription subject.
+
+    Arguments:
+        subject: a literal subject such as `foo.bar.baz`.
+        pattern: a subscription subject which may contain `*` and `>` wildcards.
+
+    Returns:
+        True when a message published on subject would be received by a subscription on pattern.
+    """
+    tokens = tokenize(subject)
+    pattern_tokens = tokenize(pattern)
+    for index, token in enumerate(pattern_tokens):
+        if token == ">":
+            return len(tokens) > index
+        if index >= len(tokens):
+            return False
+        if token != "*" and token != tokens[index]:
+            return False
+    return len(tokens) == len(pattern_tokens)
+
+
+@dataclass(frozen=True)
+class Subscription:
+    """A subscription as reported by `/connz?subs=detail` or `/subsz?subs=1`."""
+
+    subject: str
+    cid: int = 0
+    sid: str = ""
+    account: str = "$G"
+    queue: t.Optional[str] = None
+    msgs: int = 0
+
+    @classmethod
+    def from_detail(cls, detail: t.Dict[str, t.Any]) -> "Subscription":
+        return cls(
+            subject=detail["subject"],
+            cid=detail.get("cid", 0),
+            sid=str(detail.get("sid", "")),
+            account=detail.get("account") or "$G",
+            queue=detail.get("qgroup") or None,
+            msgs=detail.get("msgs", 0),
+        )
+
+
+@dataclass
+class Match:
+    """Subscriptions matching a subject.
+
+    Attributes:
+        subscriptions: plain subscriptions. Each of them receives a copy of the message.
+        queues: subscriptions grouped by queue group name. A single member of each group receives the message.
+    """
+
+    subscriptions: t.List[Subscription] = field(default_factory=list)
+    queues: t.Dict[str, t.List[Subscription]] = field(default_factory=dict)
+
+    @property
+    def fanout(self) -> int:
+        """Number of copies of a message delivered to subscribers."""
+        return len(self.subscriptions) + len(self.queues)
+
+    @property
+    def connections(self) -> t.Set[int]:
+        """Connections receiving the message through a plain subscription."""
+        return {subscription.cid for subscription in self.subscriptions}
+
+    @property
+    def candidates(self) -> t.Set[int]:
+        """Connections which may receive the message, including all queue group members."""
+        cids = self.connections
+        for members in self.queues.values():
+            cids.update(member.cid for member in members)
+        return cids
+
+
+class _Node:
+    __slots__ = ("children", "subscriptions")
+
+    def __init__(self) -> None:
+        self.children: t.Dict[str, "_Node"] = {}
+        self.subscriptions: t.List[Subscription] = []
+
+
+class SubjectIndex:
+    def __init__(self, subscriptions: t.Iterable[Subscription] = ()) -> None:
+        """Create an in-memory index of subscriptions supporting `*` and `>` wildcards.
+
+        Subscriptions are stored in one subject tree per account. Match results are cached until
+        the index is modified.
+
+        Arguments:
+            subscriptions: subscriptions to index.
+        """
+        self._roots: t.Dict[str, _Node] = {}
+        self._cache: t.Dict[t.Tuple[t.Optional[str], str], Match] = {}
+        self._count = 0
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, subscription: Subscription) -> None:
+        node = self._roots.setdefault(subscription.account, _Node())
+        for token in tokenize(subscription.subject):
+            child = node.children.get(token)
+            if child is None:
+                child = node.children[token] = _Node()
+            node = child
+        node.subscriptions.append(subscription)
+        self._count += 1
+        self._cache.clear()
+
+    def remove(self, subscription: Subscription) -> bool:
+        """Remove a subscription. Returns False when subscription is not indexed."""
+        node = self._roots.get(subscription.account)
+        for token in tokenize(subscription.subject):
+            if node is None:
+                return False
+            node = node.children.get(token)
+        if node is None or subscription not in node.subscriptions:
+            return False
+        node.subscriptions.remove(subscription)
+        self._count -= 1
+        self._cache.clear()
+        return True
+
+    def _collect(
+        self,
+        node: _Node,
+        tokens: t.List[str],
+        index: int,
+        results: t.List[Subscription],
+    ) -> None:
+        full = node.children.get(">")
+        if full is not None and index < len(tokens):
+            results.extend(full.subscriptions)
+        if index == len(tokens):
+            results.extend(node.subscriptions)
+            return
+        literal = node.children.get(tokens[index])
+        if literal is not None:
+            self._collect(literal, tokens, index + 1, results)
+        partial = node.children.get("*")
+        if partial is not None:
+            self._collect(partial, tokens, index + 1, results)
+
+    def match(self, subject: str, account: t.Optional[str] = None) -> Match:
+        """Find subscriptions receiving messages published on subject.
+
+        Arguments:
+            subject: a literal subject.
+            account: account messages are published into. Default to all accounts.
+        """
+        key = (account, subject)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        found: t.List[Subscription] = []
+        tokens = tokenize(subject)
+        roots = (
+            [self._roots[account]]
+            if account is not None and account in self._roots
+            else ([] if account is not None else list(self._roots.values()))
+        )
+        for root in roots:
+            self._collect(root, tokens, 0, found)
+        result = Match()
+        for subscription in found:
+            if subscription.queue:
+                # Queue groups are scoped to their account
+                name = (
+                    subscription.queue
+                    if account is not None
+                    else f"{subscription.account}/{subscription.queue}"
+                )
+                result.queues.setdefault(name, []).append(subscription)
+            else:
+                result.subscriptions.append(subscription)
+        self._cache[key] = result
+        return result
+
+    def subjects(self) -> t.Iterator[t.Tuple[str, str]]:
+        """Iterate over distinct (account, subject) of indexed subscriptions."""
+        for account, root in self._roots.items():
+            stack: t.List[t.Tuple[_Node, t.Tuple[str, ...]]] = [(root, ())]
+            while stack:
+                node, prefix = stack.pop()
+                if node.subscriptions:
+                    yield account, ".".join(prefix)
+                for token, child in node.children.items():
+                    stack.append((child, prefix + (token,)))
+
+    def fanouts(self) -> t.Dict[t.Tuple[str, str], int]:
+        """Compute fan-out of each literal subject subscribed to, including wildcard matches."""
+        return {
+            (account, subject): self.match(subject, account).fanout
+            for account, subject in self.subjects()
+            if "*" not in tokenize(subject) and ">" not in tokenize(subject)
+        }
+
+    def heaviest(self, count: int = 10) -> t.List[t.Tuple[str, str, int]]:
+        """Return (account, subject, fan-out) of subjects with the largest fan-out."""
+        ranked = sorted(self.fanouts().items(), key=lambda item: item[1], reverse=True)
+        return [
+            (account, subject, fanout) for (account, subject), fanout in ranked[:count]
+        ]
+
+    def fanout_histogram(self) -> t.Dict[int, int]:
+        """Count literal subjects by fan-out, using power of two buckets.
+
+        Returns:
+            a dictionary mapping each bucket upper bound (1, 2, 4, 8, ...) to a number of subjects.
+        """
+        histogram: t.Dict[int, int] = {}
+        for fanout in self.fanouts().values():
+            bucket = 1
+            while bucket < fanout:
+                bucket <<= 1
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        return dict(sorted(histogram.items()))
+
+    @classmethod
+    def from_monitor(
+        cls,
+        monitor: "NATSMonitor",
+        source: str = "connz",
+        page_size: int = 1024,
+    ) -> "SubjectIndex":
+        """Build an index from subscription details reported by a server.
+
+        Arguments:
+            monitor: the monitor used to fetch subscriptions.
+            source: either `connz` (`/connz?subs=detail`, client connections only) or
+                `subsz` (`/subsz?subs=1`, all local subscriptions). Default is `connz`.
+            page_size: number of connections or subscriptions fetched per request. Default is 1024.
+        """
+        if source not in ("connz", "subsz"):
+            raise ValueError(f"Unsupported source: {source}")
+        index = cls()
+        offset = 0
+        while True:
+            if source == "connz":
+                page = monitor.connz(subs="detail", offset=offset, limit=page_size)
+                items = page.get("connections") or []
+                for connection in items:
+                    for detail in connection.get("subscriptions_list_detail") or []:
+                        detail.setdefault("cid", connection.get("cid", 0))
+                        index.add(Subscription.from_detail(detail))
+            else:
+                page = monitor.subsz(subs=True, offset=offset, limit=page_size)
+                items = page.get("subscriptions_list") or []
+                for detail in items:
+                    index.add(Subscription.from_detail(detail))
+            offset += len(items)
+            if len(items) < page_size:
+                return index
@@ -1,8 +1,40 @@
+import re
 import typing as t
 from pathlib import Path
 
 from .utils import load_template_from_name, load_template_from_path
 
+# Hard limit enforced by nats-server on max_payload
+MAX_PAYLOAD_LIMIT = 64 * 1024 * 1024
+
+_DURATION = re.compile(r"^(\d+(\.\d+)?(ns|us|µs|ms|s|m|h))+$")
+
+
+def format_duration(value: t.Union[int, float, str], name: str) -> str:
+    """Format a duration as expected by nats-server.
+
+    Arguments:
+        value: a number of seconds or a Go duration string such as `500ms` or `2m`.
+        name: name of the option, used in error messages.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number of seconds or a duration string")
+    if isinstance(value, (int, float)):
+        if value <= 0:
+            raise ValueError(f"{name} must be positive")
+        return f"{round(value * 1000)}ms"
+    if not _DURATION.match(value):
+        raise ValueError(f"{name} is not a valid duration: {value!r}")
+    return value
+
+
+def _positive(value: int, name: str, allow_zero: bool = False) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must be an integer")
+    if value < 0 or (value == 0 and not allow_zero):
+        raise ValueError(f"{name} must be positive")
+    return value
+
 
 class ConfigGenerator:
     def __init__(self, template: t.Union[str, Path] = "default.conf.j2") -> None:
@@ -28,6 +60,7 @@ class ConfigGenerator:
         user: t.Optional[str] = None,
         password: t.Optional[str] = None,
         users: t.Optional[t.List[t.Dict[str, t.Any]]] = None,
+        accounts: t.Optional[t.Dict[str, t.Dict[str, t.Any]]] = None,
         token: t.Optional[str] = None,
         http_port: int = 8222,
         debug: t.Optional[bool] = None,
@@ -55,7 +88,9 @@ class ConfigGenerator:
         allow_leafnodes: bool = False,
         leafnodes_listen_address: t.Optional[str] = None,
         leafnodes_listen_port: t.Optional[int] = None,
-        leafnode_remotes: t.Optional[t.Dict[str, t.Any]] = None,
+        leafnode_remotes: t.Union[
+            t.Dict[str, t.Any], t.List[t.Dict[str, t.Any]], None
+        ] = None,
         websocket_listen_address: t.Optional[str] = None,
         websocket_listen_port: t.Optional[int] = None,
         websocket_advertise_url: t.Optional[str] = None,
@@ -72,8 +107,66 @@ class ConfigGenerator:
         allow_delete_jwt: t.Optional[bool] = None,
         compare_jwt_interval: t.Optional[str] = None,
         resolver_preload: t.Optional[t.Dict[str, str]] = None,
+        prof_port: t.Optional[int] = None,
+        prof_block_rate: t.Optional[int] = None,
+        max_payload: t.Optional[int] = None,
+        max_pending: t.Optional[int] = None,
+        write_deadline: t.Union[int, float, str, None] = None,
+        max_connections: t.Optional[int] = None,
+        max_subscriptions: t.Optional[int] = None,
+        max_control_line: t.Optional[int] = None,
+        ping_interval: t.Union[int, float, str, None] = None,
+        ping_max: t.Optional[int] = None,
+        no_fast_producer_stall: t.Optional[bool] = None,
+        sync_interval: t.Union[int, float, str, None] = None,
+        lame_duck_duration: t.Union[int, float, str, None] = None,
+        lame_duck_grace_period: t.Union[int, float, str, None] = None,
+        gateway_name: t.Optional[str] = None,
+        gateway_listen: t.Optional[str] = None,
+        gateway_advertise: t.Optional[str] = None,
+        gateways: t.Optional[t.Dict[str, t.List[str]]] = None,
     ) -> str:
-        """Render configuration according to arguments."""
+        """Render configuration according to arguments.
+
+        Performance limits default to nats-server defaults when omitted. Durations are expressed
+        either in seconds or as Go duration strings (e.g. `500ms`).
+
+        Arguments:
+            max_payload: maximum message payload in bytes (server default 1MB, at most 64MB).
+                Larger payloads increase memory used by each connection buffer.
+            max_pending: maximum bytes buffered per connection (server default 64MB). Connections
+                exceeding it are closed as slow consumers, lower values detect them sooner.
+            write_deadline: maximum time to flush data to a connection (server default 10s). Lower
+                values detect slow consumers sooner, at the cost of disconnecting clients on
+                transient network stalls.
+            max_connections: maximum number of client connections (server default 64K).
+            max_subscriptions: maximum subscriptions per connection (server default unlimited).
+            max_control_line: maximum protocol line length in bytes (server default 4KB). Must be
+                raised for very long subjects or headers.
+            ping_interval: interval between server pings (server default 2m). Lower values detect
+                dead connections sooner but add traffic.
+            ping_max: unanswered pings before closing a connection (server default 2).
+            no_fast_producer_stall: drop messages instead of stalling producers when a consumer is
+                slow. Producers keep their throughput but slow consumers lose messages.
+            sync_interval: interval at which JetStream file store is synced to disk (server default
+                2m), or `always`. Syncing more often improves durability but lowers throughput.
+
+        Lame duck mode closes client connections gradually before the server exits:
+
+        Arguments:
+            lame_duck_duration: time spent evicting clients (server default 2m). Lower it when
+                servers are put in lame duck mode repeatedly, e.g. by chaos runs.
+            lame_duck_grace_period: delay before the first clients are evicted (server default
+                10s), which lets other servers learn about lame duck mode first.
+
+        Gateways connect clusters into a super-cluster:
+
+        Arguments:
+            gateway_name: name of the gateway, which is the name of the cluster. Enables gateways when set.
+            gateway_listen: address where gateway connections are accepted, as `host:port`.
+            gateway_advertise: address advertised to other gateways, as `host:port`.
+            gateways: URLs of the gateways of remote clusters, indexed by cluster name.
+        """
         kwargs: t.Dict[str, t.Any] = {}
 
         kwargs["server_host"] = address
@@ -81,6 +174,55 @@ class ConfigGenerator:
         kwargs["client_advertise"] = client_advertise
         kwargs["server_name"] = server_name
         kwargs["http_port"] = http_port
+        if prof_block_rate is not None and not prof_port:
+            raise ValueError("prof_block_rate argument requires prof_port")
+        kwargs["prof_port"] = prof_port
+        kwargs["prof_block_rate"] = prof_block_rate
+
+        if max_payload is not None:
+            _positive(max_payload, "max_payload")
+            if max_payload > MAX_PAYLOAD_LIMIT:
+                raise ValueError("max_payload cannot exceed 64MB")
+            kwargs["max_payload"] = max_payload
+        if max_pending is not None:
+            _positive(max_pending, "max_pending")
+            if max_payload is not None and max_payload > max_pending:
+                raise ValueError("max_payload cannot be greater than max_pending")
+            kwargs["max_pending"] = max_pending
+        if write_deadline is not None:
+            kwargs["write_deadline"] = format_duration(write_deadline, "write_deadline")
+        if max_connections is not None:
+            kwargs["max_connections"] = _positive(max_connections, "max_connections")
+        if max_subscriptions is not None:
+            kwargs["max_subscriptions"] = _positive(
+                max_subscriptions, "max_subscriptions", allow_zero=True
+            )
+        if max_control_line is not None:
+            kwargs["max_control_line"] = _positive(max_control_line, "max_control_line")
+        if ping_interval is not None:
+            kwargs["ping_interval"] = format_duration(ping_interval, "ping_interval")
+        if ping_max is not None:
+            kwargs["ping_max"] = _positive(ping_max, "ping_max")
+        if no_fast_producer_stall is not None:
+            kwargs["no_fast_producer_stall"] = no_fast_producer_stall
+        if sync_interval is not None:
+            if not with_jetstream:
+                raise ValueError("sync_interval argument requires with_jetstream")
+            if sync_interval == "always":
+                kwargs["sync_interval"] = "always"
+            else:
+                kwargs["sync_interval"] = format_duration(
+                    sync_interval, "sync_interval"
+                )
+
+        if lame_duck_duration is not None:
+            kwargs["lame_duck_duration"] = format_duration(
+                lame_duck_duration, "lame_duck_duration"
+            )
+        if lame_duck_grace_period is not None:
+            kwargs["lame_duck_grace_period"] = format_duration(
+                lame_duck_grace_period, "lame_duck_grace_period"
+            )
 
         if debug is not None:
             kwargs["debug"] = debug
@@ -119,6 +261,22 @@ class ConfigGenerator:
                 kwargs["cluster_name"] = cluster_name
         kwargs["cluster"] = cluster
 
+        if gateway_name or gateway_listen or gateways:
+            if not (gateway_name and gateway_listen):
+                raise ValueError(
+                    "gateway_name and gateway_listen arguments must be provided together"
+                )
+            if cluster_name is not None and cluster_name != gateway_name:
+                raise ValueError("gateway_name must be equal to cluster_name")
+            kwargs["gateway_name"] = gateway_name
+            kwargs["gateway_listen"] = gateway_listen
+            kwargs["gateway_advertise"] = gateway_advertise
+            kwargs["gateways"] = [
+                {"name": name, "urls": urls}
+                for name, urls in (gateways or {}).items()
+                if name != gateway_name
+            ]
+
         tls = False
         if tls_cert or tls_key:
             if not (tls_cert and tls_key):
@@ -165,6 +323,8 @@ class ConfigGenerator:
                 raise ValueError(
                     "operator argument cannot be used with any of users, token, user and password arguments"
                 )
+            if accounts:
+                raise ValueError("accounts argument cannot be used with operator")
             if system_account is None:
                 raise ValueError("system_account argument must be provided")
             if system_account_jwt is None:
@@ -175,6 +335,7 @@ class ConfigGenerator:
         kwargs["user"] = user
         kwargs["password"] = password
         kwargs["users"] = users
+        kwargs["accounts"] = accounts
         kwargs["token"] = token
 
         kwargs["operator"] = operator
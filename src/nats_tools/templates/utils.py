@@ -1,4 +1,5 @@
 import typing as t
+from functools import lru_cache
 from pathlib import Path
 
 import jinja2
@@ -14,8 +15,9 @@ def load_template_from_path(template: t.Union[str, Path]) -> jinja2.Template:
     return environment.get_template(filepath.name)
 
 
+@lru_cache(maxsize=None)
 def load_template_from_name(template: str) -> jinja2.Template:
-    """Load a jinja2 template from name."""
+    """Load a jinja2 template from name. Packaged templates never change, so they are compiled only once."""
     loader = jinja2.FileSystemLoader(Path(__file__).parent.joinpath("data"))
     environment = jinja2.Environment(loader=loader)
     return environment.get_template(template)
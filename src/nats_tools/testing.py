@@ -1,26 +1,425 @@
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 from _pytest.fixtures import SubRequest
 
-from nats_tools.natsd import NATSD
+from nats_tools.accounts import AccountManager, IsolatedAccount
+from nats_tools.costs import CostReport
+from nats_tools.natsd import NATSD, find_free_port, find_nats_server
+from nats_tools.standin import StandInServer, unsupported_options
 
 F = t.TypeVar("F", bound=t.Callable[..., t.Any])
 
+# Options holding a listen port which must be distinct for each pytest-xdist worker
+PORT_OPTIONS = (
+    "port",
+    "http_port",
+    "leafnodes_listen_port",
+    "websocket_listen_port",
+    "prof_port",
+)
+# Options holding an address or URL, as `host:port` or `nats://host:port`
+ADDRESS_OPTIONS = ("cluster_listen", "cluster_url", "gateway_listen")
+# Port at the end of an address or URL
+_ADDRESS_PORT = re.compile(r":(\d+)(/?)$")
 
-@pytest.fixture
-def natsd(request: SubRequest) -> t.Iterator[NATSD]:
-    if hasattr(request, "param"):
-        params = dict(request.param)
-    else:
-        params = {"debug": True, "trace": True}
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addini(
+        "nats_xdist_port_block",
+        "Size of the block of ports reserved for each pytest-xdist worker",
+        default="100",
+    )
+    parser.addini(
+        "nats_xdist_spread_cpus",
+        "Limit each nats-server to its share of CPUs when running with pytest-xdist",
+        type="bool",
+        default=True,
+    )
+    parser.addini(
+        "nats_matrix_reorder",
+        "Reorder tests so that tests sharing a matrix server configuration run back to back",
+        type="bool",
+        default=True,
+    )
+    parser.addini(
+        "nats_trace",
+        "Enable debug and trace logs of servers started by the natsd fixture",
+        type="bool",
+        default=False,
+    )
+    parser.addini(
+        "nats_stand_in",
+        "Use the in-process stand-in server in the natsd fixture: never, always, or auto when nats-server is not installed",
+        default="never",
+    )
+    group = parser.getgroup("nats", "nats-server fixtures")
+    group.addoption(
+        "--nats-cost-json",
+        metavar="PATH",
+        default=None,
+        help="Write time spent in nats-server fixtures to a JSON file",
+    )
+    group.addoption(
+        "--nats-cost-slowest",
+        metavar="N",
+        type=int,
+        default=5,
+        help="Number of slowest tests listed in nats-server fixtures summary",
+    )
+
+
+COST_REPORT = pytest.StashKey[CostReport]()
+# Key of cost timings in the output sent by pytest-xdist workers to the controller
+COST_WORKER_OUTPUT = "nats_costs"
+
+
+# Output files of servers used by a test, and whether they must be removed after the test
+OUTPUT_FILES = pytest.StashKey[t.List[t.Tuple[Path, bool]]]()
+# Cleanup of servers created by natsd_factory, started in background once test reports are generated
+FACTORY_CLEANUPS = pytest.StashKey[t.Callable[[], None]]()
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.stash[COST_REPORT] = CostReport()
+    config.addinivalue_line(
+        "markers",
+        "nats_trace: enable debug and trace logs of servers started by the natsd fixture",
+    )
+    config.addinivalue_line(
+        "markers",
+        "nats_stand_in: use the in-process stand-in server in the natsd fixture",
+    )
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo[None]
+) -> t.Iterator[None]:
+    outcome = yield
+    report: pytest.TestReport = outcome.get_result()  # type: ignore[attr-defined]
+    outputs = item.stash.get(OUTPUT_FILES, [])
+    if report.failed:
+        for path, _ in outputs:
+            try:
+                content = path.read_text(errors="replace")
+            except FileNotFoundError:
+                continue
+            report.sections.append(
+                (f"Captured nats-server output ({path.name})", content)
+            )
+    if call.when == "teardown":
+        for path, temporary in outputs:
+            if temporary:
+                path.unlink(missing_ok=True)
+        outputs.clear()
+        cleanup = item.stash.get(FACTORY_CLEANUPS, None)
+        if cleanup is not None:
+            del item.stash[FACTORY_CLEANUPS]
+            threading.Thread(target=cleanup, name="natsd-cleanup").start()
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    # Only pytest-xdist workers have an output sent back to the controller
+    workeroutput = getattr(session.config, "workeroutput", None)
+    report = session.config.stash.get(COST_REPORT, None)
+    if workeroutput is not None and report:
+        workeroutput[COST_WORKER_OUTPUT] = report.tests
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node: t.Any, error: t.Optional[str]) -> None:
+    """Merge costs recorded by a pytest-xdist worker into the report of the controller."""
+    costs = getattr(node, "workeroutput", {}).get(COST_WORKER_OUTPUT)
+    report = node.config.stash.get(COST_REPORT, None)
+    if costs and report is not None:
+        report.merge(costs)
+
+
+def pytest_terminal_summary(
+    terminalreporter: t.Any, exitstatus: int, config: pytest.Config
+) -> None:
+    report = config.stash.get(COST_REPORT, None)
+    if not report:
+        return
+    terminalreporter.write_sep("=", "nats-server fixtures cost")
+    for line in report.format(slowest=config.getoption("nats_cost_slowest")):
+        terminalreporter.write_line(line)
+    path = config.getoption("nats_cost_json")
+    if path:
+        report.save(path)
+        terminalreporter.write_line(f"nats-server fixtures cost written to {path}")
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(
+    session: pytest.Session, config: pytest.Config, items: t.List[pytest.Item]
+) -> None:
+    """Group tests using the same matrix server configuration.
+
+    Hook is executed last so that grouping is preserved when other plugins reorder tests.
+    Each group is moved to the position of its first test, other tests keep their order.
+    """
+    if not config.getini("nats_matrix_reorder"):
+        return
+    positions: t.Dict[str, int] = {}
+    keys: t.List[t.Tuple[int, int]] = []
+    for position, item in enumerate(items):
+        callspec = getattr(item, "callspec", None)
+        if callspec is None or MATRIX_FIXTURE not in callspec.params:
+            keys.append((position, position))
+            continue
+        group = matrix_key(callspec.params[MATRIX_FIXTURE])
+        keys.append((positions.setdefault(group, position), position))
+    order = sorted(range(len(items)), key=keys.__getitem__)
+    items[:] = [items[index] for index in order]
+
+
+def record_cost(
+    config: pytest.Config,
+    test: str,
+    daemon: t.Union[NATSD, StandInServer],
+    cleanup: bool = True,
+) -> None:
+    """Record timings of a stopped server, removing its temporary directories first unless cleanup is False."""
+    if cleanup:
+        daemon.cleanup()
+    report = config.stash.get(COST_REPORT, None)
+    if report is not None:
+        report.record(test, daemon.timings)
+
+
+def xdist_worker() -> t.Tuple[int, int]:
+    """Return index and count of pytest-xdist workers.
+
+    Returns:
+        `(0, 1)` when tests are not executed by a pytest-xdist worker.
+    """
+    name = os.environ.get("PYTEST_XDIST_WORKER", "")
+    if not name.startswith("gw"):
+        return 0, 1
+    count = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT") or 1)
+    return int(name[2:]), max(count, 1)
+
+
+def cpu_share(count: int) -> t.Optional[int]:
+    """Return the number of CPUs available to each of count workers, or None when there is a single worker."""
+    if count <= 1:
+        return None
+    return max(1, (os.cpu_count() or 1) // count)
+
+
+def shift_port(address: str, offset: int) -> str:
+    """Add offset to the port of an address, e.g. `127.0.0.1:6222` or `nats://127.0.0.1:6222`.
+
+    Addresses without port are returned unchanged.
+    """
+    return _ADDRESS_PORT.sub(
+        lambda match: f":{int(match.group(1)) + offset}{match.group(2)}", address
+    )
+
+
+def schedule_on_worker(
+    params: t.Dict[str, t.Any],
+    index: int,
+    count: int,
+    port_block: int = 100,
+    spread_cpus: bool = True,
+) -> t.Dict[str, t.Any]:
+    """Adapt server options so that servers started by distinct workers do not conflict.
+
+    Each worker gets a disjoint block of ports: listen ports are shifted by `index * port_block`,
+    as well as ports of cluster and gateway addresses, routes and gateway URLs, so that servers of
+    a worker connect to each other. Ports lower or equal to 0 (random or disabled) are unchanged.
+    Listen ports of a server must be far enough from each other for the blocks of all workers to
+    fit between them, e.g. client port 4222 and cluster port 6222 allow at most 20 workers with
+    the default block of 100 ports.
+    When spread_cpus is True and `max_cpus` is not set, each server is limited to its share of CPUs.
+
+    Arguments:
+        params: options used to create a NATSD instance.
+        index: index of the worker.
+        count: total number of workers.
+        port_block: number of ports reserved for each worker. Default is 100.
+        spread_cpus: limit CPUs used by each server. Default is True.
+
+    Returns:
+        a copy of params.
+
+    Raises:
+        ValueError: when port blocks of distinct listen ports overlap, or exceed the highest port.
+    """
+    params = dict(params)
+    if count <= 1:
+        return params
+    params.setdefault("port", 4222)
+    params.setdefault("http_port", 8222)
+    offset = index * port_block
+    # Listen ports before shift, indexed by port
+    listen: t.Dict[int, str] = {}
+    for name in PORT_OPTIONS:
+        value = params.get(name)
+        if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+            listen.setdefault(value, name)
+            params[name] = value + offset
+    for name in ADDRESS_OPTIONS:
+        if params.get(name):
+            match = _ADDRESS_PORT.search(params[name])
+            if match:
+                listen.setdefault(int(match.group(1)), name)
+            params[name] = shift_port(params[name], offset)
+    span = count * port_block
+    ports = sorted(listen)
+    for lower, upper in zip(ports, ports[1:]):
+        if upper - lower < span:
+            raise ValueError(
+                f"Ports of {listen[lower]} ({lower}) and {listen[upper]} ({upper}) overlap"
+                f" across {count} workers using blocks of {port_block} ports"
+            )
+    if ports and ports[-1] + span > 65536:
+        raise ValueError(
+            f"Port of {listen[ports[-1]]} ({ports[-1]}) exceeds 65535"
+            f" across {count} workers using blocks of {port_block} ports"
+        )
+    if params.get("routes"):
+        params["routes"] = [shift_port(route, offset) for route in params["routes"]]
+    if params.get("gateways"):
+        params["gateways"] = {
+            name: [shift_port(url, offset) for url in urls]
+            for name, urls in params["gateways"].items()
+        }
+    if spread_cpus and params.get("max_cpus") is None:
+        params["max_cpus"] = cpu_share(count)
+    return params
+
+
+def fixture_params(
+    config: pytest.Config, params: t.Dict[str, t.Any], tracing: bool = False
+) -> t.Dict[str, t.Any]:
+    """Apply plugin options to the options of a server started by a fixture."""
+    index, count = xdist_worker()
+    params = schedule_on_worker(
+        params,
+        index,
+        count,
+        port_block=int(config.getini("nats_xdist_port_block")),
+        spread_cpus=config.getini("nats_xdist_spread_cpus"),
+    )
+    tracing = tracing or config.getini("nats_trace")
     if params.get("debug", None) is None:
-        params["debug"] = True
+        params["debug"] = tracing
     if params.get("trace", None) is None:
-        params["trace"] = True
-    with NATSD(**params) as daemon:
+        params["trace"] = tracing
+    return params
+
+
+def temporary_output_file() -> Path:
+    fd, name = tempfile.mkstemp(prefix="nats-server-", suffix=".log")
+    os.close(fd)
+    return Path(name)
+
+
+def use_stand_in(
+    config: pytest.Config,
+    node: pytest.Item,
+    options: t.Optional[t.Dict[str, t.Any]] = None,
+) -> bool:
+    """Return True when the natsd fixture must start a `StandInServer` instead of nats-server.
+
+    Tests marked with `nats_stand_in` always use the stand-in server. Otherwise, the `nats_stand_in`
+    ini option decides: `never` (default), `always`, or `auto` to use it when nats-server is not
+    installed.
+
+    When options of the server are not supported by the stand-in server, nats-server is used in
+    `auto` mode, and the test is skipped otherwise.
+    """
+    if node.get_closest_marker("nats_stand_in"):
+        mode = "always"
+    else:
+        mode = config.getini("nats_stand_in") or "never"
+    if mode not in ("never", "always", "auto"):
+        raise ValueError(f"Invalid nats_stand_in option: {mode}")
+    if mode == "never" or (mode == "auto" and find_nats_server() is not None):
+        return False
+    unsupported = unsupported_options(options or {})
+    if not unsupported:
+        return True
+    if mode == "auto":
+        return False
+    pytest.skip(f"Options not supported by stand-in server: {', '.join(unsupported)}")
+
+
+@pytest.fixture
+def natsd(request: SubRequest) -> t.Iterator[t.Union[NATSD, StandInServer]]:
+    """A server started for the test.
+
+    Server output is captured and attached to the report of failed tests. Debug and trace logs are
+    disabled unless the test is marked with `nats_trace` or `nats_trace` ini option is enabled.
+
+    When running with pytest-xdist, each worker uses its own block of ports. See `use_stand_in()`
+    to run tests against the in-process stand-in server.
+    """
+    params = fixture_params(
+        request.config,
+        dict(getattr(request, "param", None) or {}),
+        bool(request.node.get_closest_marker("nats_trace")),
+    )
+    temporary = params.get("output_file", None) is None
+    if temporary:
+        params["output_file"] = temporary_output_file()
+    request.node.stash.setdefault(OUTPUT_FILES, []).append(
+        (Path(params["output_file"]), temporary)
+    )
+    server_class = (
+        StandInServer if use_stand_in(request.config, request.node, params) else NATSD
+    )
+    with server_class(**params) as daemon:
         yield daemon
+    record_cost(request.config, request.node.nodeid, daemon)
+
+
+@pytest.fixture(scope="session")
+def nats_shared_server(request: SubRequest) -> t.Iterator[NATSD]:
+    """A JetStream enabled server shared by all tests of the session, listening on free ports.
+
+    When running with pytest-xdist, each worker starts its own shared server.
+    """
+    _, count = xdist_worker()
+    with NATSD(
+        port=find_free_port(),
+        http_port=find_free_port(),
+        with_jetstream=True,
+        max_cpus=cpu_share(count),
+    ) as daemon:
+        yield daemon
+    record_cost(request.config, "nats_shared_server", daemon)
+
+
+@pytest.fixture(scope="session")
+def nats_accounts(nats_shared_server: NATSD) -> AccountManager:
+    return AccountManager(nats_shared_server)
+
+
+@pytest.fixture
+def nats_account(
+    request: SubRequest, nats_accounts: AccountManager
+) -> t.Iterator[IsolatedAccount]:
+    """A new account on the shared server, removed once test is done.
+
+    JetStream limits can be customized using indirect parametrization.
+    """
+    params = dict(getattr(request, "param", None) or {})
+    account = nats_accounts.create(**params)
+    yield account
+    nats_accounts.remove(account)
 
 
 def parametrize_nats_server(
@@ -32,6 +431,7 @@ def parametrize_nats_server(
     user: t.Optional[str] = None,
     password: t.Optional[str] = None,
     users: t.Optional[t.List[t.Dict[str, t.Any]]] = None,
+    accounts: t.Optional[t.Dict[str, t.Dict[str, t.Any]]] = None,
     token: t.Optional[str] = None,
     http_port: int = 8222,
     debug: t.Optional[bool] = None,
@@ -59,7 +459,9 @@ def parametrize_nats_server(
     allow_leafnodes: bool = False,
     leafnodes_listen_address: t.Optional[str] = None,
     leafnodes_listen_port: t.Optional[int] = None,
-    leafnode_remotes: t.Optional[t.Dict[str, t.Any]] = None,
+    leafnode_remotes: t.Union[
+        t.Dict[str, t.Any], t.List[t.Dict[str, t.Any]], None
+    ] = None,
     websocket_listen_address: t.Optional[str] = None,
     websocket_listen_port: t.Optional[int] = None,
     websocket_advertise_url: t.Optional[str] = None,
@@ -79,6 +481,26 @@ def parametrize_nats_server(
     config_file: t.Union[str, Path, None] = None,
     max_cpus: t.Optional[float] = None,
     start_timeout: float = 1,
+    output_file: t.Union[str, Path, None] = None,
+    profiling: bool = False,
+    prof_port: t.Optional[int] = None,
+    prof_block_rate: t.Optional[int] = None,
+    max_payload: t.Optional[int] = None,
+    max_pending: t.Optional[int] = None,
+    write_deadline: t.Union[int, float, str, None] = None,
+    max_connections: t.Optional[int] = None,
+    max_subscriptions: t.Optional[int] = None,
+    max_control_line: t.Optional[int] = None,
+    ping_interval: t.Union[int, float, str, None] = None,
+    ping_max: t.Optional[int] = None,
+    no_fast_producer_stall: t.Optional[bool] = None,
+    sync_interval: t.Union[int, float, str, None] = None,
+    lame_duck_duration: t.Union[int, float, str, None] = None,
+    lame_duck_grace_period: t.Union[int, float, str, None] = None,
+    gateway_name: t.Optional[str] = None,
+    gateway_listen: t.Optional[str] = None,
+    gateway_advertise: t.Optional[str] = None,
+    gateways: t.Optional[t.Dict[str, t.List[str]]] = None,
 ) -> t.Callable[[F], F]:
     options = dict(
         address=address,
@@ -89,6 +511,7 @@ def parametrize_nats_server(
         user=user,
         password=password,
         users=users,
+        accounts=accounts,
         token=token,
         http_port=http_port,
         debug=debug,
@@ -136,5 +559,238 @@ def parametrize_nats_server(
         config_file=config_file,
         start_timeout=start_timeout,
         max_cpus=max_cpus,
+        output_file=output_file,
+        profiling=profiling,
+        prof_port=prof_port,
+        prof_block_rate=prof_block_rate,
+        max_payload=max_payload,
+        max_pending=max_pending,
+        write_deadline=write_deadline,
+        max_connections=max_connections,
+        max_subscriptions=max_subscriptions,
+        max_control_line=max_control_line,
+        ping_interval=ping_interval,
+        ping_max=ping_max,
+        no_fast_producer_stall=no_fast_producer_stall,
+        sync_interval=sync_interval,
+        lame_duck_duration=lame_duck_duration,
+        lame_duck_grace_period=lame_duck_grace_period,
+        gateway_name=gateway_name,
+        gateway_listen=gateway_listen,
+        gateway_advertise=gateway_advertise,
+        gateways=gateways,
     )
     return pytest.mark.parametrize("natsd", [options], indirect=True)
+
+
+MATRIX_FIXTURE = "nats_matrix_server"
+
+
+def matrix_key(options: t.Dict[str, t.Any]) -> str:
+    """Return a key identifying a server configuration."""
+    return json.dumps(options, sort_keys=True, default=str)
+
+
+def parametrize_nats_server_matrix(
+    base: t.Optional[t.Dict[str, t.Any]] = None,
+    **axes: t.Sequence[t.Any],
+) -> t.Callable[[F], F]:
+    """Parametrize `nats_matrix_server` fixture with the cross-product of several options.
+
+    Each axis is a list of values for a `NATSD` option. A value may also be a dictionary of
+    options applied together, for example to enable TLS using both certificate and key.
+
+    Example:
+
+    ```python
+    @parametrize_nats_server_matrix(
+        with_jetstream=[False, True],
+        tls=[{}, {"tls_cert": "server.crt", "tls_key": "server.key"}],
+    )
+    def test_compatibility(nats_matrix_server: NATSD):
+        ...
+    ```
+
+    Arguments:
+        base: options common to all configurations.
+        axes: values of each option.
+    """
+    names = list(axes)
+    params = []
+    for values in itertools.product(*(enumerate(axes[name]) for name in names)):
+        options = dict(base or {})
+        ids: t.List[str] = []
+        for name, (index, value) in zip(names, values):
+            if isinstance(value, dict):
+                options.update(value)
+                ids.append(f"{name}{index}")
+            else:
+                options[name] = value
+                ids.append(f"{name}={value}")
+        params.append(pytest.param(options, id="-".join(ids)))
+    return pytest.mark.parametrize(MATRIX_FIXTURE, params, indirect=True)
+
+
+class MatrixPool:
+    def __init__(self, config: pytest.Config) -> None:
+        """Keep the server of the current matrix configuration running between tests.
+
+        Tests are grouped by configuration during collection, so a server is started once per
+        configuration and stopped as soon as another configuration is requested.
+        """
+        self.config = config
+        self.key: t.Optional[str] = None
+        self.server: t.Optional[NATSD] = None
+        self.output_file: t.Optional[Path] = None
+
+    def get(self, options: t.Dict[str, t.Any]) -> NATSD:
+        key = matrix_key(options)
+        if key == self.key and self.server is not None and self.server.is_alive():
+            return self.server
+        self.release()
+        params = fixture_params(self.config, options)
+        temporary = params.get("output_file", None) is None
+        if temporary:
+            params["output_file"] = temporary_output_file()
+        self.output_file = Path(params["output_file"]) if temporary else None
+        self.key = key
+        self.server = NATSD(**params).start(wait=True)
+        return self.server
+
+    def release(self) -> None:
+        """Stop current server."""
+        server, key = self.server, self.key
+        self.server = self.key = None
+        try:
+            if server is not None:
+                if server.is_alive():
+                    server.stop()
+                record_cost(self.config, f"{MATRIX_FIXTURE}{key}", server)
+        finally:
+            if self.output_file is not None:
+                self.output_file.unlink(missing_ok=True)
+                self.output_file = None
+
+
+@pytest.fixture(scope="session")
+def nats_matrix_pool(request: SubRequest) -> t.Iterator[MatrixPool]:
+    pool = MatrixPool(request.config)
+    yield pool
+    pool.release()
+
+
+@pytest.fixture
+def nats_matrix_server(request: SubRequest, nats_matrix_pool: MatrixPool) -> NATSD:
+    """A server shared by consecutive tests using the same configuration.
+
+    Use `parametrize_nats_server_matrix()` to parametrize this fixture.
+    """
+    server = nats_matrix_pool.get(dict(getattr(request, "param", None) or {}))
+    if nats_matrix_pool.output_file is not None:
+        request.node.stash.setdefault(OUTPUT_FILES, []).append(
+            (nats_matrix_pool.output_file, False)
+        )
+    return server
+
+
+class NATSDFactory:
+    def __init__(self, config: pytest.Config, node: pytest.Item) -> None:
+        """Create and start servers on demand for a single test.
+
+        Servers listen on free ports unless `port` and `http_port` options are provided. They are started concurrently, stopped in parallel, and their temporary directories are
+        removed in a background thread.
+        """
+        self.config = config
+        self.node = node
+        self.servers: t.List[NATSD] = []
+        self._output_files: t.List[Path] = []
+
+    def _create(self, options: t.Dict[str, t.Any]) -> NATSD:
+        params = fixture_params(
+            self.config, dict(options), bool(self.node.get_closest_marker("nats_trace"))
+        )
+        # Servers listen on free ports unless ports are provided
+        for name in ("port", "http_port"):
+            if name not in options:
+                params[name] = find_free_port()
+        temporary = params.get("output_file", None) is None
+        if temporary:
+            params["output_file"] = temporary_output_file()
+            self._output_files.append(params["output_file"])
+        self.node.stash.setdefault(OUTPUT_FILES, []).append(
+            (Path(params["output_file"]), False)
+        )
+        server = NATSD(**params)
+        self.servers.append(server)
+        return server
+
+    def __call__(self, **options: t.Any) -> NATSD:
+        """Create and start a server."""
+        return self.many(options)[0]
+
+    def many(self, *options: t.Dict[str, t.Any]) -> t.List[NATSD]:
+        """Create servers using options of each server and start them concurrently.
+
+        Returns:
+            the started servers, in the same order as options.
+        """
+        servers = [self._create(params) for params in options]
+        if len(servers) <= 1:
+            return [server.start(wait=True) for server in servers]
+        with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+            return list(executor.map(lambda server: server.start(wait=True), servers))
+
+    def close(self) -> None:
+        """Stop all servers in parallel and remove temporary files in background.
+
+        Raises:
+            the first error raised while stopping a server, once all servers are stopped.
+        """
+        servers, self.servers = self.servers, []
+        output_files, self._output_files = self._output_files, []
+
+        def _stop(server: NATSD) -> t.Optional[BaseException]:
+            try:
+                if server.is_alive():
+                    server.stop()
+            except Exception as exc:
+                return exc
+            return None
+
+        if servers:
+            with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+                errors = [error for error in executor.map(_stop, servers) if error]
+        else:
+            errors = []
+        for server in servers:
+            record_cost(self.config, self.node.nodeid, server, cleanup=False)
+
+        def _cleanup() -> None:
+            for server in servers:
+                server.cleanup()
+            for path in output_files:
+                path.unlink(missing_ok=True)
+
+        # Output files must remain available until test report is generated
+        self.node.stash[FACTORY_CLEANUPS] = _cleanup
+        if errors:
+            raise errors[0]
+
+
+@pytest.fixture
+def natsd_factory(request: SubRequest) -> t.Iterator[NATSDFactory]:
+    """A factory creating any number of servers for the test.
+
+    Example:
+
+    ```python
+    def test_leafnode(natsd_factory: NATSDFactory):
+        hub, spoke = natsd_factory.many(
+            {"port": 4222, "http_port": 8222, "allow_leafnodes": True},
+            {"port": 4223, "http_port": 8223, "leafnode_remotes": {...}},
+        )
+    ```
+    """
+    factory = NATSDFactory(request.config, request.node)
+    yield factory
+    factory.close()
@@ -0,0 +1,418 @@
+"""Start clusters, super-clusters joined by gateways, and leafnode spokes.
+
+Ports of all servers are allocated before configurations are rendered, so that each server knows
+the addresses of its peers. Servers are started in parallel, following dependency order: clusters
+first, then leafnodes connecting to them. Readiness is confirmed using `routez`, `gatewayz` and
+`leafz` monitoring endpoints.
+
+Example:
+
+```python
+from nats_tools.topology import SuperCluster
+
+with SuperCluster(clusters=2, size=3, spokes=1) as supercluster:
+    east, west = supercluster.clusters
+    # Connect a subscriber to east.nodes[0].port and a publisher to west.nodes[0].port
+    ...
+```
+"""
+
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from nats_tools.natsd import NATSD, find_free_ports
+from nats_tools.proxy import FaultProxy
+from nats_tools.readiness import (
+    wait_for_cluster,
+    wait_for_gateways,
+    wait_for_leafnodes,
+    wait_for_meta_leader,
+)
+
+
+def start_servers(servers: t.Sequence[NATSD]) -> None:
+    """Start servers in parallel and wait until they accept monitoring requests.
+
+    When a server fails to start, servers which did start are stopped before the error is raised.
+    """
+
+    def _start(server: NATSD) -> t.Optional[BaseException]:
+        try:
+            server.start(wait=True)
+        except Exception as exc:
+            return exc
+        return None
+
+    if not servers:
+        return
+    with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+        errors = [error for error in executor.map(_start, servers) if error]
+    if errors:
+        stop_servers(servers)
+        raise errors[0]
+
+
+def stop_servers(servers: t.Sequence[NATSD], timeout: t.Optional[float] = 10) -> None:
+    """Stop running servers in parallel.
+
+    Raises:
+        the first error raised while stopping a server, once all servers are stopped.
+    """
+
+    def _stop(server: NATSD) -> t.Optional[BaseException]:
+        try:
+            if server.proc is not None and server.is_alive():
+                server.stop(timeout=timeout)
+        except Exception as exc:
+            return exc
+        return None
+
+    if not servers:
+        return
+    with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+        errors = [error for error in executor.map(_stop, servers) if error]
+    if errors:
+        raise errors[0]
+
+
+class NATSCluster:
+    def __init__(
+        self,
+        name: str = "C1",
+        size: int = 3,
+        address: str = "127.0.0.1",
+        with_jetstream: bool = False,
+        gateway: bool = False,
+        leafnodes: bool = False,
+        proxies: bool = False,
+        start_timeout: float = 10,
+        **options: t.Any,
+    ) -> None:
+        """Create a cluster of servers listening on free ports.
+
+        Servers are created by `configure()` or on `start()`.
+
+        Arguments:
+            name: name of the cluster. Servers are named `{name}-{index}`.
+            size: number of servers. Default is 3.
+            address: address servers listen to. Default is 127.0.0.1.
+            with_jetstream: enable JetStream on all servers. Disabled by default.
+            gateway: accept gateway connections, in order to join a super-cluster. Disabled by default.
+            leafnodes: accept leafnode connections. Disabled by default.
+            proxies: put a `FaultProxy` in front of the client port and the cluster port of each
+                server. Servers advertise proxy addresses, so that clients and routes connect
+                through proxies. Disabled by default.
+            start_timeout: seconds to wait for each server to start.
+            options: other options given to each `NATSD` instance.
+        """
+        if size < 1:
+            raise ValueError("size must be a positive integer")
+        self.name = name
+        self.size = size
+        self.address = address
+        self.with_jetstream = with_jetstream
+        self.gateway = gateway
+        self.leafnodes = leafnodes
+        self.proxies = proxies
+        self.start_timeout = start_timeout
+        self.options = options
+        kinds = ["port", "http_port", "cluster_port"]
+        if gateway:
+            kinds.append("gateway_port")
+        if leafnodes:
+            kinds.append("leafnode_port")
+        if proxies:
+            kinds.extend(["client_proxy_port", "route_proxy_port"])
+        ports = iter(find_free_ports(size * len(kinds), address))
+        # Ports of each server, indexed by kind
+        self.ports: t.List[t.Dict[str, int]] = [
+            {kind: next(ports) for kind in kinds} for _ in range(size)
+        ]
+        self.nodes: t.List[NATSD] = []
+        # Proxies of each server, indexed by kind: "client" or "route"
+        self.node_proxies: t.List[t.Dict[str, FaultProxy]] = []
+        if proxies:
+            self.node_proxies = [
+                {
+                    "client": FaultProxy(
+                        (address, ports["port"]),
+                        address=address,
+                        port=ports["client_proxy_port"],
+                    ),
+                    "route": FaultProxy(
+                        (address, ports["cluster_port"]),
+                        address=address,
+                        port=ports["route_proxy_port"],
+                    ),
+                }
+                for ports in self.ports
+            ]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> t.Iterator[NATSD]:
+        return iter(self.configure())
+
+    def __getitem__(self, index: int) -> NATSD:
+        return self.configure()[index]
+
+    def _urls(self, scheme: str, kind: str) -> t.List[str]:
+        return [f"{scheme}://{self.address}:{ports[kind]}" for ports in self.ports]
+
+    @property
+    def client_urls(self) -> t.List[str]:
+        return self._urls("nats", "port")
+
+    @property
+    def routes(self) -> t.List[str]:
+        """Route URLs of all servers, through proxies when they are enabled."""
+        if self.proxies:
+            return self._urls("nats", "route_proxy_port")
+        return self._urls("nats", "cluster_port")
+
+    @property
+    def proxy_urls(self) -> t.List[str]:
+        """Client URLs of the proxies of all servers."""
+        if not self.proxies:
+            raise TypeError(f"Proxies are not enabled in cluster {self.name}")
+        return self._urls("nats", "client_proxy_port")
+
+    @property
+    def gateway_urls(self) -> t.List[str]:
+        if not self.gateway:
+            raise TypeError(f"Gateway is not enabled in cluster {self.name}")
+        return self._urls("nats", "gateway_port")
+
+    @property
+    def leafnode_urls(self) -> t.List[str]:
+        if not self.leafnodes:
+            raise TypeError(f"Leafnodes are not enabled in cluster {self.name}")
+        return self._urls("nats-leaf", "leafnode_port")
+
+    def configure(
+        self, gateways: t.Optional[t.Dict[str, t.List[str]]] = None
+    ) -> t.List[NATSD]:
+        """Create the servers of the cluster, unless they already exist.
+
+        Arguments:
+            gateways: URLs of the gateways of remote clusters, indexed by cluster name.
+        """
+        if self.nodes:
+            return self.nodes
+        if gateways and not self.gateway:
+            raise TypeError(f"Gateway is not enabled in cluster {self.name}")
+        for index, ports in enumerate(self.ports):
+            options: t.Dict[str, t.Any] = dict(
+                address=self.address,
+                port=ports["port"],
+                http_port=ports["http_port"],
+                server_name=f"{self.name}-{index}",
+                cluster_name=self.name,
+                cluster_listen=f"{self.address}:{ports['cluster_port']}",
+                routes=self.routes,
+                with_jetstream=self.with_jetstream,
+                start_timeout=self.start_timeout,
+            )
+            if self.gateway:
+                options["gateway_name"] = self.name
+                options["gateway_listen"] = f"{self.address}:{ports['gateway_port']}"
+                options["gateways"] = gateways
+            if self.leafnodes:
+                options["leafnodes_listen_address"] = self.address
+                options["leafnodes_listen_port"] = ports["leafnode_port"]
+            if self.proxies:
+                options["client_advertise"] = self.node_proxies[index][
+                    "client"
+                ].advertise
+                options["cluster_url"] = self.node_proxies[index]["route"].advertise
+            options.update(self.options)
+            self.nodes.append(NATSD(**options))
+        return self.nodes
+
+    def wait_until_ready(self, timeout: t.Optional[float] = 10) -> None:
+        """Wait until all servers are healthy, fully meshed and agree on a JetStream meta leader."""
+        wait_for_cluster(self.nodes, jetstream=self.with_jetstream, timeout=timeout)
+
+    def start(
+        self, wait: bool = True, timeout: t.Optional[float] = 10
+    ) -> "NATSCluster":
+        """Start all servers in parallel.
+
+        Arguments:
+            wait: wait until cluster is ready. Default is True.
+            timeout: maximum seconds to wait for each readiness check.
+        """
+        self.start_proxies()
+        try:
+            start_servers(self.configure())
+            if wait:
+                self.wait_until_ready(timeout)
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def stop(self, timeout: t.Optional[float] = 10) -> None:
+        try:
+            stop_servers(self.nodes, timeout)
+        finally:
+            self.stop_proxies()
+
+    def start_proxies(self) -> None:
+        """Start proxies of all servers, which must accept connections before servers start."""
+        for proxies in self.node_proxies:
+            for proxy in proxies.values():
+                proxy.start()
+
+    def stop_proxies(self) -> None:
+        for proxies in self.node_proxies:
+            for proxy in proxies.values():
+                proxy.stop()
+
+    def __enter__(self) -> "NATSCluster":
+        return self.start()
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.stop()
+
+
+class SuperCluster:
+    def __init__(
+        self,
+        clusters: t.Union[int, t.Sequence[str]] = 2,
+        size: int = 3,
+        spokes: int = 0,
+        address: str = "127.0.0.1",
+        with_jetstream: bool = False,
+        start_timeout: float = 10,
+        spoke_options: t.Optional[t.Dict[str, t.Any]] = None,
+        **options: t.Any,
+    ) -> None:
+        """Create clusters joined by gateways, each with leafnode spokes.
+
+        Arguments:
+            clusters: number of clusters, named `C1`, `C2`, ..., or names of the clusters. Default is 2.
+            size: number of servers in each cluster. Default is 3.
+            spokes: number of leafnode servers connected to each cluster. Default is 0.
+            address: address servers listen to. Default is 127.0.0.1.
+            with_jetstream: enable JetStream on cluster servers. Disabled by default.
+            start_timeout: seconds to wait for each server to start.
+            spoke_options: options given to each leafnode `NATSD` instance.
+            options: other options given to each cluster `NATSD` instance.
+        """
+        names = (
+            [f"C{index + 1}" for index in range(clusters)]
+            if isinstance(clusters, int)
+            else list(clusters)
+        )
+        if len(set(names)) != len(names):
+            raise ValueError("cluster names must be unique")
+        self.with_jetstream = with_jetstream
+        self.clusters = [
+            NATSCluster(
+                name,
+                size=size,
+                address=address,
+                with_jetstream=with_jetstream,
+                gateway=True,
+                leafnodes=spokes > 0,
+                start_timeout=start_timeout,
+                **options,
+            )
+            for name in names
+        ]
+        gateways = {cluster.name: cluster.gateway_urls for cluster in self.clusters}
+        for cluster in self.clusters:
+            cluster.configure(gateways)
+        # Leafnode servers, indexed by the name of the cluster they connect to
+        self.spokes: t.Dict[str, t.List[NATSD]] = {}
+        for cluster in self.clusters:
+            self.spokes[cluster.name] = []
+            for index in range(spokes):
+                port, http_port = find_free_ports(2, address)
+                params: t.Dict[str, t.Any] = dict(
+                    address=address,
+                    port=port,
+                    http_port=http_port,
+                    server_name=f"{cluster.name}-leaf-{index}",
+                    leafnode_remotes=[{"urls": cluster.leafnode_urls}],
+                    start_timeout=start_timeout,
+                )
+                params.update(spoke_options or {})
+                self.spokes[cluster.name].append(NATSD(**params))
+
+    def __getitem__(self, name: str) -> NATSCluster:
+        for cluster in self.clusters:
+            if cluster.name == name:
+                return cluster
+        raise KeyError(name)
+
+    @property
+    def hubs(self) -> t.List[NATSD]:
+        """Servers of all clusters."""
+        return [node for cluster in self.clusters for node in cluster.nodes]
+
+    @property
+    def leafnodes(self) -> t.List[NATSD]:
+        """Leafnode servers of all clusters."""
+        return [spoke for spokes in self.spokes.values() for spoke in spokes]
+
+    def wait_until_ready(self, timeout: t.Optional[float] = 10) -> None:
+        """Wait until each cluster is ready and connected to every other cluster.
+
+        A JetStream super-cluster elects a single meta leader, so it is awaited on all servers once
+        gateways are connected.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.clusters)) as executor:
+            list(
+                executor.map(
+                    lambda cluster: wait_for_cluster(cluster.nodes, timeout=timeout),
+                    self.clusters,
+                )
+            )
+        wait_for_gateways(
+            self.hubs, [cluster.name for cluster in self.clusters], timeout=timeout
+        )
+        if self.with_jetstream:
+            wait_for_meta_leader(self.hubs, timeout=timeout)
+
+    def start(
+        self, wait: bool = True, timeout: t.Optional[float] = 10
+    ) -> "SuperCluster":
+        """Start all clusters in parallel, then all leafnodes once clusters are ready.
+
+        Arguments:
+            wait: wait until gateways and leafnode connections are established. Default is True.
+            timeout: maximum seconds to wait for each readiness check.
+        """
+        for cluster in self.clusters:
+            cluster.start_proxies()
+        try:
+            start_servers(self.hubs)
+            if wait:
+                self.wait_until_ready(timeout)
+            start_servers(self.leafnodes)
+            if wait and self.leafnodes:
+                wait_for_leafnodes(self.leafnodes, timeout=timeout)
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def stop(self, timeout: t.Optional[float] = 10) -> None:
+        """Stop leafnodes, then all clusters."""
+        try:
+            stop_servers(self.leafnodes, timeout)
+        finally:
+            try:
+                stop_servers(self.hubs, timeout)
+            finally:
+                for cluster in self.clusters:
+                    cluster.stop_proxies()
+
+    def __enter__(self) -> "SuperCluster":
+        return self.start()
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.stop()
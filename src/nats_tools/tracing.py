@@ -0,0 +1,237 @@
+"""Instrumentation hooks emitting timed spans.
+
+`NATSD` emits a span for each phase of the server lifecycle and `NATSMonitor`/`AsyncNATSMonitor`
+emit a span for each request. Spans are only created when at least one hook is registered, so
+instrumentation costs a single attribute lookup otherwise.
+
+Span names:
+
+- `natsd.resolve`: binary lookup (`bin_path`).
+- `natsd.render`: config rendering.
+- `natsd.spawn`: process creation (`pid`).
+- `natsd.accept`: time until server wrote its ports file, once all its listeners accept connections.
+  No connection is opened to detect it.
+- `natsd.ready`: time until server wrote its ports file and `/varz` succeeded.
+- `natsd.signal`: a signal was sent (`signal`). Duration is always 0.
+- `natsd.stop`: time spent stopping the process.
+- `natsd.exit`: time spent waiting for process exit (`returncode`).
+- `natsd.cleanup`: time spent removing the workspace.
+- `monitor.request`: a monitoring request (`endpoint`, `params`, `status`, `bytes`, `decode`, `error`).
+
+All NATSD spans have `port` attribute.
+
+Example:
+
+```python
+from nats_tools.tracing import HistogramSink, tracer
+
+histogram = HistogramSink()
+tracer.add_hook(histogram)
+...
+print(histogram.summary()["natsd.ready"]["p99"])
+```
+"""
+
+import json
+import logging
+import threading
+import time
+import typing as t
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from nats_tools.stats import summarize
+
+
+@dataclass
+class Span:
+    """A timed operation.
+
+    Attributes:
+        name: name of the operation.
+        start: start time, as returned by `time.time()`.
+        duration: duration in seconds.
+        attributes: details of the operation.
+    """
+
+    name: str
+    start: float
+    duration: float
+    attributes: t.Dict[str, t.Any] = field(default_factory=dict)
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+Hook = t.Callable[[Span], None]
+
+
+class _ActiveSpan:
+    """Context manager measuring a span, emitted on exit."""
+
+    __slots__ = ("tracer", "name", "attributes", "_start", "_clock")
+
+    def __init__(
+        self, tracer: "Tracer", name: str, attributes: t.Dict[str, t.Any]
+    ) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> t.Dict[str, t.Any]:
+        self._start = time.time()
+        self._clock = time.perf_counter()
+        return self.attributes
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        if exc is not None:
+            self.attributes["error"] = repr(exc)
+        self.tracer.emit(
+            Span(
+                self.name,
+                self._start,
+                time.perf_counter() - self._clock,
+                self.attributes,
+            )
+        )
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> t.Dict[str, t.Any]:
+        # A new dictionary is returned so that attributes set by callers are discarded
+        return {}
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self) -> None:
+        """Create a new tracer without hook."""
+        self.hooks: t.List[Hook] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Hook) -> Hook:
+        """Register a hook called with each span. Returns the hook."""
+        with self._lock:
+            self.hooks = [*self.hooks, hook]
+        return hook
+
+    def remove_hook(self, hook: Hook) -> None:
+        with self._lock:
+            self.hooks = [
+                registered for registered in self.hooks if registered is not hook
+            ]
+
+    def emit(self, span: Span) -> None:
+        for hook in self.hooks:
+            hook(span)
+
+    def event(self, name: str, **attributes: t.Any) -> None:
+        """Emit a span without duration."""
+        if self.hooks:
+            self.emit(Span(name, time.time(), 0.0, attributes))
+
+    def span(
+        self, name: str, **attributes: t.Any
+    ) -> t.ContextManager[t.Dict[str, t.Any]]:
+        """Measure the duration of a block of code.
+
+        The context manager returns a dictionary of attributes which can be updated within the block.
+        Nothing is measured when no hook is registered.
+        """
+        if not self.hooks:
+            return _NULL_SPAN
+        return _ActiveSpan(self, name, attributes)
+
+
+# Tracer used by NATSD and monitoring clients
+tracer = Tracer()
+
+
+class LoggingSink:
+    def __init__(
+        self, logger: t.Optional[logging.Logger] = None, level: int = logging.DEBUG
+    ) -> None:
+        """A hook logging each span.
+
+        Arguments:
+            logger: the logger. Default to `nats_tools.tracing` logger.
+            level: level of log records. Default is DEBUG.
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, span: Span) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level,
+                "%s %.3fms %s",
+                span.name,
+                span.duration * 1000,
+                span.attributes,
+            )
+
+
+class HistogramSink:
+    def __init__(self, key: t.Optional[t.Callable[[Span], str]] = None) -> None:
+        """A hook keeping span durations in memory.
+
+        Arguments:
+            key: function returning the key under which a span is recorded. Default to span name.
+                For example, `lambda span: span.attributes.get("endpoint", span.name)` groups monitoring
+                requests by endpoint.
+        """
+        self.key = key
+        self.durations: t.Dict[str, t.List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span) -> None:
+        key = self.key(span) if self.key else span.name
+        with self._lock:
+            self.durations.setdefault(key, []).append(span.duration)
+
+    def summary(self) -> t.Dict[str, t.Dict[str, float]]:
+        with self._lock:
+            return {key: summarize(values) for key, values in self.durations.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.durations.clear()
+
+
+class JSONLSink:
+    def __init__(self, path: t.Union[str, Path]) -> None:
+        """A hook writing each span as a line of JSON.
+
+        Arguments:
+            path: file where spans are appended.
+        """
+        self.path = Path(path)
+        self._file = self.path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "JSONLSink":
+        return self
+
+    def __exit__(self, exc_type: t.Any, exc: t.Any, tb: t.Any) -> None:
+        self.close()
@@ -0,0 +1,168 @@
+"""Manage directories holding configuration files and JetStream stores of servers.
+
+All directories are created under a single root directory, which defaults to `nats-tools` within
+the system temporary directory and can be changed using the `NATS_TOOLS_WORKSPACE` environment
+variable.
+
+Directories are created lazily, when servers are started. Removing a directory only renames it,
+the actual deletion happens in a background thread. Directories left by processes which exited
+without cleaning up are removed when the manager is created. The default manager is created once
+orphan servers were stopped by the default process registry, so that files of a server are never
+removed while it is still running.
+"""
+
+import os
+import queue
+import secrets
+import shutil
+import tempfile
+import threading
+import typing as t
+from pathlib import Path
+
+# Prefix of directories waiting for deletion
+TRASH_PREFIX = "trash-"
+
+
+def default_root() -> Path:
+    """Return the default root of workspaces."""
+    root = os.environ.get("NATS_TOOLS_WORKSPACE")
+    if root:
+        return Path(root)
+    return Path(tempfile.gettempdir()).joinpath("nats-tools")
+
+
+def pid_exists(pid: int) -> bool:
+    """Check whether a process exists."""
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32  # type: ignore[attr-defined]
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkspaceManager:
+    def __init__(
+        self,
+        root: t.Union[str, Path, None] = None,
+        background: bool = True,
+        remove_orphans: bool = True,
+    ) -> None:
+        """Create a new workspace manager.
+
+        Arguments:
+            root: directory holding all workspaces. Default to `default_root()`.
+            background: delete directories in a background thread. Default is True.
+            remove_orphans: remove directories left by previous processes. Default is True.
+        """
+        self.root = Path(root) if root else default_root()
+        self.background = background
+        self._queue: "queue.Queue[Path]" = queue.Queue()
+        self._thread: t.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        if remove_orphans:
+            for path in self.orphans():
+                self.remove(path)
+
+    def allocate(self, name: str = "natsd") -> Path:
+        """Return the path of a new workspace. Directory is not created."""
+        return self.root.joinpath(f"{os.getpid()}-{name}-{secrets.token_hex(4)}")
+
+    def create(self, path: Path) -> Path:
+        """Create a workspace directory allocated using `allocate()`."""
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def orphans(self) -> t.List[Path]:
+        """Find workspaces of processes which are not running anymore, and directories waiting for deletion."""
+        if not self.root.is_dir():
+            return []
+        found: t.List[Path] = []
+        for path in self.root.iterdir():
+            if path.name.startswith(TRASH_PREFIX):
+                found.append(path)
+                continue
+            pid, _, _ = path.name.partition("-")
+            if pid.isdigit() and int(pid) != os.getpid() and not pid_exists(int(pid)):
+                found.append(path)
+        return found
+
+    def remove(self, path: Path) -> None:
+        """Remove a workspace.
+
+        Directory is renamed immediately, so that it is removed by a later run if current process
+        exits before deletion is done.
+        """
+        if not path.exists():
+            return
+        if not path.name.startswith(TRASH_PREFIX):
+            trash = path.with_name(f"{TRASH_PREFIX}{path.name}")
+            try:
+                path.rename(trash)
+                path = trash
+            except OSError:
+                pass
+        if not self.background:
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        self._queue.put(path)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="nats-workspace-cleanup", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            path = self._queue.get()
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                self._queue.task_done()
+
+    def join(self) -> None:
+        """Wait until all pending deletions are done."""
+        self._queue.join()
+
+
+_manager: t.Optional[WorkspaceManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_workspace_manager() -> WorkspaceManager:
+    """Return the workspace manager used by default, creating it on first call.
+
+    Orphan servers are stopped before the manager is created, since it removes their workspaces.
+    """
+    # Imported here since registry depends on this module
+    from nats_tools.registry import get_process_registry
+
+    global _manager
+    if _manager is None:
+        get_process_registry()
+    with _manager_lock:
+        if _manager is None:
+            _manager = WorkspaceManager()
+        return _manager
+
+
+def set_workspace_manager(manager: t.Optional[WorkspaceManager]) -> None:
+    """Replace the workspace manager used by default. A new one is created on next use when manager is None."""
+    global _manager
+    with _manager_lock:
+        _manager = manager
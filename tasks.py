@@ -121,6 +121,26 @@ def test(
     run_or_display(c, cmd, dry_run=dry_run)
 
 
+@task
+def bench(
+    c: Context,
+    output: str = "benchmarks.json",
+    baseline: str = "",
+    threshold: float = 0.2,
+    iterations: int = 100,
+    select: str = "",
+    dry_run: bool = False,
+):
+    """Run benchmarks and optionally compare results against a baseline."""
+    cmd = f"{VENV_PYTHON} benchmarks/run.py --output {quote(output)}"
+    cmd += f" --threshold {threshold} --iterations {iterations}"
+    if baseline:
+        cmd += f" --baseline {quote(baseline)}"
+    if select:
+        cmd += f" --select {quote(select)}"
+    run_or_display(c, cmd, dry_run=dry_run)
+
+
 @task
 def coverage(c: Context, run: bool = False, port: int = 8000, dry_run: bool = False):
     """Serve code coverage results and optionally run tests before serving results"""
@@ -0,0 +1,53 @@
+import pytest
+
+from nats_tools.accounts import AccountManager
+from nats_tools.natsd import NATSD
+from nats_tools.templates import ConfigGenerator
+
+
+def test_render_accounts() -> None:
+    config = ConfigGenerator().render(
+        accounts={"TEST": {"users": [{"user": "test", "password": "secret"}]}}
+    )
+    assert '"TEST": {' in config
+    assert '"user": "test"' in config
+
+
+def test_render_accounts_with_operator_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        ConfigGenerator().render(operator="OPERATOR_JWT", accounts={"TEST": {}})
+
+
+def test_manager_defers_removal_until_next_reload() -> None:
+    server = NATSD(with_jetstream=True)
+    manager = AccountManager(server, max_memory=1024)
+    first = manager.create()
+    assert first.jetstream == {
+        "max_mem": 1024,
+        "max_file": 256 * 1024 * 1024,
+        "max_streams": -1,
+        "max_consumers": -1,
+    }
+    assert first.url.startswith(f"nats://{first.user}:{first.password}@")
+    manager.remove(first)
+    assert first.name in server.config_options["accounts"]  # type: ignore[index]
+    second = manager.create(max_streams=1)
+    assert server.config_options["accounts"] == {  # type: ignore[index]
+        second.name: manager.accounts[second.name]
+    }
+    with pytest.raises(ValueError):
+        manager.create(name=second.name)
+
+
+def test_manager_rejects_operator_mode() -> None:
+    with pytest.raises(TypeError, match="operator mode"):
+        AccountManager(
+            NATSD(
+                operator="OPERATOR_JWT",
+                system_account="SYS",
+                system_account_jwt="SYS_JWT",
+                jwt_path="jwt",
+            )
+        )
+    with pytest.raises(TypeError, match="configuration is generated"):
+        AccountManager(NATSD(config_file="nats.conf"))
@@ -0,0 +1,21 @@
+from nats_tools.benchmark import BenchmarkResult, BenchmarkSuite
+from nats_tools.stats import percentile
+
+
+def test_percentile_interpolates_between_ranks():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([3, 1, 2], 100) == 3
+
+
+def test_suite_detects_regressions(tmp_path):
+    baseline = BenchmarkSuite()
+    baseline.add(BenchmarkResult("op", {"size": 1}, [0.1] * 10, 1, 10))
+    baseline.save(tmp_path / "baseline.json")
+    current = BenchmarkSuite()
+    current.add(BenchmarkResult("op", {"size": 1}, [0.2] * 10, 2, 10))
+    current.run("other", lambda: None, iterations=10)
+    regressions = current.compare(BenchmarkSuite.load(tmp_path / "baseline.json"))
+    assert {(regression.key, regression.metric) for regression in regressions} == {
+        ("op[size=1]", "p50"),
+        ("op[size=1]", "throughput"),
+    }
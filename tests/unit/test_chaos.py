@@ -0,0 +1,166 @@
+import subprocess
+import time
+import typing as t
+
+import pytest
+
+from nats_tools.chaos import ChaosReport, ChaosRunner, Fault
+from nats_tools.httpserver import (
+    BackgroundHTTPServer,
+    Response,
+    error_response,
+    json_response,
+    parse_bool,
+)
+from nats_tools.monitor import NATSMonitor
+from nats_tools.natsd import NATSD, Signal
+
+
+class FakeNode(BackgroundHTTPServer):
+    """A cluster member which becomes healthy, then routed, some time after it was started.
+
+    First node is the JetStream meta leader. When the leader is stopped, next node is elected.
+    """
+
+    poll_interval = 0.01
+
+    def __init__(self, group: t.List["FakeNode"], name: str) -> None:
+        super().__init__()
+        self.group = group
+        self.name = name
+        self.signals: t.List[Signal] = []
+        self.healthy_at = 0.0
+        self.routed_at = 0.0
+        self.leader_at = 0.0 if not group else float("inf")
+        # Number of calls to wait() which time out
+        self.wait_timeouts = 0
+        self.start()
+        self.monitor = NATSMonitor(self.url)
+
+    def send_signal(self, sig: Signal) -> None:
+        self.signals.append(sig)
+        if sig != Signal.RELOAD:
+            self.healthy_at = self.routed_at = float("inf")
+            if self.leader_at <= time.monotonic():
+                self.leader_at = float("inf")
+                successor = self.group[(self.group.index(self) + 1) % len(self.group)]
+                successor.leader_at = time.monotonic() + 0.03
+
+    def wait(self, timeout: t.Optional[float] = None) -> int:
+        if self.wait_timeouts:
+            self.wait_timeouts -= 1
+            raise subprocess.TimeoutExpired("nats-server", t.cast(float, timeout))
+        return 0
+
+    def start(self, wait: bool = False) -> t.Any:
+        if self._server is None:
+            return super().start()
+        now = time.monotonic()
+        self.healthy_at = now + 0.02
+        self.routed_at = now + 0.05
+        return self
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        now = time.monotonic()
+        if path == "/varz":
+            return json_response({"server_id": self.name})
+        if path == "/healthz":
+            if now < self.healthy_at:
+                return json_response({"status": "unavailable"}, 503)
+            return json_response({"status": "ok"})
+        if path == "/jsz":
+            leaders = [node.name for node in self.group if node.leader_at <= now]
+            if parse_bool(params.get("leader-only")) and self.name not in leaders:
+                return error_response(400, "not leader")
+            return json_response({"meta_cluster": {"leader": "".join(leaders)}})
+        routes = [
+            {"remote_id": node.name}
+            for node in self.group
+            if node is not self and now >= max(self.routed_at, node.routed_at)
+        ]
+        return json_response({"routes": routes})
+
+
+@pytest.fixture
+def group() -> t.Iterator[t.List[NATSD]]:
+    nodes: t.List[FakeNode] = []
+    nodes.extend(FakeNode(nodes, f"n{index}") for index in range(3))
+    yield t.cast(t.List[NATSD], nodes)
+    for node in nodes:
+        node.stop()
+
+
+def test_scripted_faults_record_milestones(group: t.List[NATSD]) -> None:
+    schedule = [
+        Fault(Signal.KILL, 0),
+        Fault(Signal.LDM, 1, downtime=0.05),
+        Fault(Signal.RELOAD, 2),
+    ]
+    report = ChaosRunner(group, schedule, recovery_timeout=2).run()
+    assert len(report) == 3
+    assert not report.failures
+    kill, ldm, reload = report.recoveries
+    assert t.cast(t.Any, group[0]).signals == [Signal.KILL]
+    # Milestones of the whole group are only probed once the process exited and restarted
+    assert list(kill.milestones)[:2] == ["exit", "restart"]
+    assert set(kill.milestones) == {"exit", "restart", "healthz", "routes"}
+    assert kill.milestones["healthz"] >= max(kill.milestones["restart"], 0.02)
+    assert kill.milestones["routes"] >= 0.05
+    assert ldm.milestones["restart"] >= 0.05
+    assert set(reload.milestones) == {"healthz", "routes"}
+    summary = report.summary()
+    assert summary["KILL"]["total"]["count"] == 1
+    assert summary["LDM"]["routes"]["p50"] >= 0.1
+    assert "LDM" in "\n".join(report.format())
+
+
+def test_leader_is_elected_while_faulty_node_is_down(group: t.List[NATSD]) -> None:
+    runner = ChaosRunner(
+        group, [Fault(Signal.KILL, 0, downtime=1)], jetstream=True, recovery_timeout=2
+    )
+    (recovery,) = runner.run().recoveries
+    assert recovery.recovered
+    assert 0.03 <= recovery.milestones["meta_leader"] < recovery.milestones["restart"]
+    assert recovery.milestones["routes"] >= 1.05
+
+
+def test_node_is_restarted_when_exit_times_out(group: t.List[NATSD]) -> None:
+    node = t.cast(t.Any, group[0])
+    node.wait_timeouts = 1
+    schedule = [Fault(Signal.LDM, 0), Fault(Signal.KILL, 1)]
+    report = ChaosRunner(group, schedule, recovery_timeout=1).run()
+    assert node.signals == [Signal.LDM, Signal.KILL]
+    ldm, kill = report.recoveries
+    assert "timed out" in t.cast(str, ldm.error)
+    assert "exit" not in ldm.milestones
+    assert "routes" in ldm.milestones
+    assert kill.recovered
+    assert report.aborted is None
+
+
+def test_random_schedule_and_failures(group: t.List[NATSD]) -> None:
+    runner = ChaosRunner(group, actions=[Signal.KILL, Signal.STOP], faults=4, seed=3)
+    assert len(runner.schedule) == 4
+    assert {fault.action for fault in runner.schedule} <= {Signal.KILL, Signal.STOP}
+    same = ChaosRunner(group, actions=[Signal.KILL, Signal.STOP], faults=4, seed=3)
+    assert runner.schedule == same.schedule
+    node = t.cast(t.Any, group[1])
+    # Node never becomes healthy again
+    node.start = lambda wait=False: node
+    schedule = [Fault(Signal.KILL, 1), Fault(Signal.KILL, 2)]
+    report = ChaosRunner(group, schedule, recovery_timeout=0.1).run()
+    # Run is aborted since group did not recover after first fault
+    assert len(report) == 1
+    assert "fault 0" in t.cast(str, report.aborted)
+    assert len(report.failures) == 1
+    assert "healthz" in t.cast(str, report.failures[0].error)
+    assert report.summary() == {}
+    assert report.to_dict()["failures"] == 1
+
+
+def test_invalid_faults(group: t.List[NATSD]) -> None:
+    with pytest.raises(ValueError):
+        Fault(Signal.REOPEN, 0)
+    with pytest.raises(ValueError):
+        ChaosRunner(group, [Fault(Signal.KILL, 3)])
+    assert ChaosReport().format()[0] == "0 faults applied, 0 did not recover"
@@ -0,0 +1,73 @@
+import typing as t
+
+import pytest
+
+from nats_tools.natsd import NATSD
+from nats_tools.templates import ConfigGenerator
+from nats_tools.templates.config import format_duration
+
+
+def test_render_performance_limits() -> None:
+    config = ConfigGenerator().render(
+        max_payload=8 * 1024 * 1024,
+        max_pending=128 * 1024 * 1024,
+        write_deadline=2.5,
+        max_connections=100,
+        max_subscriptions=0,
+        max_control_line=8192,
+        ping_interval="30s",
+        ping_max=3,
+        no_fast_producer_stall=True,
+        with_jetstream=True,
+        sync_interval="always",
+    )
+    assert "max_payload: 8388608" in config
+    assert "max_pending: 134217728" in config
+    assert 'write_deadline: "2500ms"' in config
+    assert "max_connections: 100" in config
+    assert "max_subscriptions: 0" in config
+    assert "max_control_line: 8192" in config
+    assert 'ping_interval: "30s"' in config
+    assert "ping_max: 3" in config
+    assert "no_fast_producer_stall: true" in config
+    assert 'sync_interval: "always"' in config
+
+
+def test_render_lame_duck_options() -> None:
+    config = ConfigGenerator().render(
+        lame_duck_duration=5, lame_duck_grace_period="500ms"
+    )
+    assert 'lame_duck_duration: "5000ms"' in config
+    assert 'lame_duck_grace_period: "500ms"' in config
+    assert "lame_duck" not in ConfigGenerator().render()
+    with pytest.raises(ValueError):
+        ConfigGenerator().render(lame_duck_duration=0)
+
+
+def test_performance_limits_are_omitted_by_default() -> None:
+    config = ConfigGenerator().render()
+    for option in ("max_payload", "write_deadline", "ping_interval", "sync_interval"):
+        assert option not in config
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"max_payload": 128 * 1024 * 1024},
+        {"max_payload": 2048, "max_pending": 1024},
+        {"max_connections": 0},
+        {"max_subscriptions": -1},
+        {"ping_max": True},
+        {"write_deadline": "10 seconds"},
+        {"ping_interval": 0},
+        {"sync_interval": "1s"},
+    ],
+)
+def test_invalid_performance_limits(options: t.Dict[str, t.Any]) -> None:
+    with pytest.raises(ValueError):
+        NATSD(**options)
+
+
+def test_format_duration() -> None:
+    assert format_duration(10, "d") == "10000ms"
+    assert format_duration("1h30m", "d") == "1h30m"
@@ -0,0 +1,57 @@
+import json
+import types
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from nats_tools.costs import CostReport
+from nats_tools.testing import COST_REPORT, pytest_sessionfinish, pytest_testnodedown
+
+
+def test_cost_report() -> None:
+    report = CostReport()
+    report.record("test_a", {"render": 0.001, "spawn": 0.01, "ready": 0.02})
+    report.record("test_b", {"render": 0.002, "stop": 0.5})
+    report.record("test_b", {"render": 0.002})
+    assert len(report) == 2
+    assert report.tests["test_b"] == {"render": 0.004, "stop": 0.5}
+    assert report.slowest(1) == [("test_b", 0.504)]
+    phases = report.phases()
+    assert phases["render"]["count"] == 2
+    assert phases["cleanup"] == {"count": 0, "total": 0.0}
+    lines = report.format()
+    assert lines[0].startswith("2 tests spent 0.535s")
+    assert not any(line.startswith("cleanup") for line in lines)
+    assert lines[-1] == "  0.031s test_a"
+
+
+def test_cost_report_save(tmp_path: Path) -> None:
+    report = CostReport()
+    report.record("test_a", {"spawn": 0.01})
+    report.save(tmp_path / "costs.json")
+    data = json.loads((tmp_path / "costs.json").read_text())
+    assert data["tests"] == {"test_a": {"spawn": 0.01}}
+    assert data["phases"]["spawn"]["count"] == 1
+
+
+def test_costs_of_xdist_workers_are_merged() -> None:
+    workers = []
+    for test in ("test_a", "test_b"):
+        report = CostReport()
+        report.record(test, {"spawn": 0.01})
+        config = types.SimpleNamespace(stash=pytest.Stash(), workeroutput={})
+        config.stash[COST_REPORT] = report
+        pytest_sessionfinish(
+            t.cast(pytest.Session, types.SimpleNamespace(config=config)), 0
+        )
+        workers.append(config.workeroutput)
+    controller = types.SimpleNamespace(stash=pytest.Stash())
+    controller.stash[COST_REPORT] = CostReport()
+    for output in workers:
+        node = types.SimpleNamespace(config=controller, workeroutput=output)
+        pytest_testnodedown(node, None)
+    assert controller.stash[COST_REPORT].tests == {
+        "test_a": {"spawn": 0.01},
+        "test_b": {"spawn": 0.01},
+    }
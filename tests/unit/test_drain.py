@@ -0,0 +1,159 @@
+import time
+import typing as t
+
+import pytest
+
+from nats_tools.drain import DrainReport, list_connections, profile_lame_duck
+from nats_tools.httpserver import BackgroundHTTPServer, Response, json_response
+from nats_tools.monitor import NATSMonitor
+from nats_tools.natsd import NATSD
+
+
+class FakeServer(BackgroundHTTPServer):
+    """A server evicting one client every `step` seconds once in lame duck mode."""
+
+    poll_interval = 0.01
+
+    def __init__(
+        self,
+        clients: t.List[str],
+        step: float = 0.01,
+        peer: t.Optional["FakeServer"] = None,
+    ) -> None:
+        super().__init__()
+        self.clients = clients
+        self.step = step
+        self.peer = peer
+        self.ldm_at: t.Optional[float] = None
+        self.monitor = NATSMonitor(self.start().url)
+        self.proc = self
+        self.limits: t.List[int] = []
+
+    def evicted(self) -> int:
+        if self.ldm_at is None:
+            return 0
+        return min(len(self.clients), int((time.monotonic() - self.ldm_at) / self.step))
+
+    def connections(self) -> t.List[t.Dict[str, t.Any]]:
+        now = time.monotonic()
+        connections = [
+            {"cid": cid, "name": name}
+            for cid, name in enumerate(self.clients, 1)
+            if cid > self.evicted()
+        ]
+        if self.peer is not None and self.peer.ldm_at is not None:
+            # Evicted clients of peer reconnect after one step
+            delay = now - self.peer.ldm_at - self.peer.step
+            reconnected = self.peer.clients[: max(0, int(delay / self.peer.step))]
+            connections.extend(
+                {"cid": cid, "name": name}
+                for cid, name in enumerate(reconnected, len(self.clients) + 1)
+            )
+        return connections
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        offset, limit = int(params["offset"]), int(params["limit"])
+        self.limits.append(limit)
+        connections = self.connections()
+        return json_response(
+            {
+                "total": len(connections),
+                "connections": connections[offset : offset + limit],
+            }
+        )
+
+    def enter_lame_duck_mode(self) -> None:
+        self.ldm_at = time.monotonic()
+
+    def poll(self) -> t.Optional[int]:
+        if self.ldm_at is None:
+            return None
+        # Process exits two steps after the last client was evicted
+        done = self.ldm_at + self.step * (len(self.clients) + 2)
+        return 0 if time.monotonic() >= done else None
+
+    def wait(self, timeout: t.Optional[float] = None) -> int:
+        return 0
+
+
+class ShiftingServer(FakeServer):
+    """A server evicting its first client after each `/connz` request once in lame duck mode.
+
+    Remaining connections shift between pages, so paginated listings skip open connections.
+    """
+
+    def __init__(self, clients: t.List[str]) -> None:
+        super().__init__(clients)
+        # Seconds since lame duck mode was entered when each client was evicted
+        self.evictions: t.Dict[str, float] = {}
+        # Whether a listing returned no connection
+        self.drained = False
+
+    def evicted(self) -> int:
+        return len(self.evictions)
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        response = super().handle(path, params, query)
+        self.drained = self.evicted() == len(self.clients)
+        if self.ldm_at is not None and self.evicted() < len(self.clients):
+            name = self.clients[self.evicted()]
+            self.evictions[name] = time.monotonic() - self.ldm_at
+        return response
+
+    def poll(self) -> t.Optional[int]:
+        return 0 if self.drained else None
+
+
+def test_list_connections_requests_all_pages() -> None:
+    with FakeServer([f"client-{index}" for index in range(25)]) as server:
+        connections = list_connections(server.monitor, page_size=10)
+        assert len(connections) == 25
+        assert server.limits == [10, 10, 10]
+        with pytest.raises(ValueError):
+            list_connections(server.monitor, page_size=1)
+
+
+def test_profile_lame_duck() -> None:
+    clients = [f"client-{index}" for index in range(5)]
+    with FakeServer(["other"]) as peer, FakeServer(clients, step=0.05) as server:
+        peer.peer = server
+        report = profile_lame_duck(
+            t.cast(NATSD, server), peers=[peer.monitor], page_size=4, interval=0.005
+        )
+    assert report.initial == 5
+    assert report.curve[0] == (0.0, 5)
+    counts = [count for _, count in report.curve]
+    assert counts == sorted(counts, reverse=True)
+    assert counts[-1] == 0
+    assert report.drained_at is not None and report.drained_at >= 0.1
+    assert report.exited_at is not None and report.exited_at >= report.drained_at
+    assert report.returncode == 0
+    assert sorted(report.reconnects) == clients
+    assert all(delay >= 0.01 for delay in report.reconnects.values())
+    assert report.lost == []
+    summary = report.summary()
+    assert summary["reconnect"]["count"] == 5
+    assert "5 clients reconnected" in "\n".join(report.format())
+
+
+def test_profile_lame_duck_timeout() -> None:
+    with FakeServer(["client"], step=10) as server:
+        with pytest.raises(TimeoutError, match="lame duck"):
+            profile_lame_duck(t.cast(NATSD, server), timeout=0.05)
+    assert DrainReport(initial=0).format()[0].startswith("0 connections drained in n/a")
+
+
+def test_connections_skipped_between_pages_are_not_evicted() -> None:
+    clients = [f"client-{index:02d}" for index in range(12)]
+    with ShiftingServer(clients) as server:
+        report = profile_lame_duck(
+            t.cast(NATSD, server), page_size=3, interval=0.005, reconnect_timeout=0
+        )
+    assert sorted(report.evictions) == clients
+    # Clients are never reported evicted before they actually were
+    for name, evicted_at in server.evictions.items():
+        assert report.evictions[name] >= evicted_at
+    assert list(report.evictions.values()) == sorted(report.evictions.values())
+    counts = [count for _, count in report.curve]
+    assert counts == sorted(counts, reverse=True)
+    assert counts[0] == 12 and counts[-1] == 0
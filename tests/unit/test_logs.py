@@ -0,0 +1,120 @@
+import os
+import typing as t
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from nats_tools.logs import (
+    LogFollower,
+    LogIndex,
+    LogSearch,
+    parse_timestamp,
+    rotated_files,
+)
+
+BEGIN = datetime(2024, 1, 2, 15, 4, 5)
+
+
+def log_line(index: int, level: str = "INF") -> str:
+    timestamp = BEGIN + timedelta(milliseconds=index)
+    return f"[42] {timestamp:%Y/%m/%d %H:%M:%S.%f} [{level}] message {index}\n"
+
+
+def write_log(path: Path, indexes: t.Iterable[int]) -> None:
+    with path.open("a") as output:
+        for index in indexes:
+            output.write(log_line(index, "ERR" if index % 1000 == 0 else "INF"))
+            if index % 500 == 0:
+                # A multi-line message, continued without timestamp
+                output.write("  continued\n")
+
+
+def test_parse_timestamp() -> None:
+    assert parse_timestamp(log_line(1).encode()) == BEGIN + timedelta(milliseconds=1)
+    assert parse_timestamp(b"[42] [INF] no timestamp") is None
+
+
+def test_follower_reads_appended_lines_across_rotations(tmp_path: Path) -> None:
+    path = tmp_path / "nats.log"
+    follower = LogFollower(path)
+    assert follower.read_lines() == []
+    path.write_text("first\nsecond\npart")
+    assert follower.read_lines() == ["first", "second"]
+    with path.open("a") as output:
+        output.write("ial\n")
+    assert follower.read_lines() == ["partial"]
+    # Lines written just before rotation are not lost
+    with path.open("a") as output:
+        output.write("before rotation\nunterminated")
+    path.rename(tmp_path / "nats.log.2024.01.02.15.04.05.000000000")
+    assert follower.read_lines() == ["before rotation"]
+    path.write_text("after rotation\n")
+    assert follower.read_lines() == ["unterminated", "after rotation"]
+    assert follower.rotations == 1
+    # Truncation in place
+    path.write_text("truncated\n")
+    assert follower.read_lines() == ["truncated"]
+    assert follower.rotations == 2
+    follower.close()
+    with LogFollower(path, from_start=False) as tail:
+        with path.open("a") as output:
+            output.write("new\n")
+        assert tail.read_lines() == ["new"]
+
+
+def test_index_time_window_queries(tmp_path: Path) -> None:
+    path = tmp_path / "nats.log"
+    write_log(path, range(20000))
+    start = BEGIN + timedelta(milliseconds=5000)
+    end = BEGIN + timedelta(milliseconds=5999)
+    with LogIndex(path, stride=4096) as index:
+        assert 0 < len(index) <= os.path.getsize(path) // 4096 + 1
+        assert index.first == BEGIN
+        assert index.last == BEGIN + timedelta(milliseconds=19999)
+        lines = list(index.search(start, end))
+        assert lines[0].text == log_line(5000, "ERR").rstrip("\n")
+        assert lines[1].text == "  continued"
+        assert lines[-1].text == log_line(5999).rstrip("\n")
+        assert len(lines) == 1002
+        errors = list(index.search(pattern=r"\[ERR\]"))
+        assert [line.timestamp for line in errors] == [
+            BEGIN + timedelta(seconds=index) for index in range(20)
+        ]
+        assert list(index.search(end=BEGIN - timedelta(seconds=1))) == []
+        write_log(path, range(20000, 21000))
+        index.refresh()
+        assert index.last == BEGIN + timedelta(milliseconds=20999)
+        assert len(list(index.search(BEGIN + timedelta(milliseconds=20500)))) == 501
+
+
+def test_search_over_rotated_files(tmp_path: Path) -> None:
+    path = tmp_path / "nats.log"
+    for number, chunk in enumerate([range(0, 1000), range(1000, 2000)]):
+        rotated = tmp_path / f"nats.log.2024.01.02.15.04.0{number}.000000000"
+        write_log(rotated, chunk)
+        os.utime(rotated, (number, number))
+    write_log(path, range(2000, 3000))
+    assert [file.name for file in rotated_files(path)] == [
+        "nats.log.2024.01.02.15.04.00.000000000",
+        "nats.log.2024.01.02.15.04.01.000000000",
+    ]
+    with LogSearch(path, stride=1024) as logs:
+        lines = list(
+            logs.search(
+                BEGIN + timedelta(milliseconds=999),
+                BEGIN + timedelta(milliseconds=2000),
+                pattern="message",
+            )
+        )
+        assert [line.text.split()[-1] for line in lines] == [
+            str(index) for index in range(999, 2001)
+        ]
+        assert {Path(line.path).name for line in lines} == {
+            "nats.log.2024.01.02.15.04.01.000000000",
+            "nats.log.2024.01.02.15.04.00.000000000",
+            "nats.log",
+        }
+        # Current file is rotated: a new file takes its name
+        path.rename(tmp_path / "nats.log.2024.01.02.15.04.02.000000000")
+        write_log(path, range(3000, 3010))
+        assert len(logs.indexes()) == 4
+        assert len(list(logs.search(BEGIN + timedelta(milliseconds=3000)))) == 11
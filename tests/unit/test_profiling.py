@@ -0,0 +1,60 @@
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from nats_tools.benchmark import BenchmarkSuite
+from nats_tools.httpserver import BackgroundHTTPServer, Response, error_response
+from nats_tools.natsd import NATSD
+from nats_tools.templates import ConfigGenerator
+
+
+class FakeProfiler(BackgroundHTTPServer):
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests: t.List[t.Tuple[str, t.Dict[str, str]]] = []
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        if not path.startswith("/debug/pprof/"):
+            return error_response(404, "not found")
+        self.requests.append((path, params))
+        return 200, path.encode()
+
+
+def test_render_prof_port() -> None:
+    config = ConfigGenerator().render(prof_port=6060, prof_block_rate=1)
+    assert "prof_port: 6060" in config
+    assert "prof_block_rate: 1" in config
+    assert "prof_port" not in ConfigGenerator().render()
+    with pytest.raises(ValueError):
+        ConfigGenerator().render(prof_block_rate=1)
+
+
+def test_profiling_allocates_port() -> None:
+    server = NATSD(profiling=True)
+    assert server.prof_port
+    assert server.config_options is not None
+    assert server.config_options["prof_port"] == server.prof_port
+    with pytest.raises(TypeError):
+        NATSD().heap_profile("heap.pprof")
+
+
+def test_capture_profiles(tmp_path: Path) -> None:
+    with FakeProfiler() as profiler:
+        server = NATSD(prof_port=profiler.port)
+        suite = BenchmarkSuite()
+        futures = []
+        suite.run(
+            "noop",
+            lambda: None,
+            iterations=10,
+            on_measure=lambda: futures.append(
+                server.capture_profiles_in_background(tmp_path, seconds=1)
+            ),
+        )
+        paths = futures[0].result(timeout=10)
+    assert sorted(paths) == ["block", "cpu", "goroutine", "heap"]
+    assert paths["cpu"].read_bytes() == b"/debug/pprof/profile"
+    assert profiler.requests[0] == ("/debug/pprof/profile", {"seconds": "1"})
+    with pytest.raises(ValueError):
+        server.capture_profiles(tmp_path, kinds=["trace"])
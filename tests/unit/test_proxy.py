@@ -0,0 +1,109 @@
+import socket
+import time
+import typing as t
+
+import pytest
+
+from nats_tools.natsd import NATSD
+from nats_tools.proxy import FaultProxy, Faults
+from nats_tools.standin import StandInServer
+from nats_tools.topology import NATSCluster
+
+
+@pytest.fixture
+def proxy() -> t.Iterator[FaultProxy]:
+    with StandInServer(port=0, http_port=0) as server:
+        with FaultProxy((server.address, server.port), seed=1) as proxy:
+            yield proxy
+
+
+def connect(proxy: FaultProxy) -> t.Tuple[socket.socket, t.BinaryIO]:
+    sock = socket.create_connection((proxy.address, proxy.port), timeout=2)
+    file = sock.makefile("rb")
+    assert file.readline().startswith(b"INFO ")
+    sock.sendall(b'CONNECT {"verbose": false}\r\n')
+    return sock, file
+
+
+def round_trip(sock: socket.socket, file: t.BinaryIO) -> float:
+    started = time.perf_counter()
+    sock.sendall(b"PING\r\n")
+    assert file.readline() == b"PONG\r\n"
+    return time.perf_counter() - started
+
+
+def test_forwarding_and_counters(proxy: FaultProxy) -> None:
+    sock, file = connect(proxy)
+    round_trip(sock, file)
+    stats = proxy.stats()
+    assert stats["connections"] == 1
+    assert stats["active"] == 1
+    assert stats["upstream"]["forwarded"] == stats["upstream"]["received"] > 0
+    assert stats["downstream"]["forwarded"] > 0
+    sock.close()
+
+
+def test_latency_and_partial_writes(proxy: FaultProxy) -> None:
+    sock, file = connect(proxy)
+    assert round_trip(sock, file) < 0.05
+    proxy.set("downstream", latency=0.1, chunk_size=1)
+    assert round_trip(sock, file) >= 0.1
+    proxy.set("downstream", latency=0)
+    assert proxy.faults["downstream"] == Faults(chunk_size=1)
+    proxy.clear()
+    assert round_trip(sock, file) < 0.05
+
+
+def test_bandwidth(proxy: FaultProxy) -> None:
+    sock, file = connect(proxy)
+    sock.sendall(b"SUB foo 1\r\n")
+    round_trip(sock, file)
+    proxy.set("downstream", bandwidth=20_000)
+    started = time.perf_counter()
+    sock.sendall(b"PUB foo 5000\r\n" + b"x" * 5000 + b"\r\n")
+    assert file.readline() == b"MSG foo 1 5000\r\n"
+    assert len(file.read(5002)) == 5002
+    assert time.perf_counter() - started >= 0.2
+
+
+def test_blackhole_and_reset(proxy: FaultProxy) -> None:
+    sock, file = connect(proxy)
+    round_trip(sock, file)
+    proxy.set("upstream", blackhole=True)
+    sock.sendall(b"PING\r\n")
+    sock.settimeout(0.2)
+    with pytest.raises(socket.timeout):
+        file.readline()
+    assert proxy.stats()["upstream"]["dropped"] == 6
+    assert proxy.reset() == 1
+    sock.settimeout(2)
+    with pytest.raises(ConnectionResetError):
+        sock.recv(1)
+    proxy.reject = True
+    with pytest.raises((ConnectionResetError, AssertionError)):
+        connect(proxy)
+    assert proxy.stats()["resets"] == 2
+
+
+def test_faults_validation() -> None:
+    with pytest.raises(ValueError):
+        Faults(latency=-1)
+    with pytest.raises(ValueError):
+        FaultProxy(("127.0.0.1", 4222)).set("sideways", latency=1)
+
+
+def test_cluster_advertises_proxies() -> None:
+    cluster = NATSCluster("east", size=2, proxies=True)
+    nodes = cluster.configure()
+    proxies = cluster.node_proxies[1]
+    options = t.cast(t.Dict[str, t.Any], nodes[1].config_options)
+    assert options["client_advertise"] == proxies["client"].advertise
+    assert options["cluster_url"] == proxies["route"].advertise
+    assert options["routes"] == [
+        f"nats://{node['route'].advertise}" for node in cluster.node_proxies
+    ]
+    assert proxies["route"].target == ("127.0.0.1", cluster.ports[1]["cluster_port"])
+    assert cluster.proxy_urls[0] == cluster.node_proxies[0]["client"].url
+    route_proxy = FaultProxy.for_server(nodes[0], "route")
+    assert route_proxy.target == ("127.0.0.1", cluster.ports[0]["cluster_port"])
+    assert FaultProxy.for_server(NATSD(port=5000)).target == ("127.0.0.1", 5000)
@@ -0,0 +1,138 @@
+import typing as t
+
+import pytest
+
+from nats_tools.backoff import Backoff
+from nats_tools.httpserver import (
+    BackgroundHTTPServer,
+    Response,
+    error_response,
+    json_response,
+    parse_bool,
+)
+from nats_tools.monitor import NATSMonitor
+from nats_tools.readiness import (
+    wait_for_cluster,
+    wait_for_full_mesh,
+    wait_for_healthz,
+    wait_for_interest,
+    wait_for_meta_leader,
+    wait_for_stream_replicas,
+)
+from nats_tools.simulator import MonitorSimulator
+
+
+class FakeNode(BackgroundHTTPServer):
+    """A cluster member whose routes and JetStream state are set by tests."""
+
+    poll_interval = 0.01
+
+    def __init__(self, name: str) -> None:
+        super().__init__()
+        self.name = name
+        self.routes: t.List[str] = []
+        self.meta_leader = ""
+        self.streams: t.List[t.Dict[str, t.Any]] = []
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        if path == "/varz":
+            return json_response(
+                {"server_id": f"id-{self.name}", "server_name": self.name}
+            )
+        if path == "/routez":
+            return json_response(
+                {"routes": [{"remote_id": f"id-{name}"} for name in self.routes]}
+            )
+        if parse_bool(params.get("leader-only")) and self.meta_leader != self.name:
+            return error_response(400, "not leader")
+        streams = [dict(stream) for stream in self.streams]
+        if not parse_bool(params.get("config")):
+            for stream in streams:
+                stream.pop("config", None)
+        return json_response(
+            {
+                "meta_cluster": {"leader": self.meta_leader},
+                "account_details": [{"stream_detail": streams}],
+            }
+        )
+
+
+@pytest.fixture
+def nodes() -> t.Iterator[t.List[FakeNode]]:
+    nodes = [FakeNode(f"n{index}").start() for index in range(3)]
+    yield nodes
+    for node in nodes:
+        node.stop()
+
+
+def monitors(nodes: t.List[FakeNode]) -> t.List[NATSMonitor]:
+    return [NATSMonitor(node.url) for node in nodes]
+
+
+def test_backoff_delays_grow_until_maximum():
+    backoff = Backoff(initial=0.01, maximum=0.04, jitter=0)
+    assert [backoff.next_delay() for _ in range(4)] == [0.01, 0.02, 0.04, 0.04]
+    backoff.reset()
+    assert backoff.next_delay() == 0.01
+
+
+def test_wait_for_healthz_returns_when_all_nodes_are_healthy():
+    with MonitorSimulator(connections=1) as first, MonitorSimulator(
+        connections=1
+    ) as second:
+        wait_for_cluster([NATSMonitor(first.url)], timeout=1)
+        wait_for_healthz([NATSMonitor(first.url), NATSMonitor(second.url)], timeout=1)
+        with pytest.raises(TimeoutError, match="healthz on all nodes"):
+            wait_for_healthz([NATSMonitor(first.url)], js_enabled=True, timeout=0.1)
+
+
+def test_wait_for_interest_polls_subsz():
+    with MonitorSimulator(connections=10) as simulator:
+        monitor = NATSMonitor(simulator.url)
+        assert monitor.wait_for_interest("sim.$G.1.1", timeout=1) >= 1
+        assert wait_for_interest([monitor], "sim.$G.1.1", timeout=1) >= 1
+        with pytest.raises(TimeoutError, match="found 0"):
+            monitor.wait_for_interest("unknown", timeout=0.05)
+
+
+def test_wait_for_full_mesh_requires_routes_to_all_nodes(nodes):
+    nodes[0].routes = ["n1", "n2"]
+    # Route pooling opens several routes towards the same remote
+    nodes[1].routes = ["n0", "n0", "n2"]
+    nodes[2].routes = ["n1"]
+    with pytest.raises(TimeoutError, match="node 2 has no route to 1 nodes"):
+        wait_for_full_mesh(monitors(nodes), timeout=0.1)
+    nodes[2].routes = ["n0", "n1"]
+    wait_for_full_mesh(monitors(nodes), timeout=1)
+
+
+def test_wait_for_meta_leader_requires_a_single_known_leader(nodes):
+    with pytest.raises(TimeoutError, match="0 nodes claim"):
+        wait_for_meta_leader(monitors(nodes), timeout=0.1)
+    nodes[0].meta_leader = nodes[1].meta_leader = "n1"
+    with pytest.raises(TimeoutError, match="do not agree"):
+        wait_for_meta_leader(monitors(nodes), timeout=0.1)
+    nodes[2].meta_leader = "n1"
+    assert wait_for_meta_leader(monitors(nodes), timeout=1) == "n1"
+
+
+def test_wait_for_stream_replicas_counts_current_replicas_of_leader(nodes):
+    replicas = [{"name": "n1", "current": True}, {"name": "n2", "current": False}]
+    stream = {
+        "name": "ORDERS",
+        "config": {"num_replicas": 3},
+        "cluster": {"leader": "n0", "replicas": replicas},
+    }
+    # Details reported by a node which is not the stream leader are ignored
+    nodes[1].streams = [stream]
+    with pytest.raises(TimeoutError, match="stream leader not found"):
+        wait_for_stream_replicas(monitors(nodes), "ORDERS", timeout=0.1)
+    nodes[0].streams = [{"name": "OTHER"}, stream]
+    # Expected replicas default to the configured number of replicas
+    with pytest.raises(TimeoutError, match="2/3 replicas are current"):
+        wait_for_stream_replicas(monitors(nodes), "ORDERS", timeout=0.1)
+    detail = wait_for_stream_replicas(monitors(nodes), "ORDERS", replicas=2, timeout=1)
+    assert detail["cluster"]["leader"] == "n0"
+    replicas[1]["current"] = True
+    detail = wait_for_stream_replicas(monitors(nodes), "ORDERS", timeout=1)
+    assert detail["config"]["num_replicas"] == 3
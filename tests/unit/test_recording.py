@@ -0,0 +1,77 @@
+import asyncio
+import typing as t
+
+from nats_tools.httpserver import BackgroundHTTPServer, Response, json_response
+from nats_tools.monitor import NATSMonitor
+from nats_tools.recording import MonitorRecorder, ReplayServer, read_recording
+
+
+class CountingServer(BackgroundHTTPServer):
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        self.count += 1
+        return json_response({"path": path, "count": self.count, **params})
+
+
+def test_recorded_exchanges_can_be_replayed(tmp_path):
+    recording = tmp_path.joinpath("recording.jsonl.gz")
+    with CountingServer() as server:
+        with MonitorRecorder(recording) as recorder:
+            monitor = recorder.monitor(server.url)
+            assert monitor.varz()["count"] == 1
+            assert monitor.varz()["count"] == 2
+            assert monitor.subsz(test="foo")["test"] == "foo"
+    # Appending to an existing recording creates a new gzip member
+    with CountingServer() as server:
+        with MonitorRecorder(recording) as recorder:
+
+            async def query():
+                async with recorder.async_monitor(server.url) as monitor:
+                    return await monitor.healthz()
+
+            assert asyncio.run(query())["path"] == "/healthz"
+
+    exchanges = list(read_recording(recording))
+    assert [exchange.path for exchange in exchanges] == [
+        "/varz",
+        "/varz",
+        "/subsz",
+        "/healthz",
+    ]
+    # Appended session is replayed after the first one
+    offsets = [exchange.offset for exchange in exchanges]
+    assert offsets == sorted(offsets)
+    assert offsets[3] >= offsets[2] + exchanges[2].duration
+    with ReplayServer(recording, speed=None) as replay:
+        monitor = NATSMonitor(replay.url)
+        assert monitor.varz()["count"] == 1
+        assert monitor.varz()["count"] == 2
+        # Last response is repeated once all responses were served
+        assert monitor.varz()["count"] == 2
+        assert monitor.subsz(test="foo")["count"] == 3
+        assert replay.handle("/jsz", {}, "")[0] == 404
+
+
+def test_interrupted_recording_can_be_read(tmp_path):
+    recording = tmp_path.joinpath("recording.jsonl.gz")
+    with CountingServer() as server:
+        recorder = MonitorRecorder(recording).open()
+        monitor = recorder.monitor(server.url)
+        monitor.varz()
+        monitor.healthz()
+        # Recorder is never closed, as if process was killed
+        interrupted = tmp_path.joinpath("interrupted.jsonl.gz")
+        interrupted.write_bytes(recording.read_bytes())
+        recorder.close()
+    assert [exchange.path for exchange in read_recording(interrupted)] == [
+        "/varz",
+        "/healthz",
+    ]
+    # A last exchange which was only partially written is ignored
+    truncated = tmp_path.joinpath("truncated.jsonl.gz")
+    truncated.write_bytes(interrupted.read_bytes()[:-8])
+    assert len(list(read_recording(truncated))) <= 2
+    assert [exchange.path for exchange in read_recording(truncated)][:1] == ["/varz"]
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from nats_tools import registry as registry_module
+from nats_tools import workspace as workspace_module
+from nats_tools.natsd import NATSD
+from nats_tools.registry import ProcessRegistry, ServerRecord
+from nats_tools.simulator import MonitorSimulator
+from nats_tools.workspace import WorkspaceManager, get_workspace_manager
+
+
+def dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_reap_stops_orphan_servers(tmp_path: Path) -> None:
+    registry = ProcessRegistry(tmp_path)
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        pid_file = registry.pid_file("orphan")
+        pid_file.write_text(str(proc.pid))
+        ports_file = registry.port_file_dir("orphan") / f"nats-server_{proc.pid}.ports"
+        ports_file.write_text("{}")
+        orphan = ServerRecord(
+            "orphan", proc.pid, dead_pid(), "127.0.0.1", 4222, 8222, pid_file.as_posix()
+        )
+        registry.register(orphan)
+        # Process is alive but pid file does not match: process ID was reused
+        registry.register(
+            ServerRecord(
+                "reused",
+                os.getpid(),
+                dead_pid(),
+                "127.0.0.1",
+                4223,
+                8223,
+                "missing.pid",
+            )
+        )
+        owned = ServerRecord(
+            "owned", proc.pid, os.getpid(), "127.0.0.1", 4224, 8224, pid_file.as_posix()
+        )
+        registry.register(owned)
+        assert registry.orphans() == [orphan]
+        assert registry.reap(timeout=0.1) == [orphan]
+        assert proc.wait(timeout=5) is not None
+        assert not ports_file.parent.exists()
+        assert [record.name for record in registry.records()] == ["owned"]
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_orphan_servers_are_stopped_before_workspaces_are_removed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("NATS_TOOLS_WORKSPACE", tmp_path.as_posix())
+    monkeypatch.setattr(registry_module, "_registry", None)
+    monkeypatch.setattr(workspace_module, "_manager", None)
+    workspace = tmp_path.joinpath(f"{dead_pid()}-natsd-0000")
+    workspace.mkdir()
+    workspace.joinpath("nats.conf").write_text("port: 4222")
+    registry = ProcessRegistry()
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        pid_file = registry.pid_file(workspace.name)
+        pid_file.write_text(str(proc.pid))
+        registry.register(
+            ServerRecord(
+                workspace.name,
+                proc.pid,
+                int(workspace.name.partition("-")[0]),
+                "127.0.0.1",
+                4222,
+                8222,
+                pid_file.as_posix(),
+            )
+        )
+        # Whether server was still running when its workspace was removed
+        running: t.List[bool] = []
+        remove = WorkspaceManager.remove
+
+        def _remove(manager: WorkspaceManager, path: Path) -> None:
+            running.append(proc.poll() is None)
+            remove(manager, path)
+
+        monkeypatch.setattr(WorkspaceManager, "remove", _remove)
+        get_workspace_manager().join()
+        assert running == [False]
+        assert not workspace.exists()
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_attach_to_running_server(tmp_path: Path) -> None:
+    registry = ProcessRegistry(tmp_path)
+    with MonitorSimulator(streams=1) as simulator:
+        server = NATSD.attach(
+            port=4222, http_port=simulator.port, with_jetstream=True, registry=registry
+        )
+        assert server.attached
+        assert server.pid is None
+        assert server.is_alive()
+        server.stop()
+        assert server.is_alive()
+        with pytest.raises(ValueError):
+            NATSD.attach(port=4223, http_port=simulator.port, registry=registry)
+        with pytest.raises(TypeError):
+            server.start()
@@ -0,0 +1,94 @@
+import socket
+import time
+
+import pytest
+
+from nats_tools.monitor import NATSMonitor
+from nats_tools.rules import (
+    Condition,
+    RateOfChange,
+    Rule,
+    RulesEngine,
+    Threshold,
+    select,
+)
+
+
+def test_select_expands_lists_and_aggregates():
+    snapshot = {
+        "connz": {"connections": [{"pending_bytes": 10}, {"pending_bytes": 30}]}
+    }
+    assert select(snapshot, "connz.connections.*.pending_bytes") == 30
+    assert select(snapshot, "connz.connections.*.pending_bytes", "sum") == 40
+    assert select(snapshot, "connz.connections.*.pending_bytes", "count") == 2
+    assert select(snapshot, "connz.missing") is None
+
+
+def test_threshold_rule_uses_hysteresis():
+    events = []
+    engine = RulesEngine(
+        [Rule("pending", Threshold("varz.pending", ">", 100, clear=50))],
+        callbacks=[events.append],
+    )
+    for value in (10, 150, 80, 40):
+        engine.evaluate({"varz": {"pending": value}})
+    assert [(event.firing, event.value) for event in events] == [
+        (True, 150),
+        (False, 40),
+    ]
+    engine.assert_not_firing()
+    with pytest.raises(AssertionError):
+        engine.assert_never_fired()
+
+
+def test_rate_of_change_rule_fires_when_value_increases():
+    engine = RulesEngine([Rule("slow", RateOfChange("varz.slow_consumers", ">", 0))])
+    assert engine.endpoints == {"varz"}
+    assert engine.evaluate({"varz": {"slow_consumers": 1}}, timestamp=0) == []
+    assert engine.evaluate({"varz": {"slow_consumers": 1}}, timestamp=1) == []
+    [event] = engine.evaluate({"varz": {"slow_consumers": 3}}, timestamp=2)
+    assert event.firing and event.value == 2
+    with pytest.raises(AssertionError, match="slow"):
+        engine.assert_not_firing()
+
+
+def test_rule_fires_after_for_count_snapshots():
+    engine = RulesEngine(
+        [Rule("routes", Threshold("routez.num_routes", "<", 2), for_count=2)]
+    )
+    assert engine.evaluate({"routez": {"num_routes": 1}}) == []
+    assert len(engine.evaluate({"routez": {"num_routes": 1}})) == 1
+
+
+def test_rule_names_are_unique():
+    rule = Rule("pending", Threshold("varz.pending", ">", 100))
+    with pytest.raises(ValueError, match="pending"):
+        RulesEngine([rule, Rule("pending", Threshold("varz.pending", ">", 10))])
+    engine = RulesEngine([rule])
+    with pytest.raises(ValueError, match="pending"):
+        engine.add_rule(rule)
+
+
+def test_condition_must_implement_evaluate():
+    class Incomplete(Condition):
+        selector = "varz.pending"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_watch_counts_snapshot_errors():
+    # Nothing listens on a port released right after it was bound
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    engine = RulesEngine([Rule("pending", Threshold("varz.pending", ">", 100))])
+    stop = engine.watch(NATSMonitor(f"http://127.0.0.1:{port}"), interval=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while engine.snapshot_errors < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop.set()
+    assert engine.snapshot_errors >= 2
+    assert engine.history == []
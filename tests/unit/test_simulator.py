@@ -0,0 +1,79 @@
+import httpx
+import pytest
+
+from nats_tools.monitor import NATSMonitor
+from nats_tools.simulator import MonitorSimulator
+
+
+@pytest.fixture(scope="module")
+def simulator():
+    with MonitorSimulator(
+        connections=2000, closed_connections=10, streams=20, accounts=4, routes=2
+    ) as simulator:
+        yield simulator
+
+
+def test_connz_honors_pagination_and_sort(simulator: MonitorSimulator):
+    monitor = NATSMonitor(simulator.url)
+    page = monitor.connz(offset=1024, limit=1024)
+    assert page["total"] == 2000
+    assert page["num_connections"] == 976
+    assert page["connections"][0]["cid"] == 1025
+    pending = [
+        connection["pending_bytes"]
+        for connection in monitor.connz(sort="pending", limit=100)["connections"]
+    ]
+    assert pending == sorted(pending, reverse=True)
+    closed = monitor.connz(state="closed", sort="stop")
+    assert closed["total"] == 10
+    assert all("reason" in connection for connection in closed["connections"])
+    with pytest.raises(httpx.HTTPStatusError):
+        monitor.connz(sort="stop")
+
+
+def test_connz_returns_subscriptions(simulator: MonitorSimulator):
+    monitor = NATSMonitor(simulator.url)
+    [connection] = monitor.connz(cid=3, subs="detail")["connections"]
+    details = connection["subscriptions_list_detail"]
+    assert len(details) == connection["subscriptions"]
+    assert all(detail["cid"] == 3 for detail in details)
+
+
+def test_subsz_filters_subscriptions_using_test_subject(simulator: MonitorSimulator):
+    monitor = NATSMonitor(simulator.url)
+    result = monitor.subsz(subs=True, test="sim.ACC1.1.1", limit=5)
+    assert result["total"] > 0
+    assert len(result["subscriptions_list"]) == min(5, result["total"])
+    assert monitor.subsz()["total"] == 0
+
+
+def test_subsz_pages_subscriptions(simulator: MonitorSimulator):
+    monitor = NATSMonitor(simulator.url)
+    expected = [
+        (cid, subject)
+        for cid in range(1, 31)
+        for subject, _, _ in simulator._subscriptions(cid)
+    ]
+    pages = [monitor.subsz(subs=True, offset=offset, limit=7) for offset in (0, 7, 14)]
+    assert pages[0]["total"] == pages[0]["num_subscriptions"]
+    assert [
+        (detail["cid"], detail["subject"])
+        for page in pages
+        for detail in page["subscriptions_list"]
+    ] == expected[:21]
+    total = pages[0]["total"]
+    last = monitor.subsz(subs=True, offset=total - 2, limit=5)["subscriptions_list"]
+    assert len(last) == 2
+    assert monitor.subsz(subs=True, offset=total)["subscriptions_list"] == []
+
+
+def test_jsz_and_other_endpoints(simulator: MonitorSimulator):
+    monitor = NATSMonitor(simulator.url)
+    jsz = monitor.jsz(streams=True, limit=2)
+    assert jsz["streams"] == 20
+    assert len(jsz["account_details"]) == 2
+    assert len(jsz["account_details"][0]["stream_detail"]) == 5
+    assert monitor.routez()["num_routes"] == 2
+    assert len(monitor.accstatz()["account_statz"]) == 4
+    assert monitor.varz()["connections"] == 2000
+    assert monitor.healthz(js_enabled=True) == {"status": "ok"}
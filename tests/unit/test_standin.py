@@ -0,0 +1,185 @@
+import json
+import socket
+import typing as t
+
+import pytest
+
+from nats_tools.loadgen import LoadGenerator
+from nats_tools.natsd import Signal
+from nats_tools.standin import StandInServer, unsupported_options
+
+
+class Client:
+    """A blocking client reading protocol lines and messages."""
+
+    def __init__(self, server: StandInServer, **options: t.Any) -> None:
+        self.sock = socket.create_connection((server.address, server.port), timeout=2)
+        self.file = self.sock.makefile("rb")
+        self.info = json.loads(self.readline()[5:])
+        options.setdefault("headers", True)
+        options.setdefault("no_responders", True)
+        self.send(f"CONNECT {json.dumps(options)}\r\n".encode())
+
+    def send(self, data: bytes) -> None:
+        self.sock.sendall(data)
+
+    def readline(self) -> str:
+        return self.file.readline().decode().rstrip("\r\n")
+
+    def ping(self) -> None:
+        self.send(b"PING\r\n")
+        assert self.readline() == "PONG"
+
+    def next_msg(self) -> t.Tuple[str, bytes]:
+        line = self.readline()
+        payload = self.file.read(int(line.split()[-1]) + 2)[:-2]
+        return line, payload
+
+    def close(self) -> None:
+        self.file.close()
+        self.sock.close()
+
+
+@pytest.fixture
+def server() -> t.Iterator[StandInServer]:
+    with StandInServer(port=0, http_port=0) as server:
+        yield server
+
+
+def test_publish_to_wildcard_and_queue_subscriptions(server: StandInServer) -> None:
+    subscriber, publisher = Client(server), Client(server)
+    subscriber.send(b"SUB foo.* 1\r\nSUB foo.> workers 2\r\nSUB foo.> workers 3\r\n")
+    subscriber.send(b"SUB bar 4\r\nUNSUB 4 1\r\n")
+    subscriber.ping()
+    publisher.send(
+        b"PUB foo.bar 5\r\nhello\r\nPUB bar reply 2\r\nhi\r\nPUB bar 2\r\nno\r\n"
+    )
+    publisher.ping()
+    messages = [subscriber.next_msg() for _ in range(3)]
+    subscriber.ping()
+    assert messages[0] == ("MSG foo.bar 1 5", b"hello")
+    assert messages[1][0] in ("MSG foo.bar 2 5", "MSG foo.bar 3 5")
+    assert messages[2] == ("MSG bar 4 reply 2", b"hi")
+    assert server.monitor.varz()["in_msgs"] == 3
+
+
+def test_request_without_responders(server: StandInServer) -> None:
+    client = Client(server)
+    client.send(b"SUB _INBOX.> 1\r\nPUB service _INBOX.1 4\r\nping\r\n")
+    assert client.next_msg() == ("HMSG _INBOX.1 1 16 16", b"NATS/1.0 503\r\n\r\n")
+    client.send(
+        b"SUB service 2\r\nHPUB service _INBOX.2 12 14\r\nNATS/1.0\r\n\r\nhi\r\n"
+    )
+    assert client.next_msg() == (
+        "HMSG service 2 _INBOX.2 12 14",
+        b"NATS/1.0\r\n\r\nhi",
+    )
+    legacy = Client(server, headers=False)
+    legacy.send(b"SUB service 1\r\n")
+    legacy.ping()
+    client.send(b"HPUB service 12 14\r\nNATS/1.0\r\n\r\nhi\r\n")
+    assert legacy.next_msg() == ("MSG service 1 2", b"hi")
+
+
+def test_authorization() -> None:
+    with StandInServer(port=0, http_port=0, token="secret") as server:
+        client = Client(server, auth_token="secret")
+        assert client.info["auth_required"] is True
+        client.ping()
+        rejected = Client(server, auth_token="wrong")
+        assert rejected.readline() == "-ERR 'Authorization Violation'"
+    with StandInServer(port=0, http_port=0, user="alice", password="s3cr3t") as server:
+        client = Client(server, user="alice", **{"pass": "s3cr3t"})
+        client.ping()
+        assert (
+            server.monitor.connz(auth=True)["connections"][0]["authorized_user"]
+            == "alice"
+        )
+
+
+def test_protocol_errors() -> None:
+    with StandInServer(port=0, http_port=0, max_payload=4) as server:
+        client = Client(server)
+        client.send(b"PUB foo 5\r\nhello\r\n")
+        assert client.readline() == "-ERR 'Maximum Payload Violation'"
+        client = Client(server)
+        client.send(b"PUB foo.* 1\r\nx\r\n")
+        assert client.readline() == "-ERR 'Invalid Publish Subject'"
+        for line in (
+            b"PUB foo x",
+            b"PUB foo -1",
+            b"HPUB foo 3 2",
+            b"SUB foo 1\r\nUNSUB 1 x",
+            b"PUB \xff 1",
+        ):
+            client = Client(server)
+            client.send(line + b"\r\nPING\r\n")
+            assert client.readline() == "-ERR 'Unknown Protocol Operation'"
+            assert client.readline() == ""
+        # Server is still working
+        Client(server).ping()
+
+
+def test_monitoring(server: StandInServer) -> None:
+    client = Client(server, name="worker")
+    client.send(b"SUB orders.> q 1\r\n")
+    client.ping()
+    assert server.monitor.healthz() == {"status": "ok"}
+    assert server.monitor.varz()["subscriptions"] == 1
+    connz = server.monitor.connz(subs="detail")
+    assert connz["total"] == 1
+    connection = connz["connections"][0]
+    assert connection["name"] == "worker"
+    assert connection["subscriptions_list_detail"][0]["qgroup"] == "q"
+    assert server.monitor.connz(offset=1)["connections"] == []
+    assert server.monitor.wait_for_interest("orders.created", timeout=1) == 1
+    assert server.monitor.subsz(subs=True, test="payments")["total"] == 0
+    client.close()
+
+
+def test_signals_and_config_updates() -> None:
+    with StandInServer(port=0, http_port=0) as server:
+        client = Client(server)
+        client.ping()
+        loaded = server.monitor.varz()["config_load_time"]
+        server.update_config(token="secret", debug=True)
+        assert server.monitor.varz()["config_load_time"] != loaded
+        assert Client(server).readline() == "-ERR 'Authorization Violation'"
+        with pytest.raises(ValueError, match="cluster_name"):
+            server.update_config(cluster_name="east")
+        server.send_signal(Signal.RELOAD)
+        server.reopen_log_file()
+        server.send_signal(Signal.LDM)
+        assert json.loads(client.readline()[5:])["ldm"] is True
+        assert client.readline() == ""
+        assert not server.is_alive()
+        assert server.wait() == 0
+        with pytest.raises(TypeError):
+            server.send_signal(Signal.KILL)
+
+
+def test_unsupported_options() -> None:
+    with pytest.raises(ValueError, match="with_jetstream"):
+        StandInServer(with_jetstream=True)
+    StandInServer(debug=True, trace=True, max_cpus=1, with_jetstream=False)
+    options = {"port": 0, "token": "secret", "debug": True, "with_jetstream": True}
+    assert unsupported_options({**options, "tls_cert": "cert.pem"}) == [
+        "tls_cert",
+        "with_jetstream",
+    ]
+    assert unsupported_options({**options, "with_jetstream": False}) == []
+
+
+def test_load_generator_against_stand_in(server: StandInServer) -> None:
+    result = LoadGenerator(
+        server, mode="request", messages=200, timeout=5, idle_timeout=0.2
+    ).run()
+    assert result.received == 200
+    assert result.errors == 0
+
+
+@pytest.mark.nats_stand_in
+@pytest.mark.parametrize("natsd", [{"port": 0, "http_port": 0}], indirect=True)
+def test_natsd_fixture_uses_stand_in(natsd: t.Any) -> None:
+    assert isinstance(natsd, StandInServer)
+    assert natsd.monitor.varz()["connections"] == 0
@@ -0,0 +1,41 @@
+from nats_tools.monitor import NATSMonitor
+from nats_tools.simulator import MonitorSimulator
+from nats_tools.subjects import SubjectIndex, Subscription, subject_matches
+
+
+def test_subject_matches_wildcards():
+    assert subject_matches("foo.bar", "foo.*")
+    assert subject_matches("foo.bar.baz", "foo.>")
+    assert not subject_matches("foo", "foo.>")
+    assert not subject_matches("foo.bar.baz", "foo.*")
+
+
+def test_index_matches_wildcards_and_queue_groups():
+    index = SubjectIndex(
+        [
+            Subscription("orders.eu.created", cid=1),
+            Subscription("orders.*.created", cid=2),
+            Subscription("orders.>", cid=3, queue="workers"),
+            Subscription("orders.>", cid=4, queue="workers"),
+            Subscription("orders.>", cid=5, account="OTHER"),
+        ]
+    )
+    match = index.match("orders.eu.created", account="$G")
+    assert match.connections == {1, 2}
+    assert match.candidates == {1, 2, 3, 4}
+    assert match.fanout == 3
+    assert index.match("orders.eu.created").fanout == 4
+    assert index.match("payments.eu").fanout == 0
+    assert index.remove(Subscription("orders.eu.created", cid=1))
+    assert index.match("orders.eu.created", account="$G").connections == {2}
+    assert index.fanout_histogram() == {}
+
+
+def test_index_can_be_built_from_monitor():
+    with MonitorSimulator(connections=50) as simulator:
+        monitor = NATSMonitor(simulator.url)
+        from_connz = SubjectIndex.from_monitor(monitor, page_size=7)
+        from_subsz = SubjectIndex.from_monitor(monitor, source="subsz", page_size=100)
+    assert len(from_connz) == len(from_subsz) == simulator.varz({})["subscriptions"]
+    assert sum(from_connz.fanout_histogram().values()) > 0
+    assert from_connz.heaviest(1)[0][2] >= 1
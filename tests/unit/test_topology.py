@@ -0,0 +1,180 @@
+import typing as t
+
+import pytest
+
+from nats_tools.httpserver import (
+    BackgroundHTTPServer,
+    Response,
+    error_response,
+    json_response,
+    parse_bool,
+)
+from nats_tools.monitor import NATSMonitor
+from nats_tools.natsd import find_free_ports
+from nats_tools.readiness import wait_for_gateways, wait_for_leafnodes
+from nats_tools.templates import ConfigGenerator
+from nats_tools.topology import NATSCluster, SuperCluster
+
+
+class FakeGateway(BackgroundHTTPServer):
+    def __init__(self, name: str, outbound: t.List[str], leafnodes: int = 0) -> None:
+        super().__init__()
+        self.name = name
+        self.outbound = outbound
+        self.leafnodes = leafnodes
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        if path == "/leafz":
+            return json_response({"leafnodes": self.leafnodes, "leafs": []})
+        return json_response(
+            {
+                "name": self.name,
+                "outbound_gateways": {
+                    name: {"configured": True, "connection": {"cid": index + 1}}
+                    for index, name in enumerate(self.outbound)
+                },
+                "inbound_gateways": {},
+            }
+        )
+
+
+class FakeHub(BackgroundHTTPServer):
+    """A super-cluster member whose JetStream meta leader is set by tests."""
+
+    def __init__(self, name: str, peers: t.List[str], gateways: t.List[str]) -> None:
+        super().__init__()
+        self.name = name
+        self.peers = peers
+        self.gateways = gateways
+        self.meta_leader = ""
+
+    def handle(self, path: str, params: t.Dict[str, str], query: str) -> Response:
+        if path == "/healthz":
+            return json_response({"status": "ok"})
+        if path == "/varz":
+            return json_response({"server_id": self.name, "server_name": self.name})
+        if path == "/routez":
+            return json_response(
+                {"routes": [{"remote_id": peer} for peer in self.peers]}
+            )
+        if path == "/gatewayz":
+            return json_response(
+                {
+                    "name": self.name.partition("-")[0],
+                    "outbound_gateways": {
+                        name: {"connection": {"cid": 1}} for name in self.gateways
+                    },
+                }
+            )
+        if parse_bool(params.get("leader-only")) and self.meta_leader != self.name:
+            return error_response(400, "not leader")
+        return json_response({"meta_cluster": {"leader": self.meta_leader}})
+
+
+def test_render_gateway() -> None:
+    config = ConfigGenerator().render(
+        cluster_name="east",
+        cluster_listen="127.0.0.1:6222",
+        gateway_name="east",
+        gateway_listen="127.0.0.1:7222",
+        gateway_advertise="10.0.0.1:7222",
+        gateways={"east": ["nats://127.0.0.1:7222"], "west": ["nats://127.0.0.1:7223"]},
+    )
+    assert "gateway {" in config
+    assert "listen: 127.0.0.1:7222" in config
+    assert "advertise: 10.0.0.1:7222" in config
+    assert 'gateways: [{"name": "west", "urls": ["nats://127.0.0.1:7223"]}]' in config
+    assert "gateway {" not in ConfigGenerator().render()
+    with pytest.raises(ValueError):
+        ConfigGenerator().render(gateway_name="east")
+    with pytest.raises(ValueError):
+        ConfigGenerator().render(
+            cluster_name="east", gateway_name="west", gateway_listen="127.0.0.1:7222"
+        )
+
+
+def test_find_free_ports_are_distinct() -> None:
+    ports = find_free_ports(20)
+    assert len(set(ports)) == 20
+
+
+def test_cluster_configures_routes() -> None:
+    cluster = NATSCluster("east", size=3, leafnodes=True)
+    nodes = cluster.configure()
+    assert len(nodes) == 3
+    assert cluster.configure() is nodes
+    assert [node.server_name for node in nodes] == ["east-0", "east-1", "east-2"]
+    options = t.cast(t.Dict[str, t.Any], nodes[1].config_options)
+    assert options["routes"] == cluster.routes
+    assert options["cluster_listen"] == f"127.0.0.1:{cluster.ports[1]['cluster_port']}"
+    assert options["leafnodes_listen_port"] == cluster.ports[1]["leafnode_port"]
+    with pytest.raises(TypeError):
+        cluster.gateway_urls
+
+
+def test_supercluster_joins_clusters_with_gateways() -> None:
+    supercluster = SuperCluster(clusters=["east", "west"], size=2, spokes=1)
+    east, west = supercluster.clusters
+    assert supercluster["west"] is west
+    assert len(supercluster.hubs) == 4
+    options = t.cast(t.Dict[str, t.Any], east.nodes[0].config_options)
+    assert options["gateway_name"] == "east"
+    assert options["gateways"] == {
+        "east": east.gateway_urls,
+        "west": west.gateway_urls,
+    }
+    assert "gateway {" in t.cast(str, east.nodes[0]._config)
+    spoke = supercluster.spokes["west"][0]
+    assert spoke.server_name == "west-leaf-0"
+    spoke_options = t.cast(t.Dict[str, t.Any], spoke.config_options)
+    assert spoke_options["leafnode_remotes"] == [{"urls": west.leafnode_urls}]
+    with pytest.raises(ValueError):
+        SuperCluster(clusters=["east", "east"])
+
+
+def test_supercluster_start_fails_without_binary(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("PATH", "")
+    supercluster = SuperCluster(clusters=2, size=1)
+    with pytest.raises(FileNotFoundError):
+        supercluster.start()
+
+
+def test_wait_for_gateways() -> None:
+    with FakeGateway("east", ["west"]) as east, FakeGateway("west", []) as west:
+        wait_for_gateways([NATSMonitor(east.url)], ["east", "west"], timeout=1)
+        with pytest.raises(TimeoutError, match="no gateway to"):
+            wait_for_gateways(
+                [NATSMonitor(east.url), NATSMonitor(west.url)],
+                ["east", "west"],
+                timeout=0.1,
+            )
+
+
+def test_wait_for_leafnodes() -> None:
+    with FakeGateway("hub", [], leafnodes=2) as hub:
+        wait_for_leafnodes([NATSMonitor(hub.url)], count=2, timeout=1)
+        with pytest.raises(TimeoutError, match="leafnode connections"):
+            wait_for_leafnodes([NATSMonitor(hub.url)], count=3, timeout=0.1)
+
+
+def test_jetstream_supercluster_waits_for_a_single_meta_leader() -> None:
+    supercluster = SuperCluster(clusters=["east", "west"], size=2, with_jetstream=True)
+    hubs: t.List[FakeHub] = []
+    for cluster in supercluster.clusters:
+        peers = [str(node.server_name) for node in cluster.nodes]
+        others = [other.name for other in supercluster.clusters if other is not cluster]
+        hubs.extend(FakeHub(name, peers, others) for name in peers)
+    for node, hub in zip(supercluster.hubs, hubs):
+        node.monitor = NATSMonitor(hub.start().url)
+    try:
+        with pytest.raises(TimeoutError, match="0 nodes claim"):
+            supercluster.wait_until_ready(timeout=0.2)
+        # Clusters share the meta leader elected in the whole super-cluster
+        for hub in hubs:
+            hub.meta_leader = hubs[0].name
+        supercluster.wait_until_ready(timeout=1)
+    finally:
+        for hub in hubs:
+            hub.stop()
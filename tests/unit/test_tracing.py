@@ -0,0 +1,76 @@
+import json
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from nats_tools.monitor import NATSMonitor
+from nats_tools.natsd import NATSD, _ports_file_written
+from nats_tools.simulator import MonitorSimulator
+from nats_tools.tracing import HistogramSink, JSONLSink, Span, Tracer, tracer
+
+
+def test_span_is_not_measured_without_hooks() -> None:
+    spans: t.List[Span] = []
+    local = Tracer()
+    with local.span("noop", value=1) as attributes:
+        attributes["ignored"] = True
+    hook = local.add_hook(spans.append)
+    with local.span("op", value=1) as attributes:
+        attributes["status"] = 200
+    local.remove_hook(hook)
+    local.event("ignored")
+    [span] = spans
+    assert span.name == "op"
+    assert span.attributes == {"value": 1, "status": 200}
+    assert span.duration >= 0
+
+
+def test_span_records_errors() -> None:
+    spans: t.List[Span] = []
+    local = Tracer()
+    local.add_hook(spans.append)
+    with pytest.raises(RuntimeError):
+        with local.span("op"):
+            raise RuntimeError("boom")
+    assert spans[0].attributes["error"] == "RuntimeError('boom')"
+
+
+def test_monitor_and_natsd_spans(tmp_path: Path) -> None:
+    histogram = HistogramSink(lambda span: span.attributes.get("endpoint", span.name))
+    tracer.add_hook(histogram)
+    try:
+        with JSONLSink(tmp_path / "spans.jsonl") as sink:
+            tracer.add_hook(sink)
+            try:
+                NATSD()
+                with MonitorSimulator(connections=10) as simulator:
+                    monitor = NATSMonitor(simulator.url)
+                    monitor.varz()
+                    monitor.connz(limit=5)
+            finally:
+                tracer.remove_hook(sink)
+    finally:
+        tracer.remove_hook(histogram)
+    summary = histogram.summary()
+    assert summary["/varz"]["count"] == 1
+    assert summary["/connz"]["count"] == 1
+    assert summary["natsd.render"]["count"] == 1
+    lines = (tmp_path / "spans.jsonl").read_text().splitlines()
+    spans = [Span(**json.loads(line)) for line in lines]
+    [connz] = [span for span in spans if span.attributes.get("endpoint") == "/connz"]
+    assert connz.attributes["status"] == 200
+    assert connz.attributes["bytes"] > 0
+    assert connz.attributes["params"]["limit"] == 5
+    assert "decode" in connz.attributes
+
+
+def test_accept_phase_waits_for_ports_file(tmp_path: Path) -> None:
+    assert not _ports_file_written(tmp_path, 1234)
+    ports_file = tmp_path / "nats-server_1234.ports"
+    # File may be read while server is still writing it
+    ports_file.write_text('{"nats": ["nats://127.0.0.1:4222"], "monitoring"')
+    assert not _ports_file_written(tmp_path, 1234)
+    ports_file.write_text('{"nats": ["nats://127.0.0.1:4222"]}')
+    assert _ports_file_written(tmp_path, 1234)
+    assert not _ports_file_written(tmp_path, 234)
@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+from nats_tools.natsd import NATSD
+from nats_tools.workspace import TRASH_PREFIX, WorkspaceManager
+
+
+def test_workspace_is_created_lazily(tmp_path: Path) -> None:
+    manager = WorkspaceManager(tmp_path)
+    server = NATSD(with_jetstream=True, workspace=manager)
+    assert server.workspace.parent == tmp_path
+    assert not server.workspace.exists()
+    assert server.store_dir == server.workspace / "jetstream"
+    assert server.config_options is not None
+    assert server.config_options["store_directory"] == server.store_dir
+    server.cleanup()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_remove_renames_then_deletes(tmp_path: Path) -> None:
+    manager = WorkspaceManager(tmp_path)
+    workspace = manager.create(manager.allocate())
+    workspace.joinpath("file").write_text("data")
+    manager.remove(workspace)
+    assert not workspace.exists()
+    manager.join()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_orphans_are_removed(tmp_path: Path) -> None:
+    # Process IDs are never that large
+    orphan = tmp_path.joinpath("999999999-natsd-0000")
+    orphan.mkdir()
+    trash = tmp_path.joinpath(f"{TRASH_PREFIX}{os.getpid()}-natsd-0000")
+    trash.mkdir()
+    alive = tmp_path.joinpath(f"{os.getpid()}-natsd-0001")
+    alive.mkdir()
+    manager = WorkspaceManager(tmp_path)
+    manager.join()
+    assert list(tmp_path.iterdir()) == [alive]